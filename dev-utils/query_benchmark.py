@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""Measures how fast queries filter a synthetic library.
+
+Generates a library of songs with a configurable size and tag distribution,
+runs a corpus of queries against it and reports the time and memory each
+of them takes. Results can be written to JSON and compared with older ones:
+
+    ./dev-utils/query_benchmark.py --songs 50000 -o before.json
+    ./dev-utils/query_benchmark.py --songs 50000 --compare before.json
+
+No UI gets created, but `quodlibet.library` and query plugins still import
+Gtk, so PyGObject is needed.
+"""
+
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+WORDS = [
+    "love", "night", "heart", "fire", "dream", "blue", "river", "stone",
+    "light", "song", "time", "rain", "road", "city", "ghost", "summer",
+    "wolf", "ocean", "star", "gold", "shadow", "electric", "broken", "wild",
+    "silent", "motor", "head", "machine", "garden", "winter", "glass", "iron",
+    # non-ASCII ones, matched by ASCII searches, and one that isn't foldable
+    "café", "noël", "mañana", "sól", "björk", "øresund", "žena", "straße",
+]
+
+GENRES = [
+    "Rock", "Pop", "Jazz", "Classical", "Electronic", "Metal", "Folk",
+    "Hip-Hop", "Blues", "Ambient", "Soundtrack", "Country",
+]
+
+SAVED_SEARCHES = {
+    "favourites": "#(rating >= 0.8)",
+    "recent": "#(added < 30 days)",
+    "classics": "&(#(date < 1980), #(playcount > 5))",
+}
+
+QUERIES = [
+    ("text", "love"),
+    ("text", "the night"),
+    ("text", "cafe"),
+    ("text", "heart fire"),
+    ("text", "bjork"),
+    ("text", "nothing matches this"),
+    ("tag", "artist=the"),
+    ("tag", "genre=rock"),
+    ("tag", 'genre="Jazz"'),
+    ("tag", "title=/^(love|night)/"),
+    ("tag", "artist=/ghost$/i"),
+    ("tag", "~filename=flac"),
+    ("tag", "album=!heart"),
+    ("numeric", "#(rating > 0.6)"),
+    ("numeric", "#(playcount >= 10)"),
+    ("numeric", "#(length < 3:00)"),
+    ("numeric", "#(track = 1)"),
+    ("numeric", "#(bitrate > 256)"),
+    ("date", "#(date >= 2000)"),
+    ("date", "#(1990 <= date < 2000)"),
+    ("date", "#(date = 1985)"),
+    ("date", "#(added < 30 days)"),
+    ("date", "#(lastplayed > 1 week)"),
+    ("boolean", "&(|(genre=rock, genre=metal), !artist=the, #(rating >= 0.8))"),
+    ("boolean", "|(&(love, #(date < 1990)), &(night, #(playcount > 5)))"),
+    ("boolean", "&(!#(playcount > 0), |(title=/fire|rain/, album=stone))"),
+    ("boolean", "&(artist=the, |(#(length > 5:00), &(genre=jazz, !#(date > 1970))))"),
+    ("saved", "@(saved: favourites)"),
+    ("saved", "&(@(saved: favourites), genre=rock)"),
+    ("saved", "|(@(saved: classics), @(saved: favourites))"),
+]
+
+CATEGORIES = sorted({c for c, q in QUERIES} | {"custom"})
+
+
+def _words(rng, count):
+    return " ".join(rng.choice(WORDS) for i in range(count))
+
+
+def _artist(rng):
+    name = _words(rng, rng.randint(1, 2)).title()
+    return "The " + name if rng.random() < 0.2 else name
+
+
+def generate_songs(count, seed=0, artists=None, skew=1.0, now=None):
+    """A list of `count` AudioFiles, grouped into albums.
+
+    Artists get picked with a Zipf like distribution (the higher `skew`, the
+    more songs the popular ones have), each with their own genres and era.
+    """
+
+    from quodlibet.formats import AudioFile
+
+    rng = random.Random(seed)
+    now = time.time() if now is None else now
+    if artists is None:
+        artists = max(1, count // 40)
+
+    pool = []
+    for i in range(artists):
+        year = rng.randint(1955, 2024)
+        pool.append((_artist(rng), rng.sample(GENRES, rng.randint(1, 2)), year))
+    weights = [1 / (i + 1) ** skew for i in range(artists)]
+
+    songs = []
+    while len(songs) < count:
+        artist, genres, start = rng.choices(pool, weights)[0]
+        album = _words(rng, rng.randint(1, 3)).title()
+        year = min(2025, start + rng.randint(0, 20))
+        date = str(year)
+        if rng.random() < 0.5:
+            date += f"-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        added = now - rng.uniform(0, 10 * 365 * 86400)
+        tracks = rng.randint(6, 16)
+        for track in range(1, tracks + 1):
+            title = _words(rng, rng.randint(1, 4)).capitalize()
+            song = AudioFile(
+                {
+                    "~filename": f"/music/{artist}/{album}/{track:02d}. {title}.flac",
+                    "~mountpoint": "/music",
+                    "artist": artist,
+                    "album": album,
+                    "title": title,
+                    "genre": "\n".join(genres),
+                    "date": date,
+                    "tracknumber": f"{track}/{tracks}",
+                    "~#length": rng.randint(60, 600),
+                    "~#bitrate": rng.choice([128, 192, 256, 320, 900]),
+                    "~#added": int(added),
+                }
+            )
+            if rng.random() < 0.1:
+                song["artist"] += "\n" + _artist(rng)
+            if rng.random() < 0.6:
+                song["~#rating"] = rng.randint(0, 5) / 5
+            playcount = int(rng.expovariate(0.2))
+            if playcount:
+                song["~#playcount"] = playcount
+                song["~#lastplayed"] = int(rng.uniform(added, now))
+            songs.append(song)
+    return songs[:count]
+
+
+def _write_saved_searches(user_dir):
+    lists = os.path.join(user_dir, "lists")
+    os.makedirs(lists, exist_ok=True)
+    with open(os.path.join(lists, "queries.saved"), "w", encoding="utf-8") as h:
+        for name, query in SAVED_SEARCHES.items():
+            h.write(f"{query}\n{name}\n")
+
+
+def _enable_saved_searches():
+    from quodlibet.ext.query.savedsearch import IncludeSavedSearchQuery
+    from quodlibet.plugins import Plugin
+    from quodlibet.plugins.query import QUERY_HANDLER
+
+    QUERY_HANDLER.plugin_enable(Plugin(IncludeSavedSearchQuery))
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=ROOT,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_query(library, text, repeat):
+    """Timings and memory use of filtering the library with the query"""
+
+    from quodlibet.query import Query
+
+    start = time.perf_counter()
+    query = Query(text)
+    parse_time = time.perf_counter() - start
+    if not query.is_parsable:
+        raise ValueError(f"Invalid query {text!r}")
+
+    # the first search builds whatever the library keeps around for queries
+    start = time.perf_counter()
+    matches = len(query.filter(library))
+    first_time = time.perf_counter() - start
+
+    times = []
+    gc.collect()
+    gc.disable()
+    try:
+        for i in range(repeat):
+            start = time.perf_counter()
+            query.filter(library)
+            times.append(time.perf_counter() - start)
+    finally:
+        gc.enable()
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        result = query.filter(library)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+
+    median = statistics.median(times)
+    return {
+        "matches": matches,
+        "parse_time": parse_time,
+        "first_time": first_time,
+        "min_time": min(times),
+        "median_time": median,
+        "songs_per_second": len(library) / median if median else None,
+        "peak_bytes": peak - before,
+        "result_bytes": current - before,
+    }
+
+
+def run(args):
+    from quodlibet import config, const
+    from quodlibet.library import SongLibrary
+
+    config.init_defaults()
+    config.init()
+    # measure searching, not looking up earlier results
+    config.set("browsers", "query_cache", args.query_cache)
+    for setting in args.set:
+        key, value = setting.split("=", 1)
+        section, option = key.split(".", 1)
+        config.set(section, option, value)
+
+    _enable_saved_searches()
+
+    start = time.perf_counter()
+    songs = generate_songs(args.songs, args.seed, args.artists, args.skew)
+    generate_time = time.perf_counter() - start
+    library = SongLibrary()
+    start = time.perf_counter()
+    library.add(songs)
+    add_time = time.perf_counter() - start
+
+    queries = [(c, q) for c, q in QUERIES if not args.category or c in args.category]
+    queries += [("custom", q) for q in args.query]
+
+    results = []
+    print(f"{'query':<60} {'matches':>8} {'median ms':>10} {'peak KiB':>10}")
+    for category, text in queries:
+        result = {"category": category, "query": text}
+        result.update(bench_query(library, text, args.repeat))
+        results.append(result)
+        print(
+            f"{text[:60]:<60} {result['matches']:>8} "
+            f"{result['median_time'] * 1000:>10.2f} "
+            f"{result['peak_bytes'] / 1024:>10.1f}"
+        )
+    library.destroy()
+
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "revision": _git_revision(),
+        "version": const.VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "options": {
+            "songs": args.songs,
+            "seed": args.seed,
+            "artists": args.artists,
+            "skew": args.skew,
+            "repeat": args.repeat,
+            "query_cache": args.query_cache,
+            "set": args.set,
+        },
+        "library": {
+            "songs": len(songs),
+            "generate_time": generate_time,
+            "add_time": add_time,
+        },
+        "queries": results,
+    }
+
+
+def compare(old, new):
+    """Prints the change of the median times of the queries in both"""
+
+    before = {r["query"]: r for r in old["queries"]}
+    print(f"\n{'query':<60} {'before ms':>10} {'after ms':>10} {'change':>8}")
+    for result in new["queries"]:
+        prev = before.get(result["query"])
+        if prev is None:
+            continue
+        a, b = prev["median_time"], result["median_time"]
+        change = f"{(b - a) / a * 100:+.0f}%" if a else "-"
+        text = result["query"][:60]
+        print(f"{text:<60} {a * 1000:>10.2f} {b * 1000:>10.2f} {change:>8}")
+    if old["options"]["songs"] != new["options"]["songs"]:
+        print("(the libraries differ in size)")
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--songs", type=int, default=20000, help="library size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--artists", type=int, help="number of artists (default: songs / 40)"
+    )
+    parser.add_argument(
+        "--skew", type=float, default=1.0, help="how uneven songs spread over artists"
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per query")
+    parser.add_argument("--category", action="append", choices=CATEGORIES)
+    parser.add_argument(
+        "--query", action="append", default=[], help="additional query to run"
+    )
+    parser.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        metavar="SECTION.OPTION=VALUE",
+        help="config option to set, e.g. browsers.search_index=true",
+    )
+    parser.add_argument(
+        "--query-cache", action="store_true", help="keep using cached results"
+    )
+    parser.add_argument("-o", "--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results to compare with")
+    args = parser.parse_args(argv[1:])
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as h:
+            old = json.load(h)
+
+    with tempfile.TemporaryDirectory() as user_dir:
+        # for the saved searches
+        os.environ["QUODLIBET_USERDIR"] = user_dir
+        _write_saved_searches(user_dir)
+        results = run(args)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as h:
+            json.dump(results, h, indent=2)
+    if args.compare:
+        compare(old, results)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
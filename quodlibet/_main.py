@@ -430,7 +430,7 @@ def enable_periodic_save(save_library):
     def periodic_library_save():
         while 1:
             # max every 15 minutes
-            quodlibet.library.save(save_period=15 * 60)
+            quodlibet.library.save(save_period=15 * 60, background=True)
             yield
 
     copool.add(periodic_library_save, timeout=timeout)
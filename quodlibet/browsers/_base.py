@@ -31,6 +31,12 @@ class Filter:
         def active_filter(self, song): ...
     """
 
+    standing_query = None
+    """A `StandingQuery` the browser uses to keep the song list up to
+    date itself. If set, the song list doesn't check new songs using
+    active_filter.
+    """
+
     def can_filter_tag(self, key):
         """If key can be passed to filter()"""
         return False
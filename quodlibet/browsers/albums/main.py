@@ -37,9 +37,9 @@ from quodlibet.qltk.songsmenu import SongsMenu
 from quodlibet.qltk.views import AllTreeView
 from quodlibet.qltk.x import MenuItem, ScrolledWindow, RadioMenuItem
 from quodlibet.qltk.x import SymbolicIconImage
-from quodlibet.query import Query
+from quodlibet.query import Query, StandingQuery
 from quodlibet.util import connect_obj, DeferredSignal
-from quodlibet.util import copool, connect_destroy, cmp
+from quodlibet.util import connect_destroy, cmp
 from quodlibet.util.i18n import numeric_phrase
 from quodlibet.util.library import background_filter
 from .models import AlbumModel, AlbumFilterModel, AlbumSortModel, AlbumItem
@@ -310,12 +310,9 @@ class VisibleUpdate:
     # beyond the visible area in both directions
     PRELOAD_COUNT = 35
 
-    def enable_row_update(self, view, sw, column):
+    def enable_row_update(self, view, column):
         connect_obj(view, "draw", self.__update_visibility, view)
 
-        connect_destroy(sw.get_vadjustment(), "value-changed", self.__stop_update, view)
-
-        self.__pending_paths = []
         self.__update_deferred = DeferredSignal(
             self.__update_visible_rows, timeout=50, priority=GLib.PRIORITY_LOW
         )
@@ -327,28 +324,19 @@ class VisibleUpdate:
             self.__update_deferred.abort()
             self.__update_deferred = None
 
-        if self.__pending_paths:
-            copool.remove(self.__scan_paths)
-
         self.__column = None
-        self.__pending_paths = []
-
-    def _row_needs_update(self, model, iter_):
-        """Should return True if the rows should be updated"""
 
-        raise NotImplementedError
+    def _update_rows(self, model, rows):
+        """Do whatever is needed to update the rows, a list of
+        (iter, distance) pairs with the number of rows they are away from
+        the visible area, closest first.
 
-    def _update_row(self, model, iter_):
-        """Do whatever is needed to update the row."""
+        Gets called again when the view scrolls, rows no longer passed
+        don't need an update anymore.
+        """
 
         raise NotImplementedError
 
-    def __stop_update(self, adj, view):
-        if self.__pending_paths:
-            copool.remove(self.__scan_paths)
-            self.__pending_paths = []
-            self.__update_visibility(view)
-
     def __update_visibility(self, view, *args):
         if not self.__column.get_visible():
             return
@@ -357,66 +345,34 @@ class VisibleUpdate:
         if self.__first_expose:
             self.__first_expose = False
             self.__update_visible_rows(view, 0)
-            for _i in self.__scan_paths():
-                pass
 
         self.__update_deferred(view, self.PRELOAD_COUNT)
 
-    def __scan_paths(self):
-        while self.__pending_paths:
-            model, path = self.__pending_paths.pop()
-            try:
-                iter_ = model.get_iter(path)
-            except ValueError:
-                continue
-            self._update_row(model, iter_)
-            yield True
-
     def __update_visible_rows(self, view, preload):
         vrange = view.get_visible_range()
         if vrange is None:
             return
 
         model = view.get_model()
-
-        # Generate a path list so that cover scanning starts in the middle
-        # of the visible area and alternately moves up and down.
         start, end = vrange
 
         # pygtk2.12 sometimes returns empty tuples
         if not start or not end:
             return
 
-        start = start.get_indices()[0] - preload - 1
-        end = end.get_indices()[0] + preload
-
-        vlist = list(range(end, start, -1))
-        top = vlist[: len(vlist) // 2]
-        bottom = vlist[len(vlist) // 2 :]
-        top.reverse()
+        first = start.get_indices()[0]
+        last = end.get_indices()[0]
 
-        vlist_new = []
-        for _i in vlist:
-            if top:
-                vlist_new.append(top.pop())
-            if bottom:
-                vlist_new.append(bottom.pop())
-        vlist_new = filter(lambda s: s >= 0, vlist_new)
-
-        vlist_new = map(Gtk.TreePath, vlist_new)
-
-        visible_paths = []
-        for path in vlist_new:
+        rows = []
+        for index in range(max(first - preload, 0), last + preload + 1):
             try:
-                iter_ = model.get_iter(path)
+                iter_ = model.get_iter(Gtk.TreePath(index))
             except ValueError:
-                continue
-            if self._row_needs_update(model, iter_):
-                visible_paths.append((model, path))
+                break
+            rows.append((iter_, max(first - index, index - last, 0)))
+        rows.sort(key=lambda row: row[1])
 
-        if not self.__pending_paths and visible_paths:
-            copool.add(self.__scan_paths)
-        self.__pending_paths = visible_paths
+        self._update_rows(model, rows)
 
 
 class AlbumList(Browser, util.InstanceTracker, VisibleUpdate, DisplayPatternMixin):
@@ -500,7 +456,7 @@ class AlbumList(Browser, util.InstanceTracker, VisibleUpdate, DisplayPatternMixi
         model_filter = AlbumFilterModel(child_model=model_sort)
 
         self.__bg_filter = background_filter()
-        self.__filter = None
+        self.__standing = None
         model_filter.set_visible_func(self.__parse_query)
 
         render = Gtk.CellRendererPixbuf()
@@ -600,7 +556,7 @@ class AlbumList(Browser, util.InstanceTracker, VisibleUpdate, DisplayPatternMixi
 
         self.connect("destroy", self.__destroy)
 
-        self.enable_row_update(view, sw, self.__cover_column)
+        self.enable_row_update(view, self.__cover_column)
 
         self.connect("key-press-event", self.__key_pressed, library.librarian)
 
@@ -636,11 +592,27 @@ class AlbumList(Browser, util.InstanceTracker, VisibleUpdate, DisplayPatternMixi
             return True
         return False
 
-    def _row_needs_update(self, model, iter_):
-        item = model.get_value(iter_)
-        return item.album is not None and not item.scanned
+    def _update_rows(self, filter_model, rows):
+        wanted = {}
+        for iter_, distance in rows:
+            item = filter_model.get_value(iter_)
+            if item.album is None:
+                continue
+            wanted[item] = distance
+            if not item.scanned:
+                self._update_row(filter_model, iter_, distance)
+
+        def get_priority(request):
+            item = request.tag
+            distance = wanted.get(item)
+            if distance is None:
+                # scrolled out of view, gets requested again once back
+                item.scanned = False
+            return distance
+
+        app.cover_manager.loader.reprioritize(self._cover_cancel, get_priority)
 
-    def _update_row(self, filter_model, iter_):
+    def _update_row(self, filter_model, iter_, priority=0):
         sort_model = filter_model.get_model()
         model = sort_model.get_model()
         iter_ = filter_model.convert_iter_to_child_iter(iter_)
@@ -655,12 +627,16 @@ class AlbumList(Browser, util.InstanceTracker, VisibleUpdate, DisplayPatternMixi
         item = model.get_value(iter_)
         scale_factor = self.get_scale_factor()
         item.scan_cover(
-            scale_factor=scale_factor, callback=callback, cancel=self._cover_cancel
+            scale_factor=scale_factor,
+            callback=callback,
+            cancel=self._cover_cancel,
+            priority=priority,
         )
 
     def __destroy(self, browser):
         self._cover_cancel.cancel()
         self.disable_row_update()
+        self.__set_standing(None)
 
         self.view.set_model(None)
 
@@ -668,13 +644,26 @@ class AlbumList(Browser, util.InstanceTracker, VisibleUpdate, DisplayPatternMixi
         if not klass.instances():
             klass._destroy_model()
 
+    def __set_standing(self, standing):
+        if self.__standing is not None:
+            self.__standing.destroy()
+        self.__standing = standing
+        if standing is not None:
+            standing.connect("entered", self.__albums_moved)
+            standing.connect("left", self.__albums_moved)
+
+    def __albums_moved(self, standing, albums):
+        # the model might have updated the rows before we knew, check again
+        self.__model.refresh_albums(albums)
+
     def __update_filter(self, entry, text, scroll_up=True, restore=False):
         model = self.view.get_model()
 
-        self.__filter = None
         query = self.__search.get_query(star=["~people", "album"])
         if not query.matches_all:
-            self.__filter = query.search
+            self.__set_standing(StandingQuery(self.__library.albums, query))
+        else:
+            self.__set_standing(None)
         self.__bg_filter = background_filter()
 
         self.__inhibit()
@@ -687,24 +676,24 @@ class AlbumList(Browser, util.InstanceTracker, VisibleUpdate, DisplayPatternMixi
             self.view.scroll_to_point(0, 0)
 
         # Don't filter on restore if there is nothing to filter
-        if not restore or self.__filter or self.__bg_filter:
+        if not restore or self.__standing is not None or self.__bg_filter:
             model.refilter()
 
         self.__uninhibit()
 
     def __parse_query(self, model, iter_, data):
-        f, b = self.__filter, self.__bg_filter
+        standing, b = self.__standing, self.__bg_filter
 
-        if f is None and b is None:
+        if standing is None and b is None:
             return True
         album = model.get_album(iter_)
         if album is None:
             return True
         if b is None:
-            return f(album)
-        if f is None:
+            return album in standing
+        if standing is None:
             return b(album)
-        return b(album) and f(album)
+        return b(album) and album in standing
 
     def __search_func(self, model, column, key, iter_, data):
         album = model.get_album(iter_)
@@ -741,6 +730,10 @@ class AlbumList(Browser, util.InstanceTracker, VisibleUpdate, DisplayPatternMixi
 
     def __refresh_album(self, menuitem, view):
         items = self.__get_selected_items()
+        keys = {item.album.key for item in items if item.album}
+        # look them up again instead of loading the stored ones
+        app.cover_manager.thumbnails.invalidate(keys)
+        app.cover_manager.loader.invalidate(keys)
         for item in items:
             item.scanned = False
         model = self.view.get_model()
@@ -26,7 +26,12 @@ class AlbumItem:
             size = 48
         return size
 
-    def scan_cover(self, force=False, scale_factor=1, callback=None, cancel=None):
+    def scan_cover(
+        self, force=False, scale_factor=1, callback=None, cancel=None, priority=0
+    ):
+        """Loads the cover through the shared loader, see
+        `CoverLoader.request()` for cancel and priority"""
+
         if (self.scanned and not force) or not self.album or not self.album.songs:
             return
         self.scanned = True
@@ -36,8 +41,14 @@ class AlbumItem:
             callback()
 
         s = self.cover_size * scale_factor
-        app.cover_manager.get_pixbuf_many_async(
-            self.album.songs, s, s, cancel, set_cover_cb
+        app.cover_manager.loader.request(
+            self.album.key,
+            self.album.songs,
+            s,
+            set_cover_cb,
+            priority=priority,
+            cancellable=cancel,
+            tag=self,
         )
 
     def __repr__(self):
@@ -117,7 +128,12 @@ class AlbumModel(ObjectStore, AlbumModelMixin):
     def _change_albums(self, library, changed):
         """Trigger a row redraw for each album that changed"""
 
-        changed_albums = changed.copy()
+        self.refresh_albums(changed)
+
+    def refresh_albums(self, albums):
+        """Trigger a row update for each of the albums"""
+
+        changed_albums = set(albums)
         for iter_, item in self.iterrows():
             album = item.album
             if album is not None and album in changed_albums:
@@ -174,6 +174,9 @@ class CoverGrid(Browser, util.InstanceTracker, DisplayPatternMixin):
     keys = ["CoverGrid"]
     priority = 5
 
+    PRELOAD_ROWS = 5
+    """Rows of covers beyond the visible area that keep loading"""
+
     def pack(self, songpane):
         container = self.songcontainer
         container.pack1(self, True, False)
@@ -273,6 +276,11 @@ class CoverGrid(Browser, util.InstanceTracker, DisplayPatternMixin):
         )
 
         self.scrollwin = sw = CoverGridContainer(view)
+        connect_destroy(
+            sw.get_vadjustment(),
+            "value-changed",
+            util.DeferredSignal(self.__update_cover_priorities, owner=self),
+        )
 
         view.connect(
             "selected-children-changed",
@@ -362,6 +370,30 @@ class CoverGrid(Browser, util.InstanceTracker, DisplayPatternMixin):
         if not CoverGrid.instances():
             CoverGrid._destroy_model()
 
+    def __update_cover_priorities(self, adjustment):
+        top = adjustment.get_value()
+        bottom = top + adjustment.get_page_size()
+
+        def get_priority(request):
+            widget = request.tag
+            if widget.get_parent() is None:
+                return None
+            alloc = widget.get_allocation()
+            height = max(alloc.height, 1)
+            if alloc.y + alloc.height < top:
+                distance = (top - alloc.y) // height
+            elif alloc.y > bottom:
+                distance = (alloc.y - bottom) // height + 1
+            else:
+                distance = 0
+            if distance > self.PRELOAD_ROWS:
+                # scrolled out of view, load once drawn again
+                widget.populate()
+                return None
+            return distance
+
+        app.cover_manager.loader.reprioritize(self.__cover_cancel, get_priority)
+
     def __cover_changed(self, manager, songs):
         songs = set(songs)
 
@@ -404,7 +436,12 @@ class CoverGrid(Browser, util.InstanceTracker, DisplayPatternMixin):
         )
 
     def __refresh_cover(self, menuitem, view):
-        for child in self.view.get_selected_children():
+        children = self.view.get_selected_children()
+        keys = {child.model.album.key for child in children if child.model.album}
+        # look them up again instead of loading the stored ones
+        app.cover_manager.thumbnails.invalidate(keys)
+        app.cover_manager.loader.invalidate(keys)
+        for child in children:
             child.populate()
 
     def refresh_all(self):
@@ -31,7 +31,12 @@ class AlbumListItem(GObject.Object):
 
         self.connect("notify::album", self._album_changed)
 
-    def load_cover(self, size: int, cancelable: Gio.Cancellable | None = None):
+    def load_cover(
+        self, size: int, cancelable: Gio.Cancellable | None = None, tag=None
+    ):
+        """Loads the cover through the shared loader, see
+        `CoverLoader.request()` for cancelable and tag"""
+
         def callback(cover):
             self._cover = cover
             self.notify("cover")
@@ -39,8 +44,13 @@ class AlbumListItem(GObject.Object):
         manager = app.cover_manager
         # Skip this during testing
         if manager:
-            manager.get_pixbuf_many_async(
-                self._album.songs, size, size, cancelable, callback
+            manager.loader.request(
+                self._album.key,
+                self._album.songs,
+                size,
+                callback,
+                cancellable=cancelable,
+                tag=tag,
             )
 
     def format_label(self, pattern):
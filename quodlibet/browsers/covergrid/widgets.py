@@ -111,7 +111,7 @@ class AlbumWidget(Gtk.FlowBoxChild):
 
     def _populate(self):
         size = self.props.scale_factor * self.props.cover_size
-        self.model.load_cover(size, self._cancelable)
+        self.model.load_cover(size, self._cancelable, tag=self)
         self.model.format_label(self.props.display_pattern)
 
     def _set_cover(self, cover: GdkPixbuf.Pixbuf | None = None):
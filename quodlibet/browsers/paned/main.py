@@ -23,8 +23,8 @@ from quodlibet.qltk.songlist import SongList
 from quodlibet.qltk.completion import LibraryTagCompletion
 from quodlibet.qltk.searchbar import SearchBarBox
 from quodlibet.qltk.x import ScrolledWindow, Align
+from quodlibet.query import StandingQuery
 from quodlibet.util.library import background_filter
-from quodlibet.util import connect_destroy
 from quodlibet.qltk.paned import ConfigMultiRHPaned
 
 from .prefs import PreferencesButton, ColumnMode
@@ -70,6 +70,7 @@ class PanedBrowser(Browser, util.InstanceTracker):
         self._register_instance()
 
         self._filter = lambda s: False
+        self._standing: StandingQuery | None = None
         self._library = library
 
         self.set_spacing(6)
@@ -95,10 +96,6 @@ class PanedBrowser(Browser, util.InstanceTracker):
         prefs = PreferencesButton(self)
         sbb.pack_start(prefs, False, True, 0)
 
-        connect_destroy(library, "changed", self.__changed)
-        connect_destroy(library, "added", self.__added)
-        connect_destroy(library, "removed", self.__removed)
-
         self.connect("destroy", self.__destroy)
 
         # contains the panes and the song list
@@ -113,6 +110,7 @@ class PanedBrowser(Browser, util.InstanceTracker):
 
     def __destroy(self, *args):
         del self._sb_box
+        self.__set_standing(None)
 
     def set_column_mode(self, mode):
         hor = Gtk.Orientation.HORIZONTAL
@@ -162,21 +160,30 @@ class PanedBrowser(Browser, util.InstanceTracker):
         self._panes[-1].uninhibit()
         self._panes[-1].get_selection().emit("changed")
 
-    def __added(self, library, songs):
-        songs = list(filter(self._filter, songs))
+    def __set_standing(self, standing):
+        if self._standing is not None:
+            self._standing.destroy()
+        self._standing = standing
+        if standing is not None:
+            standing.connect("entered", self.__added)
+            standing.connect("left", self.__removed)
+            standing.connect("changed", self.__changed)
+
+    def __added(self, standing, songs):
+        songs = list(songs)
         for pane in self._panes:
             pane.add(songs)
             songs = list(filter(pane.matches, songs))
 
-    def __removed(self, library, songs, remove_if_empty=True):
-        songs = list(filter(self._filter, songs))
+    def __removed(self, standing, songs, remove_if_empty=True):
+        songs = list(songs)
         for pane in self._panes:
             pane.remove(songs, remove_if_empty)
 
-    def __changed(self, library, songs):
-        self.__removed(library, songs, False)
-        self.__added(library, songs)
-        self.__removed(library, [])
+    def __changed(self, standing, songs):
+        self.__removed(standing, songs, False)
+        self.__added(standing, songs)
+        self.__removed(standing, [])
 
     def active_filter(self, song):
         # check with the search filter
@@ -196,7 +203,9 @@ class PanedBrowser(Browser, util.InstanceTracker):
         query = self._sb_box.get_query(star.keys())
         if query.is_parsable:
             self._filter = query.search
-            songs = list(filter(self._filter, self._library))
+            # keeps the panes up to date with the songs matching the query
+            self.__set_standing(StandingQuery(self._library, query))
+            songs = query.filter(self._library)
             bg = background_filter()
             if bg:
                 songs = list(filter(bg, songs))
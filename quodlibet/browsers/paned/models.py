@@ -6,7 +6,11 @@
 # the Free Software Foundation; either version 2 of the License, or
 # (at your option) any later version.
 
+import bisect
 import re
+
+from gi.repository import Gtk
+
 from quodlibet.browsers.paned.util import PaneConfig
 
 from quodlibet import _
@@ -16,6 +20,11 @@ from quodlibet.util import escape
 from quodlibet.util.collection import Collection
 
 
+MAX_ROW_UPDATES = 256
+"""Number of new rows up to which row references get kept up to date
+while adding songs, instead of getting recreated"""
+
+
 class BaseEntry(Collection):
     def __init__(self, key=None, songs=None):
         super().__init__()
@@ -110,6 +119,12 @@ class PaneModel(ObjectStore):
         super().__init__()
         self.__sort_cache = {}  # text to sort text cache
         self.__key_cache = {}  # song to key cache
+        # key to row reference of all SongsEntry rows, and their sort keys
+        # in model order. Built when first needed, after a clear()
+        # refilling the model doesn't have to keep them up to date.
+        self.__rows: dict[str, Gtk.TreeRowReference] | None = None
+        self.__sorts: list = []
+        self.__empty = set()  # keys of emptied rows not removed yet
         self.config = pattern_config
 
     def get_format_keys(self, song):
@@ -132,6 +147,31 @@ class PaneModel(ObjectStore):
             self.__sort_cache[text] = util.human_sort_key(text_stripped)
             return self.__sort_cache[text], text
 
+    def __get_rows(self):
+        if self.__rows is None:
+            rows = {}
+            sorts = []
+            for iter_, entry in self.iterrows():
+                if isinstance(entry, SongsEntry):
+                    path = self.get_path(iter_)
+                    rows[entry.key] = Gtk.TreeRowReference.new(self, path)
+                    if not isinstance(entry, UnknownEntry):
+                        sorts.append(entry.sort)
+            self.__rows = rows
+            self.__sorts = sorts
+        return self.__rows
+
+    def __has_all(self):
+        iter_ = self.get_iter_first()
+        return iter_ is not None and isinstance(self.get_value(iter_), AllEntry)
+
+    def clear(self):
+        # Drop the references first, or each deleted row updates them all
+        self.__rows = None
+        self.__sorts = []
+        self.__empty.clear()
+        super().clear()
+
     def get_songs(self, paths):
         """Get all songs for the given paths (from a selection e.g.)"""
 
@@ -159,31 +199,48 @@ class PaneModel(ObjectStore):
         """
 
         songs = set(songs)
+        rows = self.__get_rows()
 
+        # Only songs added before are in an entry, the ones of their keys
+        changed = {}
         for song in songs:
-            if song in self.__key_cache:
-                del self.__key_cache[song]
-
-        to_remove = []
-        for iter_, entry in self.iterrows():
-            if isinstance(entry, AllEntry):
+            keys = self.__key_cache.pop(song, None)
+            if keys is None:
                 continue
+            for key, _sort in keys or [("", None)]:
+                if key not in changed and key in rows:
+                    changed[key] = rows[key]
+
+        for key, ref in changed.items():
+            path = ref.get_path()
+            iter_ = self.get_iter(path)
+            entry = self.get_value(iter_)
             entry.songs -= songs
             entry.finalize()
-            self.row_changed(self.get_path(iter_), iter_)
+            self.row_changed(path, iter_)
             if not entry.songs:
-                to_remove.append(iter_)
+                self.__empty.add(key)
 
         if not remove_if_empty:
             return
 
         # remove from cache and the model
-        for iter_ in to_remove:
-            try:
-                key = self.get_value(iter_).key
-                del self.__sort_cache[key]
-            except KeyError:
-                pass
+        to_remove = []
+        for key in self.__empty:
+            ref = rows[key]
+            entry = self.get_value(self.get_iter(ref.get_path()))
+            if not entry.songs:
+                to_remove.append(key)
+        self.__empty.clear()
+
+        offset = int(self.__has_all())
+        for key in to_remove:
+            path = rows.pop(key).get_path()
+            iter_ = self.get_iter(path)
+            entry = self.get_value(iter_)
+            self.__sort_cache.pop(entry.key, None)
+            if not isinstance(entry, UnknownEntry):
+                del self.__sorts[path.get_indices()[0] - offset]
             self.remove(iter_)
 
         if len(self) == 1 and isinstance(self[0][0], AllEntry):
@@ -216,10 +273,11 @@ class PaneModel(ObjectStore):
                     collection[key] = (entry, hsort, bool(sort))
                     entry.songs.add(song)
 
-        items = sorted(collection.items(), key=lambda s: s[1][1], reverse=True)
-
         # fast path
         if not len(self):
+            self.__rows = None
+            self.__sorts = []
+            items = sorted(collection.items(), key=lambda s: s[1][1], reverse=True)
             if unknown.songs:
                 self.insert(0, [unknown])
             entries = []
@@ -230,46 +288,33 @@ class PaneModel(ObjectStore):
                 self.insert(0, [AllEntry()])
             return
 
-        # insert all new songs
-        key = None
-        val = None
-        sort_key = None
-
-        for iter_, entry in self.iterrows():
-            if not isinstance(entry, SongsEntry):
-                continue
-
-            if key is None:
-                if not items:
-                    break
-                key, (val, sort_key, srtp) = items.pop(-1)
-
-            if key == entry.key:  # Display strings the same
+        # merge into existing rows
+        rows = self.__get_rows()
+        new = []
+        for key, (val, _sort_key, _srtp) in collection.items():
+            ref = rows.get(key)
+            if ref is not None:  # Display strings the same
+                path = ref.get_path()
+                iter_ = self.get_iter(path)
+                entry = self.get_value(iter_)
                 entry.songs |= val.songs
                 entry.finalize()
-                self.row_changed(self.get_path(iter_), iter_)
-                key = None
-            elif sort_key < entry.sort:
-                self.insert_before(iter_, row=[val])
-                key = None
-
-        # the last one failed, add it again
-        if key:
-            items.append((key, (val, sort_key, srtp)))
-
-        # insert the left over songs
-        if items:
-            entries = []
-            for _key, (val, _srt, _srtp) in items:
-                entries.append(val)
-            if isinstance(self[-1][0], UnknownEntry):
-                self.insert_many(len(self) - 1, entries)
+                self.row_changed(path, iter_)
             else:
-                self.append_many(entries)
-
-        # check if All needs to be inserted
-        if len(self) > 1 and not isinstance(self[0][0], AllEntry):
-            self.insert(0, [AllEntry()])
+                new.append(val)
+
+        # and insert the rest at the position of their sort key
+        if len(new) > MAX_ROW_UPDATES:
+            # each insert updates all references, cheaper to recreate them
+            self.__rows = rows = None
+        sorts = self.__sorts
+        offset = int(self.__has_all())
+        for entry in new:
+            index = bisect.bisect_right(sorts, entry.sort)
+            sorts.insert(index, entry.sort)
+            iter_ = self.insert(index + offset, [entry])
+            if rows is not None:
+                rows[entry.key] = Gtk.TreeRowReference.new(self, self.get_path(iter_))
 
         # check if Unknown needs to be inserted or updated
         if unknown.songs:
@@ -280,7 +325,13 @@ class PaneModel(ObjectStore):
                 entry.finalize()
                 self.row_changed(last_row.path, last_row.iter)
             else:
-                self.append(row=[unknown])
+                iter_ = self.append(row=[unknown])
+                if rows is not None:
+                    rows[""] = Gtk.TreeRowReference.new(self, self.get_path(iter_))
+
+        # check if All needs to be inserted
+        if len(self) > 1 and not isinstance(self[0][0], AllEntry):
+            self.insert(0, [AllEntry()])
 
     def matches(self, paths, song):
         """If the song is included in the selection defined by the paths.
@@ -301,11 +352,10 @@ class PaneModel(ObjectStore):
         if not keys and isinstance(self[paths[-1]][0], UnknownEntry):
             return True
 
-        for path in paths:
-            entry = self.get_value(self.get_iter(path))
-            for key in keys:
-                if entry.key == (key[0] if isinstance(key, tuple) else key):
-                    return True
+        selected = {self.get_value(self.get_iter(path)).key for path in paths}
+        for key in keys:
+            if (key[0] if isinstance(key, tuple) else key) in selected:
+                return True
 
         return False
 
@@ -7,7 +7,7 @@
 # the Free Software Foundation; either version 2 of the License, or
 # (at your option) any later version.
 
-from gi.repository import Gtk, GLib
+from gi.repository import Gtk
 
 from quodlibet import app
 from quodlibet import config
@@ -22,6 +22,12 @@ from quodlibet.qltk.searchbar import MultiSearchBarBox
 from quodlibet.qltk.songlist import SongList
 from quodlibet.qltk.x import SymbolicIconImage, Align
 from quodlibet.qltk import Icons
+from quodlibet.query import StandingQuery
+from quodlibet.util import copool
+
+STREAMED_SONGS = 200
+"""Number of songs shown while still searching, to fill the view. The rest
+gets shown all at once when done, which is faster than adding them."""
 
 
 class PreferencesButton(Gtk.HBox):
@@ -71,6 +77,7 @@ class TrackList(Browser):
 
         self._query = None
         self._library = library
+        self.__searching = False
 
         completion = LibraryTagCompletion(library.librarian)
         self.accelerators = Gtk.AccelGroup()
@@ -105,19 +112,75 @@ class TrackList(Browser):
 
     def __destroy(self, *args):
         self._sb_box = None
+        self.__stop_search()
+        self.__set_standing(None)
 
     def __focus(self, widget, *args):
         qltk.get_top_parent(widget).songlist.grab_focus()
 
-    def _get_songs(self):
-        self._query = self._sb_box.get_query(SongList.star)
-        return self._query.filter(self._library) if self._query else None
+    def __set_standing(self, standing):
+        if self.standing_query is not None:
+            self.standing_query.destroy()
+        self.standing_query = standing
+        if standing is not None:
+            standing.connect("entered", self.__entered)
+            standing.connect("left", self.__left)
+
+    def __entered(self, standing, songs):
+        qltk.get_top_parent(self).songlist.add_songs(list(songs))
+
+    def __left(self, standing, songs):
+        qltk.get_top_parent(self).songlist.remove_songs(songs)
 
     def activate(self):
-        songs = self._get_songs()
-        if songs is not None:
+        self.__stop_search()
+        self.__set_standing(None)
+        self._query = self._sb_box.get_query(SongList.star)
+        if self._query is not None:
+            self.__searching = True
+            copool.add(self.__search, self._query)
+
+    def __stop_search(self):
+        if self.__searching:
+            copool.remove(self.__search)
+            self.__searching = False
+
+    def __search(self, query):
+        """Searches a chunk at a time and shows the first songs found while
+        searching, unless results get limited"""
+
+        library = self._library
+        generation = library.generation
+        limited = self._sb_box.limited
+        songs = []
+        shown = 0
+        for chunk in query.filter_chunks(library):
+            songs.extend(chunk)
+            if chunk and not limited and shown < STREAMED_SONGS:
+                if shown:
+                    chunk = chunk[: STREAMED_SONGS - shown]
+                    qltk.get_top_parent(self).songlist.add_songs(chunk)
+                else:
+                    self.songs_selected(list(chunk))
+                shown += len(chunk)
+            yield True
+        self.__searching = False
+
+        complete = 0 < shown == len(songs)
+        if library.generation != generation:
+            # changed while searching, start over with the results updated
+            songs = query.filter(library)
+            complete = False
+        if limited:
             songs = self._sb_box.limit(songs)
-            GLib.idle_add(self.songs_selected, songs)
+        if not complete:
+            self.songs_selected(songs)
+
+        if limited or query.matches_all:
+            self.__set_standing(None)
+        else:
+            # all matching songs get shown, so keep them up to date
+            self.__set_standing(StandingQuery(library, query, songs))
 
     def __text_parse(self, bar, text):
         self.activate()
@@ -60,6 +60,19 @@ INITIAL: dict[str, dict[str, str]] = {
         "refresh_on_start": "true",
         # Watch all library files / directories for changes
         "watch": "false",
+        # Watch through a single inotify instance (Linux only), handling
+        # bursts of changes in batches instead of one file at a time
+        "watch_batched": "false",
+        # Number of processes reading tags when scanning for new files,
+        # 0 or 1 reads them in the main process
+        "scan_workers": "0",
+        # Keep a memory mapped cache of the library next to the library file
+        # to speed up startup, see quodlibet.library.columnar
+        "columnar_cache": "false",
+        # When refreshing, skip checking songs in and looking for new files in
+        # folders that didn't change since the last scan. Misses files edited
+        # in place by other programs
+        "skip_unchanged_dirs": "false",
     },
     # State about the player, to restore on startup
     "memory": {
@@ -116,6 +129,19 @@ INITIAL: dict[str, dict[str, str]] = {
         "background": "",
         # characters ignored in queries
         "ignored_characters": "",
+        # Keep an index of the words in searched tags, so searches only
+        # check songs that can match, see quodlibet.query.TextIndex
+        "search_index": "false",
+        # Keep the values of numeric tags used in searches in arrays, so
+        # comparisons don't have to go through every song,
+        # see quodlibet.query.NumericColumns
+        "numeric_columns": "true",
+        # Keep the folded values of searched tags, so searching for plain
+        # text doesn't need regular expressions, see quodlibet.query.FoldedTags
+        "folded_tags": "true",
+        # Share the results of recent searches between browsers and update
+        # them with changed songs, see quodlibet.query.QueryCache
+        "query_cache": "true",
         # album list
         "albums": "",
         # album sorting mode, default is title
@@ -317,6 +343,12 @@ def init(filename=None):
                 pass
 
 
+def get_filename():
+    """The filename last used for loading, or None"""
+
+    return _filename
+
+
 def save(filename=None):
     """Writes the active config to filename, ignoring all possible errors.
 
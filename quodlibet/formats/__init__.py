@@ -16,7 +16,12 @@ from ._audio import (
 )
 from ._image import EmbeddedImage, APICType
 from ._misc import AudioFileError, init, MusicFile, types, loaders, filter, mimes
-from ._serialize import load_audio_files, dump_audio_files, SerializationError
+from ._serialize import (
+    load_audio_files,
+    dump_audio_files,
+    snapshot_audio_files,
+    SerializationError,
+)
 
 (
     AudioFile,
@@ -36,4 +41,4 @@ from ._serialize import load_audio_files, dump_audio_files, SerializationError
     loaders,
     filter,
 )
-mimes, load_audio_files, dump_audio_files, SerializationError
+mimes, load_audio_files, dump_audio_files, snapshot_audio_files, SerializationError
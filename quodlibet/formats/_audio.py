@@ -38,6 +38,7 @@ from quodlibet.util.string.date import format_date
 from quodlibet.util.tags import TAG_ROLES, TAG_TO_SORT
 
 from ._image import ImageContainer
+from ._intern import intern_song
 from ._misc import AudioFileError, translate_errors
 
 translate_errors  # noqa
@@ -99,6 +100,9 @@ PEOPLE_SORT = [TAG_TO_SORT.get(k, k) for k in PEOPLE]
 VARIOUS_ARTISTS_VALUES = "V.A.", "various artists", "Various Artists"
 """Values for ~people representing lots of people, most important last"""
 
+UNCACHED_SORT_TAGS = {"~playlists", "~lyrics"}
+"""Tags which can change without the song changing"""
+
 PATTERN_REGEX = re.compile(r"[^\\]<[^" + re.escape(os.sep) + r"]*[^\\]>")
 
 
@@ -207,7 +211,8 @@ class AudioFile(dict, ImageContainer, HasKey):
     @staticmethod
     def sort_by_func(tag):
         """Returns a fast sort function for a specific tag (or pattern).
-        Some keys are already in the sort cache, so we can use them."""
+        Some keys are already in the sort cache, so we can use them.
+        Keys of other text tags get cached per song, until it changes."""
 
         def artist_sort(song):
             return song.sort_key[1][2]
@@ -216,11 +221,32 @@ class AudioFile(dict, ImageContainer, HasKey):
             return lambda song: human(tag(song))
         if tag == "artistsort":
             return artist_sort
-        if tag in FILESYSTEM_TAGS:
-            return lambda song: fsn2text(song(tag))
         if tag.startswith("~#") and "~" not in tag[2:]:
             return lambda song: song(tag, 0)
-        return lambda song: human(song(tag))
+        if tag in FILESYSTEM_TAGS:
+
+            def func(song):
+                return fsn2text(song(tag))
+        else:
+
+            def func(song):
+                return human(song(tag))
+
+        if not UNCACHED_SORT_TAGS.isdisjoint(util.tagsplit(tag)):
+            return func
+
+        def cached_sort(song):
+            keys = song._sort_keys
+            if tag not in keys:
+                keys[tag] = func(song)
+            return keys[tag]
+
+        return cached_sort
+
+    @util.cached_property
+    def _sort_keys(self) -> dict[str, Any]:
+        """Sort keys by tag, see `sort_by_func`"""
+        return {}
 
     def __getstate__(self):
         """Don't pickle anything from __dict__"""
@@ -248,6 +274,7 @@ class AudioFile(dict, ImageContainer, HasKey):
         pop = self.__dict__.pop
         pop("album_key", None)
         pop("sort_key", None)
+        pop("_sort_keys", None)
 
     def __delitem__(self, key):
         dict.__delitem__(self, key)
@@ -255,6 +282,7 @@ class AudioFile(dict, ImageContainer, HasKey):
         pop = self.__dict__.pop
         pop("album_key", None)
         pop("sort_key", None)
+        pop("_sort_keys", None)
 
     @property
     def key(self) -> K:  # type: ignore
@@ -318,6 +346,7 @@ class AudioFile(dict, ImageContainer, HasKey):
             raise
         else:
             self.update(saved)
+            intern_song(self)
 
     def realkeys(self):
         """Returns a list of keys that are not internal, i.e. they don't
@@ -0,0 +1,92 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""Sharing tag keys and repeated tag values between songs.
+
+Unpickling creates new key strings for every song, and every song of an
+album gets its own copy of the album, artist, genre, ... values.
+Interning those makes all songs reference the same objects, which for
+large libraries saves a good part of the memory used by songs.
+
+Only values of tags that typically repeat across songs are interned,
+as the tables keep their values alive for the lifetime of the process.
+Ones that are close to unique per song, like ~#added, ~#mtime or
+~#length, would only grow them.
+"""
+
+import sys
+
+INTERNED_TAGS = frozenset(
+    [
+        "~mountpoint",
+        "~encoding",
+        "album",
+        "albumartist",
+        "albumartistsort",
+        "albumsort",
+        "artist",
+        "artistsort",
+        "composer",
+        "conductor",
+        "copyright",
+        "date",
+        "discnumber",
+        "encodedby",
+        "encoder",
+        "genre",
+        "grouping",
+        "label",
+        "labelid",
+        "language",
+        "media",
+        "musicbrainz_albumartistid",
+        "musicbrainz_albumid",
+        "musicbrainz_artistid",
+        "musicbrainz_releasegroupid",
+        "organization",
+        "originaldate",
+        "performer",
+        "releasecountry",
+        "replaygain_album_gain",
+        "replaygain_album_peak",
+        "totaldiscs",
+        "totaltracks",
+        "tracknumber",
+        "website",
+        "~#bitdepth",
+        "~#bitrate",
+        "~#channels",
+        "~#rating",
+        "~#samplerate",
+    ]
+)
+"""Tags whose values get interned"""
+
+# per type, as 1 == 1.0 and they would replace each other otherwise
+_tables: dict[type, dict] = {str: {}, int: {}, float: {}}
+
+
+def intern_item(key, value):
+    """Returns the shared (key, value) for a song tag"""
+
+    if type(key) is str:
+        key = sys.intern(key)
+        if key in INTERNED_TAGS:
+            table = _tables.get(type(value))
+            if table is not None:
+                value = table.setdefault(value, value)
+    return key, value
+
+
+def intern_song(song):
+    """Replaces the keys and values of the song with shared ones, in place.
+
+    Bypasses __setitem__ like load_audio_files() does.
+    """
+
+    items = [intern_item(key, value) for key, value in dict.items(song)]
+    dict.clear(song)
+    dict.update(song, items)
+    return song
@@ -16,6 +16,8 @@ from quodlibet.util import print_w, print_d, reraise
 from quodlibet.util.importhelper import load_dir_modules
 from quodlibet.const import MinVersions
 
+from ._intern import intern_song
+
 
 mimes = set()
 """A set of supported mime types"""
@@ -112,7 +114,7 @@ def MusicFile(filename):  # noqa
     loader = get_loader(filename)
     if loader is not None:
         try:
-            return loader(filename)
+            return intern_song(loader(filename))
         except AudioFileError:
             print_w(f"Error loading {filename!r}")
             util.print_exc()
@@ -13,6 +13,7 @@ from quodlibet.fsn import bytes2fsn, fsn2bytes
 from quodlibet.util.picklehelper import pickle_loads, pickle_dumps
 from quodlibet.util import is_windows
 from ._audio import AudioFile
+from ._intern import intern_item
 
 
 class SerializationError(Exception):
@@ -53,6 +54,7 @@ def _py2_to_py3(items):
                 except UnicodeEncodeError:
                     v = v.encode("utf-8", "replace").decode("utf-8")
 
+            k, v = intern_item(k, v)
             i[k] = v
 
     return items
@@ -76,6 +78,22 @@ def _py3_to_py2(items):
     return new_list
 
 
+def snapshot_audio_files(items):
+    """Returns shallow copies of the AudioFiles.
+
+    All tag values are immutable, so the copies can be serialized in
+    another thread while the originals keep changing.
+    """
+
+    copies = []
+    for item in items:
+        # bypass __setitem__, like load_audio_files() does
+        copy = dict.__new__(type(item))
+        dict.update(copy, item)
+        copies.append(copy)
+    return copies
+
+
 def load_audio_files(data, process=True):
     """unpickles the item list and if some class isn't found unpickle
     as a dict and filter them out afterwards.
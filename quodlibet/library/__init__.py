@@ -17,6 +17,8 @@ also be queried in various ways.
 import time
 
 from quodlibet import print_d, print_w
+from quodlibet.library.base import PicklingMixin
+from quodlibet.library.journal import JOURNAL_SUFFIX
 from quodlibet.library.librarians import SongLibrarian
 from quodlibet.library.song import SongFileLibrary, SongLibrary
 
@@ -36,23 +38,29 @@ def init(cache_fn=None):
     return library
 
 
-def save(save_period=None):
+def save(save_period=None, background=False):
     """Save all registered libraries that have a filename and are marked dirty.
 
     If `save_period` (seconds) is given,
     the library will only be saved if it hasn't been in the last `save_period` seconds.
+    If `background` is True, library files get written in a thread,
+    see `PicklingMixin.save`.
     """
 
     print_d("Saving all libraries...")
 
     librarian = SongFileLibrary.librarian
     for lib in librarian.libraries.values():
+        if not background and isinstance(lib, PicklingMixin):
+            lib.wait_for_save()
         filename = lib.filename
         if not filename or not lib.dirty:
             continue
 
-        if not save_period or abs(time.time() - mtime(filename)) > save_period:
-            lib.save()
+        # appending to the journal doesn't touch the library file itself
+        last_saved = max(mtime(filename), mtime(filename + JOURNAL_SUFFIX))
+        if not save_period or abs(time.time() - last_saved) > save_period:
+            lib.save(background=background)
 
 
 def destroy() -> None:
@@ -43,15 +43,21 @@ class AlbumLibrary(Library[AlbumKey, Album]):
     def __add(self, items):
         changed = set()
         new = set()
+        by_album: dict[Album, list] = {}
         for song in items:
             key = song.album_key
             if key in self._contents:
-                changed.add(self._contents[key])
+                album = self._contents[key]
+                changed.add(album)
             else:
                 album = Album(song)
                 self._contents[key] = album
                 new.add(album)
-            self._contents[key].songs.add(song)
+            by_album.setdefault(album, []).append(song)
+
+        # updates the values of existing albums instead of recomputing them
+        for album, songs in by_album.items():
+            album.add(songs)
 
         changed -= new
         return changed, new
@@ -59,9 +65,6 @@ class AlbumLibrary(Library[AlbumKey, Album]):
     def __added(self, library, items, signal=True):
         changed, new = self.__add(items)
 
-        for album in changed:
-            album.finalize()
-
         if signal:
             if new:
                 self.emit("added", new)
@@ -69,22 +72,19 @@ class AlbumLibrary(Library[AlbumKey, Album]):
                 self.emit("changed", changed)
 
     def __removed(self, library, items):
-        changed = set()
         removed = set()
+        by_album: dict[Album, list] = {}
         for song in items:
-            key = song.album_key
-            album = self._contents[key]
-            album.songs.remove(song)
-            changed.add(album)
+            album = self._contents[song.album_key]
+            by_album.setdefault(album, []).append(song)
+
+        for album, songs in by_album.items():
+            album.remove(songs)
             if not album.songs:
                 removed.add(album)
-                del self._contents[key]
-
-        changed -= removed
-
-        for album in changed:
-            album.finalize()
+                del self._contents[album.key]
 
+        changed = set(by_album) - removed
         if removed:
             self.emit("removed", removed)
         if changed:
@@ -94,41 +94,44 @@ class AlbumLibrary(Library[AlbumKey, Album]):
         """Album keys could change between already existing ones... so we
         have to do it the hard way and search by id."""
         print_d("Updating affected albums for %d items" % len(items))
-        changed = set()
-        removed = set()
+        changed: dict[Album, list] = {}
+        left: dict[Album, list] = {}
         to_add = []
         for song in items:
             # in case the key hasn't changed
             key = song.album_key
             if key in self._contents and song in self._contents[key].songs:
-                changed.add(self._contents[key])
+                changed.setdefault(self._contents[key], []).append(song)
             else:  # key changed... look for it in each album
                 to_add.append(song)
                 for album in self._contents.values():
                     if song in album.songs:
-                        album.songs.remove(song)
-                        if not album.songs:
-                            removed.add(album)
-                        else:
-                            changed.add(album)
+                        left.setdefault(album, []).append(song)
                         break
 
+        removed = set()
+        for album, songs in left.items():
+            album.remove(songs)
+            if not album.songs:
+                removed.add(album)
+
+        for album, songs in changed.items():
+            album.changed(songs)
+
         # get new albums and changed ones because keys could have changed
         add_changed, new = self.__add(to_add)
-        changed |= add_changed
+        changed_albums = set(changed) | set(left) | add_changed
 
         # check if albums that were empty at some point are still empty
         for album in removed:
             if not album.songs:
                 del self._contents[album.key]
-                changed.discard(album)
-
-        for album in changed:
-            album.finalize()
+                changed_albums.discard(album)
+        changed_albums -= new
 
         if removed:
             self.emit("removed", removed)
-        if changed:
-            self.emit("changed", changed)
+        if changed_albums:
+            self.emit("changed", changed_albums)
         if new:
             self.emit("added", new)
@@ -11,8 +11,9 @@
 import os
 import shutil
 import time
-from typing import TypeVar, Optional, Generic
+from typing import NamedTuple, TypeVar, Optional, Generic
 from collections.abc import (
+    Callable,
     Collection,
     Sequence,
     Iterable,
@@ -25,12 +26,20 @@ from gi.repository import GObject
 
 import quodlibet
 from quodlibet import util
-from quodlibet.formats import load_audio_files, dump_audio_files, SerializationError
+from quodlibet.formats import (
+    load_audio_files,
+    dump_audio_files,
+    snapshot_audio_files,
+    SerializationError,
+)
 from quodlibet.formats._audio import HasKey
+from quodlibet.library.dirindex import DirectoryIndex
+from quodlibet.library.journal import LibraryJournal
 from quodlibet.util.atomic import atomic_save
 from quodlibet.util.collections import DictMixin
 from quodlibet.util.dprint import print_d, print_w
 from quodlibet.util.path import mkdir, is_hidden
+from quodlibet.util.thread import Cancellable, call_async
 from quodlibet.fsn import fsnative, path2fsn
 
 K = TypeVar("K", covariant=True)
@@ -65,6 +74,10 @@ class Library(GObject.GObject, DictMixin, Generic[K, V]):
 
     dirty = False
 
+    generation = 0
+    """Increases with every added, changed or removed signal, so users can
+    tell if the contents changed since they last looked"""
+
     def __init__(self, name: str | None = None):
         super().__init__()
         self._contents: MutableMapping[K, V] = {}
@@ -75,6 +88,11 @@ class Library(GObject.GObject, DictMixin, Generic[K, V]):
     def __str__(self):
         return f"<{type(self).__name__} @ {hex(id(self))}>"
 
+    def emit(self, signal_name, *args):
+        if signal_name in ("added", "changed", "removed"):
+            self.generation += 1
+        return super().emit(signal_name, *args)
+
     def destroy(self):
         if self.librarian is not None and self._name is not None:
             self.librarian._unregister(self, self._name)
@@ -245,10 +263,18 @@ def _load_items(filename) -> Iterable[V]:
 
 
 class PicklingMixin:
-    """A mixin to provide persistence of a library by pickling to disk"""
+    """A mixin to provide persistence of a library by pickling to disk.
+
+    Once loaded, changes are tracked through the library signals and
+    saving only appends them to a journal next to the pickle, see
+    `LibraryJournal`. The pickle gets rewritten once the journal grows
+    too large.
+    """
 
     filename = None
 
+    _journal: LibraryJournal | None = None
+
     def load(self, filename):
         """Load a library from a file, containing a picked list.
 
@@ -258,43 +284,280 @@ class PicklingMixin:
         self.filename = filename
         print_d(f"Loading contents of {filename!r}.", self)
 
-        items = _load_items(filename)
+        contents = self._load_snapshot(filename)
+        journal = LibraryJournal(filename)
+        journal.replay(contents)
+        self._load_contents(contents)
+        self._start_journal(journal)
+
+        print_d(f"Done loading contents of {filename!r}", self._name)
+
+    def _load_snapshot(self, filename) -> MutableMapping:
+        """Returns a mapping of key to item for the library file"""
+
+        return {item.key: item for item in _load_items(filename)}
 
+    def _load_contents(self, contents: MutableMapping) -> None:
         # this loads all items without checking their validity, but makes
         # sure that non-mounted items are masked
-        self._load_init(items)
+        self._load_init(contents.values())
 
-        print_d(f"Done loading contents of {filename!r}", self._name)
+    def _get_snapshot_content(self, filename) -> Sequence:
+        """The items to write to the library file `filename`"""
+
+        return self.get_content()
+
+    def _get_snapshot_saved(self, filename) -> Callable[[list], None] | None:
+        """Called in the main thread before the whole library content gets
+        saved to filename. Returns a function to call with the content once
+        it's saved, which might happen in a thread, or None."""
+
+        return None
+
+    def _saved(self, filename) -> None:
+        """Called in the main thread once all content got saved to filename,
+        also after saving in the background"""
+
+    def _start_journal(self, journal):
+        if self._journal is None:
+            self.connect("added", self.__journal_changed)
+            self.connect("changed", self.__journal_changed)
+            self.connect("removed", self.__journal_removed)
+        self._journal = journal
+        self._journal_dirty: set = set()
+        self._journal_removed: set = set()
+
+    def __journal_changed(self, library, items):
+        self._journal_dirty.update(items)
+
+    def __journal_removed(self, library, items):
+        for item in items:
+            self._journal_dirty.discard(item)
+            self._journal_removed.add(item.key)
+
+    def _journal_moved(self, old_key):
+        """To be called if an item got a new key without being removed"""
 
-    def save(self, filename=None):
-        """Save the library to the given filename, or the default if `None`"""
+        if self._journal is not None:
+            self._journal_removed.add(old_key)
+
+    def _journal_silent(self, items=(), removed_keys=()):
+        """To be called for items added or removed without a signal"""
+
+        if self._journal is not None:
+            self._journal_dirty.update(items)
+            self._journal_removed.update(removed_keys)
+
+    def _is_persisted(self, key) -> bool:
+        """If an item with the key is part of the saved content"""
+
+        return key in self._contents
+
+    def save(self, filename=None, background=False):
+        """Save the library to the given filename, or the default if `None`
+
+        If `background` is True and the whole library has to be written,
+        only a snapshot gets taken here and the rest happens in a thread.
+        Saving again while that is still running is skipped in the
+        background case and waits for it otherwise.
+        """
 
         if filename is None:
             filename = self.filename
 
+        if self._pending_save is not None:
+            future = self._pending_save[0]
+            if background and not future.done():
+                print_d("Still saving in the background, skipping", self._name)
+                return
+            self.wait_for_save()
+
+        journal = self._journal
+        if (
+            journal is not None
+            and filename == journal.base_filename
+            and not journal.needs_compaction()
+        ):
+            try:
+                self._save_journal(journal)
+            except (SerializationError, OSError):
+                util.print_exc()
+            else:
+                self._saved(filename)
+                return
+
+        self._save_snapshot(filename, background)
+
+    def wait_for_save(self):
+        """Blocks until a background save is done"""
+
+        if self._pending_save is not None:
+            self._finish_save()
+
+    def _save_journal(self, journal):
+        """Append all changes since the last save to the journal"""
+
+        start = time.monotonic()
+        put = [item for item in self._journal_dirty if self._is_persisted(item.key)]
+        deleted = self._journal_removed.difference(item.key for item in put)
+        deleted = [key for key in deleted if not self._is_persisted(key)]
+        if put or deleted:
+            journal.append(put, deleted)
+        self._journal_dirty.clear()
+        self._journal_removed.clear()
+        self.dirty = False
+        duration = time.monotonic() - start
+        print_d(
+            f"Journaled {len(put)} changed and {len(deleted)} removed item(s) "
+            f"in {duration:.3f}s",
+            self._name,
+        )
+
+    _pending_save: tuple | None = None
+
+    save_times: "SaveTimes | None" = None
+    """Timings of the last complete save of the library file"""
+
+    def _save_snapshot(self, filename, background=False):
+        """Rewrite the whole library pickle"""
+
         print_d(f"Saving contents to {filename!r}", self._name)
+        start = time.monotonic()
+        content = snapshot_audio_files(self._get_snapshot_content(filename))
+        snapshot_time = time.monotonic() - start
+
+        # changes from now on go to the journal of the new file
+        journal = self._journal
+        taken = None
+        if journal is not None and filename == journal.base_filename:
+            taken = (self._journal_dirty, self._journal_removed)
+            self._journal_dirty = set()
+            self._journal_removed = set()
+        self.dirty = False
+        saved = self._get_snapshot_saved(filename)
+
+        if background:
+            cancellable = Cancellable()
+            future = call_async(
+                self._write_snapshot,
+                cancellable,
+                self._on_snapshot_written,
+                args=(filename, content, saved),
+            )
+            self._pending_save = (future, cancellable, snapshot_time, taken, filename)
+        else:
+            self._pending_save = (None, None, snapshot_time, taken, filename)
+            self._finish_save(self._write_snapshot(filename, content, saved))
+
+    def _write_snapshot(self, filename, content, saved=None):
+        """Writes the snapshot, might be called in a thread.
+
+        Returns (success, serialization time, writing time)
+        """
+
         start = time.monotonic()
         try:
-            dirname = os.path.dirname(filename)
-            mkdir(dirname)
-            content = self.get_content()
-            with atomic_save(filename, "wb") as fileobj:
-                fileobj.write(dump_audio_files(content))
+            data = dump_audio_files(content)
         except SerializationError:
-            # Can happen when we try to pickle while the library is being
-            # modified, like in the periodic 15min save.
-            # Ignore, as it should try again later or on program exit.
             util.print_exc()
+            return False, time.monotonic() - start, 0.0
+        serialize_time = time.monotonic() - start
+
+        start = time.monotonic()
+        try:
+            mkdir(os.path.dirname(filename))
+            with atomic_save(filename, "wb") as fileobj:
+                fileobj.write(data)
         except OSError:
             print_w(f"Couldn't save library to path {filename!r}")
+            return False, serialize_time, time.monotonic() - start
+        if saved is not None:
+            saved(content)
+        return True, serialize_time, time.monotonic() - start
+
+    def _on_snapshot_written(self, result):
+        self._finish_save(result)
+
+    def _finish_save(self, result=None):
+        """Applies the result of the pending snapshot save, waiting for it
+        if it's not there yet"""
+
+        future, cancellable, snapshot_time, taken, filename = self._pending_save
+        if result is None:
+            try:
+                result = future.result()
+            except Exception:
+                result = (False, 0.0, 0.0)
+            # handled here, skip the main loop callback
+            cancellable.cancel()
+        self._pending_save = None
+
+        success, serialize_time, write_time = result
+        if success:
+            if taken is not None:
+                self._journal.reset()
         else:
-            self.dirty = False
-        duration = time.monotonic() - start
-        print_d(f"Saved contents to {filename!r} in {duration:.1f}s", self._name)
+            self.dirty = True
+            if taken is not None:
+                dirty, removed = taken
+                dirty.update(self._journal_dirty)
+                removed.update(self._journal_removed)
+                self._journal_dirty, self._journal_removed = dirty, removed
+
+        times = SaveTimes(snapshot_time, serialize_time, write_time)
+        if success:
+            self.save_times = times
+        print_d(
+            f"Saved contents in {times.total:.2f}s (snapshot {snapshot_time:.3f}s, "
+            f"serialization {serialize_time:.2f}s, writing {write_time:.2f}s)"
+            if success
+            else "Saving contents failed",
+            self._name,
+        )
+        if success:
+            self._saved(filename)
+
+
+class SaveTimes(NamedTuple):
+    """Seconds spent in the steps of saving the library"""
+
+    snapshot: float
+    """Copying the content, in the main thread"""
+    serialize: float
+    write: float
+
+    @property
+    def total(self) -> float:
+        return self.snapshot + self.serialize + self.write
+
+
+def _child_path(real_dir: fsnative, name: fsnative) -> fsnative:
+    path = os.path.join(real_dir, name)
+    # junctions aren't symlinks, but are resolved by realpath()
+    return os.path.realpath(path) if util.is_windows() else path
+
+
+def _exclude_names(
+    prefixes: Iterable[fsnative], exclude: tuple[fsnative, ...]
+) -> tuple[fsnative, ...] | None:
+    """For directories with the given path prefixes (ending with a separator)
+    returns the name prefixes of the files in it that are excluded, or None
+    if the whole directory is.
+    """
+
+    names = []
+    for prefix in prefixes:
+        if prefix.startswith(exclude):
+            return None
+        names.extend(p[len(prefix) :] for p in exclude if p.startswith(prefix))
+    return tuple(names)
 
 
 def iter_paths(
-    root: fsnative, exclude: Iterable[fsnative] | None = None, skip_hidden: bool = True
+    root: fsnative,
+    exclude: Iterable[fsnative] | None = None,
+    skip_hidden: bool = True,
+    index: DirectoryIndex | None = None,
 ) -> Generator[fsnative, None, None]:
     """Yields paths contained in root (symlinks dereferenced)
 
@@ -308,34 +571,84 @@ def iter_paths(
         exclude: ignore any of these
         skip_hidden: Ignore files which are hidden or where any
             of the parent directories are hidden.
+        index: if given, directories that didn't change since the index
+            was recorded are skipped, and the index gets updated
     Yields:
         fsnative: absolute dereferenced paths
     """
 
     assert isinstance(root, fsnative)
-    exclude = exclude or []
+    exclude = tuple(exclude or [])
     assert all(isinstance(p, fsnative) for p in exclude)
     assert os.path.abspath(root)
 
-    def skip(path):
-        if skip_hidden and is_hidden(path):
-            return True
-        # FIXME: normalize paths..
-        return any(path.startswith(p) for p in exclude)
-
     if skip_hidden and is_hidden(root):
         return
 
-    for path, dnames, fnames in os.walk(root):
-        if skip_hidden:
-            dnames[:] = [
-                d for d in dnames if not is_hidden(path2fsn(os.path.join(path, d)))
-            ]
-        for filename in fnames:
-            full_filename = path2fsn(os.path.join(path, filename))
-            if skip(full_filename):
+    # Walk the given and the dereferenced path side by side. As directory
+    # symlinks aren't followed, only file symlinks need a realpath() call.
+    stack = [(root, path2fsn(os.path.realpath(root)))]
+    while stack:
+        path, real_path = stack.pop()
+        prefixes = {os.path.join(path, ""), os.path.join(real_path, "")}
+        excluded = _exclude_names(prefixes, exclude)
+        if excluded is None:
+            continue
+
+        stat = None
+        if index is not None:
+            try:
+                stat = os.stat(real_path)
+            except OSError:
                 continue
-            full_filename = path2fsn(os.path.realpath(full_filename))
-            if skip(full_filename):
+            record = index.get(real_path, stat)
+            if record is not None:
+                index.skipped(real_path, record)
+                stack.extend(
+                    (os.path.join(path, name), _child_path(real_path, name))
+                    for name in reversed(record.subdirs)
+                )
                 continue
-            yield full_filename  # type: ignore
+
+        files: list[os.DirEntry] = []
+        dirs: list[fsnative] = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    if not is_dir:
+                        files.append(entry)
+                    elif entry.is_symlink():
+                        # not followed, like os.walk()
+                        continue
+                    elif not (skip_hidden and is_hidden(entry.path)):
+                        dirs.append(entry.name)
+        except OSError:
+            continue
+
+        if stat is not None:
+            index.update(real_path, stat, len(files), dirs)
+
+        for entry in files:
+            if skip_hidden and is_hidden(entry.path):
+                continue
+            name = entry.name
+            if excluded and name.startswith(excluded):
+                continue
+            if entry.is_symlink():
+                full_path = path2fsn(os.path.realpath(entry.path))
+                if skip_hidden and is_hidden(full_path):
+                    continue
+                if full_path.startswith(exclude):
+                    continue
+                yield full_path
+            else:
+                yield os.path.join(real_path, name)
+
+        stack.extend(
+            (os.path.join(path, name), _child_path(real_path, name))
+            for name in reversed(dirs)
+        )
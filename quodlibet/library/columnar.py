@@ -0,0 +1,392 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""A memory mapped cache of the song library for fast startup.
+
+Unlike the library pickle, the cache can be opened without reading the
+songs: all strings are stored once in a string table, all distinct tag
+values once in a value table, and each song is a row of (tag, value)
+references. The key, mount point and class of each song are stored as
+dense columns so the library can be set up using those alone.
+Songs get turned into `AudioFile` instances when first accessed, see
+`LazySongDict`.
+
+The cache belongs to a specific library pickle and gets ignored once
+that one changes.
+"""
+
+import importlib
+import itertools
+import mmap
+import struct
+import sys
+from array import array
+from collections import defaultdict
+from collections.abc import KeysView
+
+from quodlibet.formats import AudioFile, SerializationError
+from quodlibet.library.journal import snapshot_id
+from quodlibet.util.atomic import atomic_save
+
+CACHE_SUFFIX = ".columns"
+"""Appended to the library filename to get the cache filename"""
+
+_MAGIC = b"QLCOLS01"
+_HEADER = struct.Struct("=8sBxxxxxxxqqQQQQQ")
+
+_STR, _INT, _FLOAT = range(3)
+_KINDS = {str: _STR, int: _INT, float: _FLOAT}
+_NONE = 0xFFFFFFFF
+
+assert array("I").itemsize == 4
+assert array("Q").itemsize == 8
+
+
+def _pad(data):
+    return data + b"\x00" * (-len(data) % 8)
+
+
+class _Tables:
+    """Interns strings and values while writing"""
+
+    def __init__(self):
+        self.strings = {}
+        self.string_offsets = array("Q", [0])
+        self.blob = bytearray()
+        self.values = {}
+        self.kinds = bytearray()
+        self.payload = bytearray()
+
+    def string(self, text):
+        try:
+            return self.strings[text]
+        except KeyError:
+            self.blob += text.encode("utf-8", "surrogatepass")
+            self.string_offsets.append(len(self.blob))
+            index = self.strings[text] = len(self.strings)
+            return index
+
+    def value(self, value):
+        kind = _KINDS.get(type(value))
+        if kind is None:
+            raise SerializationError(f"Can't store {type(value).__name__} values")
+        # 1 == 1.0, so the type has to be part of the key
+        vkey = (kind, value)
+        try:
+            return self.values[vkey]
+        except KeyError:
+            pass
+        if kind == _STR:
+            data = struct.pack("=q", self.string(value))
+        elif kind == _INT:
+            data = struct.pack("=q", value)
+        else:
+            data = struct.pack("=d", value)
+        self.kinds.append(kind)
+        self.payload += data
+        index = self.values[vkey] = len(self.values)
+        return index
+
+
+def dump_cache(filename, snapshot_filename, songs):
+    """Writes the songs to a cache belonging to the library pickle at
+    `snapshot_filename`.
+
+    Raises:
+        SerializationError
+        OSError
+    """
+
+    tables = _Tables()
+    classes = {}
+    song_classes = array("I")
+    song_keys = array("I")
+    song_mounts = array("I")
+    row_offsets = array("Q", [0])
+    pair_tags = array("I")
+    pair_values = array("I")
+
+    try:
+        for song in songs:
+            kind = type(song)
+            name = f"{kind.__module__}:{kind.__qualname__}"
+            song_classes.append(classes.setdefault(name, len(classes)))
+            song_keys.append(tables.value(song.key))
+            mountpoint = song.get("~mountpoint")
+            song_mounts.append(
+                _NONE if mountpoint is None else tables.value(mountpoint)
+            )
+            for tag, value in song.items():
+                pair_tags.append(tables.string(tag))
+                pair_values.append(tables.value(value))
+            row_offsets.append(len(pair_tags))
+    except (OverflowError, struct.error) as e:
+        raise SerializationError(e) from e
+
+    class_names = array("I", [tables.string(name) for name in classes])
+    size, mtime_ns = snapshot_id(snapshot_filename) or (-1, -1)
+    header = _HEADER.pack(
+        _MAGIC,
+        sys.byteorder == "little",
+        size,
+        mtime_ns,
+        len(tables.strings),
+        len(tables.values),
+        len(classes),
+        len(song_keys),
+        len(pair_tags),
+    )
+    sections = [
+        header,
+        tables.string_offsets.tobytes(),
+        tables.blob,
+        tables.kinds,
+        tables.payload,
+        class_names.tobytes(),
+        song_classes.tobytes(),
+        song_keys.tobytes(),
+        song_mounts.tobytes(),
+        row_offsets.tobytes(),
+        pair_tags.tobytes(),
+        pair_values.tobytes(),
+    ]
+    with atomic_save(filename, "wb") as fileobj:
+        for data in sections:
+            fileobj.write(_pad(bytes(data)))
+
+
+class ColumnarCache:
+    """Read access to a cache written by `dump_cache`"""
+
+    def __init__(self, filename, snapshot_filename):
+        """Raises OSError if it can't be read and SerializationError if it's
+        invalid or doesn't belong to the given library pickle
+        """
+
+        with open(filename, "rb") as fileobj:
+            try:
+                self._mmap = mmap.mmap(fileobj.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as e:
+                # empty file
+                raise SerializationError(e) from e
+        self._string_cache = {}
+        self._value_cache = {}
+        try:
+            self._parse(snapshot_filename)
+        except (struct.error, ValueError, TypeError, IndexError) as e:
+            self.close()
+            raise SerializationError(e) from e
+        except SerializationError:
+            self.close()
+            raise
+
+    def _parse(self, snapshot_filename):
+        view = memoryview(self._mmap)
+        header = _HEADER.unpack_from(view)
+        magic, little, size, mtime_ns = header[:4]
+        n_strings, n_values, n_classes, n_songs, n_pairs = header[4:]
+        if magic != _MAGIC or bool(little) != (sys.byteorder == "little"):
+            raise SerializationError("Not a cache for this platform")
+        if (size, mtime_ns) != snapshot_id(snapshot_filename):
+            raise SerializationError("Cache doesn't match the library file")
+
+        offset = _HEADER.size + (-_HEADER.size % 8)
+
+        def section(length, fmt):
+            nonlocal offset
+            itemsize = struct.calcsize(fmt)
+            data = view[offset : offset + length * itemsize]
+            if len(data) != length * itemsize:
+                raise SerializationError("Truncated cache")
+            offset += length * itemsize
+            offset += -offset % 8
+            return data.cast(fmt) if fmt != "B" else data
+
+        self._string_offsets = section(n_strings + 1, "Q")
+        self._blob = section(self._string_offsets[-1], "B")
+        self._kinds = section(n_values, "B")
+        payload = section(n_values * 8, "B")
+        self._ints = payload.cast("q")
+        self._floats = payload.cast("d")
+        class_names = section(n_classes, "I")
+        self._song_classes = section(n_songs, "I")
+        self._song_keys = section(n_songs, "I")
+        self._song_mounts = section(n_songs, "I")
+        self._row_offsets = section(n_songs + 1, "Q")
+        self._pair_tags = section(n_pairs, "I")
+        self._pair_values = section(n_pairs, "I")
+        self._classes = [self._load_class(self._string(i)) for i in class_names]
+
+    def _load_class(self, name):
+        module, qualname = name.split(":", 1)
+        try:
+            kind = getattr(importlib.import_module(module), qualname)
+        except (ImportError, AttributeError) as e:
+            raise SerializationError(f"Unknown song type {name!r}") from e
+        if not (isinstance(kind, type) and issubclass(kind, AudioFile)):
+            raise SerializationError(f"{name!r} is not an AudioFile")
+        return kind
+
+    def close(self):
+        for name in list(vars(self)):
+            if isinstance(getattr(self, name), memoryview):
+                getattr(self, name).release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            # still referenced somewhere, gets closed once collected
+            pass
+
+    def __len__(self):
+        return len(self._song_keys)
+
+    def _string(self, index):
+        try:
+            return self._string_cache[index]
+        except KeyError:
+            start, end = self._string_offsets[index], self._string_offsets[index + 1]
+            text = str(self._blob[start:end], "utf-8", "surrogatepass")
+            self._string_cache[index] = text
+            return text
+
+    def _value(self, index):
+        try:
+            return self._value_cache[index]
+        except KeyError:
+            kind = self._kinds[index]
+            if kind == _STR:
+                value = self._string(self._ints[index])
+            elif kind == _INT:
+                value = self._ints[index]
+            else:
+                value = self._floats[index]
+            self._value_cache[index] = value
+            return value
+
+    def keys(self):
+        """A dict of song key to row"""
+
+        value = self._value
+        return {value(v): row for row, v in enumerate(self._song_keys)}
+
+    def mountpoint(self, row):
+        index = self._song_mounts[row]
+        return None if index == _NONE else self._value(index)
+
+    def song(self, row):
+        """Returns the song stored in `row`"""
+
+        start, end = self._row_offsets[row], self._row_offsets[row + 1]
+        song = dict.__new__(self._classes[self._song_classes[row]])
+        # bypass __setitem__, like load_audio_files() does
+        dict.update(
+            song,
+            zip(
+                map(self._string, self._pair_tags[start:end]),
+                map(self._value, self._pair_values[start:end]),
+                strict=True,
+            ),
+        )
+        return song
+
+
+class LazySongDict(dict):
+    """A dict of song keys to songs where the songs are only read from the
+    `ColumnarCache` when first accessed.
+
+    Getting values() or items() reads all remaining songs. Once everything
+    is read the cache gets closed.
+    """
+
+    def __init__(self, cache):
+        super().__init__()
+        self._cache = cache
+        self._pending = cache.keys()
+
+    @property
+    def pending(self):
+        """Number of songs not read yet"""
+
+        return len(self._pending)
+
+    def __missing__(self, key):
+        row = self._pending.pop(key)
+        song = self._cache.song(row)
+        dict.__setitem__(self, key, song)
+        if not self._pending:
+            self._close()
+        return song
+
+    def _close(self):
+        if self._cache is not None:
+            self._cache.close()
+            self._cache = None
+
+    def _load_all(self):
+        for key in list(self._pending):
+            self[key]  # noqa
+
+    def group_by_mountpoint(self):
+        """A dict of mount point to the keys of the songs on it"""
+
+        groups = defaultdict(list)
+        for key, song in dict.items(self):
+            groups[song.get("~mountpoint")].append(key)
+        for key, row in self._pending.items():
+            groups[self._cache.mountpoint(row)].append(key)
+        return groups
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or key in self._pending
+
+    def __len__(self):
+        return dict.__len__(self) + len(self._pending)
+
+    def __iter__(self):
+        return iter(list(itertools.chain(dict.keys(self), self._pending)))
+
+    def __setitem__(self, key, value):
+        self._pending.pop(key, None)
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        if self._pending.pop(key, None) is None:
+            dict.__delitem__(self, key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def pop(self, key, *default):
+        if key in self._pending:
+            self[key]  # noqa
+        return dict.pop(self, key, *default)
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def clear(self):
+        self._pending.clear()
+        self._close()
+        dict.clear(self)
+
+    def keys(self):
+        return KeysView(self)
+
+    def values(self):
+        self._load_all()
+        return dict.values(self)
+
+    def items(self):
+        self._load_all()
+        return dict.items(self)
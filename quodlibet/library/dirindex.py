@@ -0,0 +1,180 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""Directory modification times from the last library scan.
+
+Adding, removing or renaming a file changes the modification time of the
+directory containing it, so directories with the same mtime as during the
+last complete scan can't contain any new files and don't have to be listed
+again. Their subdirectories still have to be checked, as changes deeper
+down don't propagate upwards.
+"""
+
+import os
+import pickle
+from collections.abc import Iterable
+from typing import NamedTuple
+
+from quodlibet import util
+from quodlibet.fsn import fsnative
+from quodlibet.util.atomic import atomic_save
+from quodlibet.util.dprint import print_d, print_w
+from quodlibet.util.picklehelper import pickle_dumps, pickle_loads
+
+DIRS_SUFFIX = ".dirs"
+"""Appended to the library filename to get the index filename"""
+
+_VERSION = 3
+
+
+class DirRecord(NamedTuple):
+    mtime_ns: int
+    files: int
+    """Number of (non-directory) entries"""
+    subdirs: tuple[fsnative, ...]
+    """Names of the subdirectories to descend into"""
+
+
+class DirectoryIndex:
+    """Directory records, saved to `filename` if given.
+
+    The index belongs to the library snapshot it was saved with (see
+    `journal.snapshot_id()`) and is empty if loaded for a different one,
+    so that a lost or reset library gets completely rescanned. It's only
+    valid for the same scan settings (see `set_context()`).
+
+    Records added during a scan (see `begin`) only become visible
+    (and get saved) once the scan is committed, so a scan that got
+    stopped half way doesn't mark unscanned directories as done.
+    """
+
+    def __init__(self, filename: fsnative | None = None, snapshot=None):
+        self.filename = filename
+        self.snapshot = snapshot
+        self.context = None
+        self.dirty = False
+        """Changed since loaded or saved"""
+        self._dirs: dict[fsnative, DirRecord] = {}
+        self._updates: dict[fsnative, DirRecord] = {}
+        self._seen: set[fsnative] = set()
+        self.skipped_dirs = 0
+        self.skipped_files = 0
+
+        if filename is not None:
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.filename, "rb") as h:
+                data = h.read()
+        except FileNotFoundError:
+            return
+        except OSError:
+            print_w(f"Couldn't read directory index {self.filename!r}")
+            return
+
+        try:
+            version, snapshot, context, dirs = pickle_loads(data)
+        except (pickle.UnpicklingError, ValueError, TypeError):
+            util.print_exc()
+            return
+
+        if version != _VERSION or snapshot is None or snapshot != self.snapshot:
+            print_d("Directory index is for a different library, ignoring")
+            return
+        self.context = context
+        self._dirs = {path: DirRecord(*record) for path, record in dirs.items()}
+        print_d(f"Loaded {len(self._dirs)} directory records")
+
+    def set_context(self, context):
+        """Drops all records if they were made with different scan settings"""
+
+        if context != self.context:
+            if self._dirs:
+                print_d("Directory index is for different scan settings, ignoring")
+            self.clear()
+            self.context = context
+
+    def __len__(self):
+        return len(self._dirs)
+
+    def get(self, path: fsnative, stat: os.stat_result) -> DirRecord | None:
+        """The record for path, if the directory didn't change since"""
+
+        record = self._dirs.get(path)
+        if record is not None and record.mtime_ns == stat.st_mtime_ns:
+            return record
+        return None
+
+    def begin(self):
+        """Start recording a new scan"""
+
+        self._updates.clear()
+        self._seen.clear()
+        self.skipped_dirs = 0
+        self.skipped_files = 0
+
+    def skipped(self, path: fsnative, record: DirRecord):
+        """Note that `path` was unchanged and skipped"""
+
+        self._seen.add(path)
+        self.skipped_dirs += 1
+        self.skipped_files += record.files
+
+    def update(
+        self,
+        path: fsnative,
+        stat: os.stat_result,
+        files: int,
+        subdirs: Iterable[fsnative],
+    ):
+        """Record the current state of a listed directory"""
+
+        self._seen.add(path)
+        self._updates[path] = DirRecord(stat.st_mtime_ns, files, tuple(subdirs))
+
+    def discard(self, path: fsnative):
+        """Forget the record of `path`, so it gets listed again"""
+
+        self._updates.pop(path, None)
+        if self._dirs.pop(path, None) is not None:
+            self.dirty = True
+
+    def commit(self, roots: Iterable[fsnative]):
+        """Apply the recorded scan of `roots`.
+
+        Records below the roots that weren't seen during the scan are
+        dropped, as those directories are gone.
+        """
+
+        roots = {os.path.realpath(root) for root in roots}
+        prefixes = tuple(os.path.join(root, "") for root in roots)
+        seen = self._seen
+        for path in list(self._dirs):
+            if path not in seen and (path in roots or path.startswith(prefixes)):
+                del self._dirs[path]
+        self._dirs.update(self._updates)
+        self._updates.clear()
+        seen.clear()
+        self.dirty = True
+
+    def clear(self):
+        self._dirs.clear()
+        self.dirty = True
+
+    def save(self, snapshot):
+        """Save the records as belonging to the library snapshot"""
+
+        self.snapshot = snapshot
+        self.dirty = False
+        if self.filename is None:
+            return
+        dirs = {path: tuple(record) for path, record in self._dirs.items()}
+        data = pickle_dumps((_VERSION, snapshot, self.context, dirs), 2)
+        try:
+            with atomic_save(self.filename, "wb") as h:
+                h.write(data)
+        except OSError:
+            print_w(f"Couldn't save directory index to {self.filename!r}")
@@ -10,26 +10,106 @@ from collections.abc import Generator, Iterable
 
 from gi.repository import Gio, GLib, GObject
 
-from quodlibet import print_d, print_w, _, formats
-from quodlibet.formats import AudioFileError, AudioFile
+from quodlibet import config, print_d, print_w, _, formats
+from quodlibet.formats import AudioFileError, AudioFile, SerializationError
 from quodlibet.library.base import iter_paths, Library, PicklingMixin
+from quodlibet.library.dirindex import DIRS_SUFFIX, DirectoryIndex
+from quodlibet.library.journal import snapshot_id
+from quodlibet.library.masked import MASKED_SUFFIX, MaskedShard, load_shards
+from quodlibet.library.watcher import BatchedWatcher
 from quodlibet.qltk.notif import Task
-from quodlibet.util import copool, print_exc
+from quodlibet.util import copool, inotify, print_exc
 from quodlibet.util.library import get_exclude_dirs
 from quodlibet.util.path import ismount, unexpand, normalize_path
 from quodlibet.fsn import fsn2text, fsnative
 
 
+def _scandir(path: fsnative) -> dict[str, os.DirEntry] | None:
+    """A dict of entry names to entries, or None if it can't be listed.
+
+    The names are normalized like library keys, see `normalize_path`.
+    """
+
+    try:
+        with os.scandir(path) as it:
+            return {os.path.basename(normalize_path(entry.path)): entry for entry in it}
+    except OSError:
+        return None
+
+
+def _is_valid(item: AudioFile, entries: dict[str, os.DirEntry] | None) -> bool:
+    """Like item.valid(), but using the directory listing if possible"""
+
+    if entries is None or type(item).valid is not AudioFile.valid:
+        return item.valid()
+    entry = entries.get(os.path.basename(item.key))
+    if entry is None:
+        # e.g. keys of symlinks point to their target
+        return item.valid()
+    try:
+        mtime = entry.stat().st_mtime
+    except OSError:
+        return False
+    return bool(item.get("~#mtime", 0)) and item["~#mtime"] == mtime
+
+
+def _skipped_desc(desc: str, dirs: int, files: int) -> str:
+    return _("%(task)s (skipped %(dirs)d unchanged folders, %(files)d files)") % {
+        "task": desc,
+        "dirs": dirs,
+        "files": files,
+    }
+
+
 class FileLibrary(Library[fsnative, AudioFile], PicklingMixin):
     """A library containing items on a local(-ish) filesystem.
 
     These must support the valid, exists, mounted, and reload methods,
     and have a mountpoint attribute.
+
+    Masked items aren't part of the library file, they get saved per
+    mount point next to it, see `MaskedShard`.
     """
 
     def __init__(self, name=None):
         super().__init__(name)
-        self._masked = {}
+        self._masked: dict[fsnative, MaskedShard] = {}
+        self._stale_shards: set[fsnative] = set()
+        """Shard files to delete once their items are saved elsewhere"""
+        self._dir_index: DirectoryIndex | None = None
+        self._dir_snapshot = None
+        """Snapshot id of the library file, if loaded successfully"""
+        self.connect("removed", self.__removed)
+
+    def __removed(self, library, items):
+        # a later scan has to list their directories to find them again
+        if self._dir_index is None and not self.filename:
+            return
+        index = self._load_dir_index()
+        for item in items:
+            if isinstance(item.key, str):
+                index.discard(os.path.dirname(item.key))
+
+    def _load_dir_index(self) -> DirectoryIndex:
+        if self._dir_index is None:
+            filename = self.filename + DIRS_SUFFIX if self.filename else None
+            self._dir_index = DirectoryIndex(filename, self._dir_snapshot)
+        return self._dir_index
+
+    def _get_dir_index(self, exclude: Iterable[fsnative] | None) -> DirectoryIndex:
+        """The directory index for scans with the given settings"""
+
+        index = self._load_dir_index()
+        index.set_context((sorted(exclude or []), sorted(formats.loaders)))
+        return index
+
+    def _save_dir_index(self):
+        index = self._dir_index
+        if index is None or not self.filename:
+            return
+        snapshot = snapshot_id(self.filename)
+        if index.dirty or snapshot != index.snapshot:
+            index.save(snapshot)
 
     def _load_init(self, items):
         """Add many items to the library, check if the
@@ -40,7 +120,7 @@ class FileLibrary(Library[fsnative, AudioFile], PicklingMixin):
 
         mounts = {}
         contents = self._contents
-        masked = self._masked
+        masked: dict[fsnative, dict] = {}
 
         for item in items:
             mountpoint = item.mountpoint
@@ -56,14 +136,14 @@ class FileLibrary(Library[fsnative, AudioFile], PicklingMixin):
                     is_mounted = ismount(mountpoint)
 
                 mounts[mountpoint] = is_mounted
-                # at least one not mounted, make sure masked has an entry
-                if not is_mounted:
-                    masked.setdefault(mountpoint, {})
 
             if mounts[mountpoint]:
                 contents[item.key] = item
             else:
-                masked[mountpoint][item.key] = item
+                masked.setdefault(mountpoint, {})[item.key] = item
+
+        for mountpoint, items in masked.items():
+            self._add_masked(mountpoint, items)
 
     def _load_item(self, item, force=False):
         """Add an item, or refresh it if it's already in the library.
@@ -103,8 +183,7 @@ class FileLibrary(Library[fsnative, AudioFile], PicklingMixin):
             # it's not not mounted. If the item was present
             # we need to mark it as removed.
             print_d(f"Masking {item.key!r}", self._name)
-            self._masked.setdefault(item.mountpoint, {})
-            self._masked[item.mountpoint][item.key] = item
+            self._add_masked(item.mountpoint, {item.key: item})
             return False, present
         else:
             # The item doesn't exist at all anymore. Mark it as
@@ -155,38 +234,82 @@ class FileLibrary(Library[fsnative, AudioFile], PicklingMixin):
         task = Task(_("Library"), _("Checking mount points"))
         if cofuncid:
             task.copool(cofuncid)
-        for _i, (point, items) in task.list(enumerate(self._masked.items())):
+        for _i, point in task.list(enumerate(list(self._masked))):
             if ismount(point):
+                items = self._pop_masked(point)
                 self._contents.update(items)
-                del self._masked[point]
                 self.emit("added", list(items.values()))
                 yield True
 
-        task = Task(_("Library"), _("Scanning library"))
+        exclude = list(exclude or [])
+        index = None
+        if config.getboolean("library", "skip_unchanged_dirs"):
+            index = self._get_dir_index(exclude)
+            if force:
+                index.clear()
+
+        desc = _("Scanning library")
+        task = Task(_("Library"), desc)
         if cofuncid:
             task.copool(cofuncid)
         changed, removed = set(), set()
-        for i, (key, item) in task.list(enumerate(sorted(self.items()))):
-            if key in self._contents and force or not item.valid():
-                self.reload(item, changed, removed)
+        i = skipped_dirs = skipped_files = 0
+        for dirname, items in task.list(self._items_by_dir()):
+            entries = None
+            if dirname is not None and not force:
+                if index is not None:
+                    try:
+                        stat = os.stat(dirname)
+                    except OSError:
+                        stat = None
+                    if stat is not None and index.get(dirname, stat) is not None:
+                        skipped_dirs += 1
+                        skipped_files += len(items)
+                        task.desc = _skipped_desc(desc, skipped_dirs, skipped_files)
+                        continue
+                # one listing instead of a stat per song
+                entries = _scandir(dirname)
+            for key, item in items:
+                i += 1
+                if key in self._contents and force or not _is_valid(item, entries):
+                    self.reload(item, changed, removed)
                 # These numbers are pretty empirical. We should yield more
-            # often than we emit signals; that way the main loop stays
-            # interactive and doesn't get bogged down in updates.
-            if len(changed) >= 200:
-                self.emit("changed", changed)
-                changed = set()
-            if len(removed) >= 200:
-                self.emit("removed", removed)
-                removed = set()
-            if len(changed) > 20 or i % 200 == 0:
-                yield True
+                # often than we emit signals; that way the main loop stays
+                # interactive and doesn't get bogged down in updates.
+                if len(changed) >= 200:
+                    self.emit("changed", changed)
+                    changed = set()
+                if len(removed) >= 200:
+                    self.emit("removed", removed)
+                    removed = set()
+                if len(changed) > 20 or i % 200 == 0:
+                    yield True
         print_d(f"Removing {len(removed)}, changing {len(changed)}).", self._name)
+        if skipped_dirs:
+            print_d(
+                f"Skipped {skipped_files} songs in {skipped_dirs} unchanged dirs",
+                self._name,
+            )
         if removed:
             self.emit("removed", removed)
         if changed:
             self.emit("changed", changed)
 
-        yield from self.scan(paths, exclude, cofuncid)
+        yield from self.scan(paths, exclude, cofuncid, index=index)
+
+    def _items_by_dir(self) -> list[tuple[fsnative | None, list]]:
+        """Sorted (directory, [(key, item)...]) pairs of all items.
+
+        Items with keys that aren't paths end up in a None directory.
+        """
+
+        by_dir: dict[fsnative | None, list] = {}
+        for key, item in self.items():
+            dirname = os.path.dirname(key) if isinstance(key, str) else None
+            by_dir.setdefault(dirname, []).append((key, item))
+        for items in by_dir.values():
+            items.sort(key=lambda i: i[0])
+        return sorted(by_dir.items(), key=lambda i: i[0] or "")
 
     def add_filename(self, filename: str | Path, add: bool = True) -> AudioFile | None:
         """Add a file based on its filename.
@@ -195,6 +318,17 @@ class FileLibrary(Library[fsnative, AudioFile], PicklingMixin):
         :return: the audio file if added (or None)
         """
 
+    def _load_filenames(
+        self, paths: list[fsnative], task: Task
+    ) -> Generator[AudioFile | None, None, None]:
+        """Load the files without adding them, updating the task progress.
+
+        Yields the loaded item or None (failed, or nothing loaded yet).
+        """
+
+        for path in task.gen(paths):
+            yield self.add_filename(path, False)
+
     def contains_filename(self, filename) -> bool:
         """Returns if a song for the passed filename is in the library."""
         key = normalize_path(filename, True)
@@ -205,7 +339,14 @@ class FileLibrary(Library[fsnative, AudioFile], PicklingMixin):
         paths: Iterable[fsnative],
         exclude: Iterable[fsnative] | None = None,
         cofuncid=None,
+        index: DirectoryIndex | None = None,
     ):
+        """Finds and adds new files below the paths.
+
+        If an index is given, unchanged directories are skipped and the
+        index is updated once all new files are loaded.
+        """
+
         def need_yield(last_yield=[0]):  # noqa
             current = time.time()
             if abs(current - last_yield[0]) > 0.015:
@@ -220,6 +361,10 @@ class FileLibrary(Library[fsnative, AudioFile], PicklingMixin):
                 return True
             return False
 
+        paths = list(paths)
+        if index is not None:
+            index.begin()
+
         # first scan each path for new files
         paths_to_load = []
         for scan_path in paths:
@@ -229,8 +374,12 @@ class FileLibrary(Library[fsnative, AudioFile], PicklingMixin):
                 if cofuncid:
                     task.copool(cofuncid)
 
-                for real_path in iter_paths(scan_path, exclude=exclude):
+                for real_path in iter_paths(scan_path, exclude=exclude, index=index):
                     if need_yield():
+                        if index is not None and index.skipped_dirs:
+                            task.desc = _skipped_desc(
+                                desc, index.skipped_dirs, index.skipped_files
+                            )
                         task.pulse()
                         yield
                     # skip unknown file extensions
@@ -249,21 +398,125 @@ class FileLibrary(Library[fsnative, AudioFile], PicklingMixin):
                 task.copool(cofuncid)
 
             added = []
-            for real_path in task.gen(paths_to_load):
-                item = self.add_filename(real_path, False)
+            for item in self._load_filenames(paths_to_load, task):
                 if item is not None:
                     added.append(item)
                     if len(added) > 100 or need_added():
                         self.add(added)
                         added = []
                         yield
-                if added and need_yield():
+                if need_yield():
                     yield
             if added:
                 self.add(added)
                 added = []
                 yield True
 
+        if index is not None:
+            index.commit(paths)
+            print_d(
+                f"Skipped {index.skipped_dirs} unchanged directories while scanning",
+                self._name,
+            )
+
+    def load(self, filename):
+        """Like `PicklingMixin.load`, but also finds the masked items saved
+        next to the library file. Only those on available mount points
+        get read."""
+
+        snapshot = snapshot_id(filename)
+        super().load(filename)
+
+        # Masked items still in the library file (from older versions)
+        # move to the shards on the next save
+        if self._masked:
+            self._journal_silent(
+                removed_keys=[k for s in self._masked.values() for k in s.keys()]
+            )
+            self.dirty = True
+
+        for point, shard in load_shards(self._masked_dir()).items():
+            if point in self._masked:
+                self._masked[point].update(
+                    {k: v for k, v in shard.items() if k not in self._masked[point]}
+                )
+                self._stale_shards.add(shard.filename)
+            elif ismount(point):
+                items = {k: v for k, v in shard.items() if k not in self._contents}
+                self._contents.update(items)
+                self._journal_silent(items=items.values())
+                self._stale_shards.add(shard.filename)
+                self.dirty = True
+            else:
+                self._masked[point] = shard
+        print_d(f"Found masked items for {len(self._masked)} mount points", self._name)
+
+        # an empty library is new, reset or failed to load, so nothing
+        # can be skipped based on an earlier scan
+        if self._contents or self._masked:
+            self._dir_snapshot = snapshot
+
+    def save(self, filename=None, background=False):
+        """Like `PicklingMixin.save`, but also writes the changed masked
+        items in case of the library file"""
+
+        own_file = filename is None or filename == self.filename
+        if own_file and self.filename:
+            self._save_masked()
+        super().save(filename, background)
+
+    def _saved(self, filename):
+        super()._saved(filename)
+        if filename == self.filename:
+            self._remove_stale_shards()
+            # only now the new items of a committed scan are saved as well
+            self._save_dir_index()
+
+    def _masked_dir(self) -> fsnative:
+        return self.filename + MASKED_SUFFIX
+
+    def _save_masked(self):
+        dirname = self._masked_dir()
+        for shard in self._masked.values():
+            if not shard.dirty:
+                continue
+            try:
+                shard.save(dirname)
+            except (OSError, SerializationError):
+                print_w(f"Couldn't save masked items of {shard.mountpoint!r}")
+                print_exc()
+            else:
+                self._stale_shards.discard(shard.filename)
+
+    def _remove_stale_shards(self):
+        """Removes the files of shards that got unmasked or removed"""
+
+        used = {shard.filename for shard in self._masked.values()}
+        for filename in self._stale_shards - used:
+            try:
+                os.remove(filename)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                print_w(f"Couldn't remove {filename!r}", self._name)
+        self._stale_shards.clear()
+
+    def _add_masked(self, point, items: dict):
+        shard = self._masked.get(point)
+        if shard is None:
+            shard = self._masked[point] = MaskedShard(point)
+        shard.update(items)
+
+    def _pop_masked(self, point) -> dict:
+        """Removes the shard of a mount point, returns its items"""
+
+        shard = self._masked.pop(point, None)
+        if shard is None:
+            return {}
+        if shard.filename is not None:
+            self._stale_shards.add(shard.filename)
+        return shard.load()
+
     def get_content(self):
         """Return visible and masked items"""
 
@@ -278,22 +531,26 @@ class FileLibrary(Library[fsnative, AudioFile], PicklingMixin):
 
         return items
 
+    def _get_snapshot_content(self, filename):
+        if filename != self.filename:
+            return self.get_content()
+        # masked ones are in the shards
+        return sorted(self.values(), key=lambda item: item.key)
+
     def masked(self, item):
         """Return true if the item is in the library but masked."""
         try:
             point = item.mountpoint
         except AttributeError:
             # Checking a key.
-            for point in self._masked.values():
-                if item in point:
-                    return True
+            return any(item in shard for shard in self._masked.values())
         else:
             # Checking a full item.
-            return item in self._masked.get(point, {}).values()
+            return item.key in self._masked.get(point, ())
 
     def unmask(self, point):
         print_d(f"Unmasking {point!r}", self._name)
-        items = self._masked.pop(point, {})
+        items = self._pop_masked(point)
         if items:
             self.add(items.values())
 
@@ -305,7 +562,7 @@ class FileLibrary(Library[fsnative, AudioFile], PicklingMixin):
                 removed[item.key] = item
         if removed:
             self.remove(removed.values())
-            self._masked.setdefault(point, {}).update(removed)
+            self._add_masked(point, removed)
 
     @property
     def masked_mount_points(self):
@@ -316,12 +573,20 @@ class FileLibrary(Library[fsnative, AudioFile], PicklingMixin):
     def get_masked(self, mount_point):
         """List of items for a mount point"""
 
-        return list(self._masked.get(mount_point, {}).values())
+        shard = self._masked.get(mount_point)
+        return list(shard.values()) if shard is not None else []
+
+    def count_masked(self, mount_point) -> int:
+        """Number of items for a mount point, without reading them"""
+
+        return len(self._masked.get(mount_point, ()))
 
     def remove_masked(self, mount_point):
         """Remove all songs for a masked point"""
 
-        self._masked.pop(mount_point, {})
+        shard = self._masked.pop(mount_point, None)
+        if shard is not None and shard.filename is not None:
+            self._stale_shards.add(shard.filename)
 
     def move_root(
         self, old_root: str, new_root: fsnative, write_files: bool = True
@@ -402,6 +667,8 @@ class FileLibrary(Library[fsnative, AudioFile], PicklingMixin):
         except KeyError:
             existed = False
             # Continue - maybe it's already moved
+        else:
+            self._journal_moved(key)
         song.sanitize(new_path)
         self._contents[new_path] = song
         return existed
@@ -441,6 +708,7 @@ class WatchedFileLibraryMixin(FileLibrary):
     def __init__(self, name=None):
         super().__init__(name)
         self._monitors: dict[Path, tuple[GObject.GObject, int]] = {}
+        self._watcher: BatchedWatcher | None = None
 
     def monitor_dir(self, path: Path) -> None:
         """Monitors a single directory"""
@@ -569,6 +837,8 @@ class WatchedFileLibraryMixin(FileLibrary):
         print_d(f"Finished handling {event}", self._name)
 
     def is_monitored_dir(self, path: Path) -> bool:
+        if self._watcher is not None:
+            return str(path) in self._watcher
         return path in self._monitors
 
     def unmonitor_dir(self, path: Path) -> None:
@@ -585,6 +855,17 @@ class WatchedFileLibraryMixin(FileLibrary):
         print_d(f"Setting up file watches on {paths}...", self._name)
         exclude_dirs = [e for e in get_exclude_dirs() if e]
 
+        if config.getboolean("library", "watch_batched") and inotify.is_available():
+            try:
+                self._watcher = BatchedWatcher(self)
+            except OSError as e:
+                print_w(f"Couldn't set up inotify ({e}), using Gio", self._name)
+            else:
+                copool.add(
+                    self._watcher.watch, paths, exclude_dirs, funcid="watch_library"
+                )
+                return
+
         def watching_producer():
             # TODO: integrate this better with scanning.
             for fullpath in paths:
@@ -610,6 +891,11 @@ class WatchedFileLibraryMixin(FileLibrary):
         copool.add(watching_producer, funcid="watch_library")
 
     def stop_watching(self):
+        if self._watcher is not None:
+            print_d(f"Removing watches on {len(self._watcher)} dirs", self._name)
+            self._watcher.destroy()
+            self._watcher = None
+
         print_d(f"Removing watches on {len(self._monitors)} dirs", self._name)
 
         for monitor, handler_id in self._monitors.values():
@@ -0,0 +1,157 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""An append-only log of library changes on top of a pickled snapshot.
+
+The snapshot is the regular library pickle. Each save appends one frame
+containing the items that were added or changed and the keys that were
+removed since the last save. Loading replays all frames on top of the
+snapshot; compaction rewrites the snapshot and drops the log.
+
+File layout: a sequence of frames, each one a big endian uint32 length
+followed by a protocol 2 pickle. The first frame is a header identifying
+the snapshot the log belongs to, so that a log left over from an older
+snapshot is never replayed.
+"""
+
+import os
+import struct
+import pickle
+
+from quodlibet import util
+from quodlibet.formats import load_audio_files, dump_audio_files, SerializationError
+from quodlibet.util.dprint import print_d, print_w
+from quodlibet.util.picklehelper import pickle_dumps, pickle_loads
+
+JOURNAL_SUFFIX = ".journal"
+"""Appended to the library filename to get the journal filename"""
+
+_VERSION = 1
+_LENGTH = struct.Struct(">I")
+
+
+def snapshot_id(filename):
+    """Something that changes whenever the snapshot file gets replaced,
+    or None if it doesn't exist"""
+
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _iter_frames(data):
+    """Yields the pickled frames in data, stops at a truncated one"""
+
+    offset = 0
+    while offset + _LENGTH.size <= len(data):
+        (length,) = _LENGTH.unpack_from(data, offset)
+        offset += _LENGTH.size
+        if offset + length > len(data):
+            print_w("Ignoring truncated journal frame")
+            return
+        yield data[offset : offset + length]
+        offset += length
+
+
+def _frame(obj):
+    data = pickle_dumps(obj, 2)
+    return _LENGTH.pack(len(data)) + data
+
+
+class LibraryJournal:
+    """The change log belonging to the library snapshot at `base_filename`"""
+
+    def __init__(self, base_filename):
+        self.base_filename = base_filename
+        self.filename = base_filename + JOURNAL_SUFFIX
+        self.size = 0
+        """Bytes currently in the journal file"""
+
+    def replay(self, contents):
+        """Applies the journal to the item key/item mapping loaded from the
+        snapshot.
+
+        A journal that doesn't belong to the current snapshot or can't be
+        read is discarded.
+        """
+
+        try:
+            with open(self.filename, "rb") as fp:
+                data = fp.read()
+        except FileNotFoundError:
+            return
+        except OSError:
+            print_w(f"Couldn't read library journal {self.filename!r}")
+            return
+
+        frames = _iter_frames(data)
+        try:
+            header = pickle_loads(next(frames))
+        except (StopIteration, pickle.UnpicklingError):
+            header = None
+        if header != ("journal", _VERSION, snapshot_id(self.base_filename)):
+            print_w(f"Discarding stale library journal {self.filename!r}")
+            self.reset()
+            return
+
+        count = 0
+        try:
+            for frame in frames:
+                put, deleted = pickle_loads(frame)
+                for key in deleted:
+                    contents.pop(key, None)
+                if put:
+                    for item in load_audio_files(put):
+                        contents[item.key] = item
+                count += 1
+        except (pickle.UnpicklingError, SerializationError, ValueError):
+            # keep what could be replayed so far
+            util.print_exc()
+
+        self.size = len(data)
+        print_d(f"Replayed {count} journal entries from {self.filename!r}")
+
+    def append(self, put, deleted):
+        """Appends changed items and removed keys to the journal.
+
+        Raises:
+            SerializationError
+            OSError
+        """
+
+        data = _frame((dump_audio_files(list(put)) if put else b"", list(deleted)))
+        if not self.size:
+            header = ("journal", _VERSION, snapshot_id(self.base_filename))
+            data = _frame(header) + data
+        elif not os.path.exists(self.filename):
+            # removed behind our back, the snapshot alone is incomplete now
+            raise OSError(f"{self.filename!r} is gone")
+
+        with open(self.filename, "ab") as fileobj:
+            fileobj.write(data)
+            fileobj.flush()
+            os.fsync(fileobj.fileno())
+        self.size += len(data)
+
+    def needs_compaction(self):
+        """If rewriting the snapshot is worth it (or needed)"""
+
+        snapshot = snapshot_id(self.base_filename)
+        if snapshot is None:
+            return True
+        return self.size > max(snapshot[0] // 4, 1024 * 1024)
+
+    def reset(self):
+        """Drops the journal, after the snapshot has been rewritten"""
+
+        self.size = 0
+        try:
+            os.unlink(self.filename)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            util.print_exc()
@@ -16,7 +16,7 @@ from collections.abc import Iterable, Iterator, Generator
 
 from gi.repository import GObject
 
-from quodlibet.library.base import Library
+from quodlibet.library.base import Library, PicklingMixin
 from quodlibet.library.playlist import PlaylistLibrary
 from quodlibet.util.dprint import print_d, print_w
 from quodlibet.fsn import fsnative
@@ -185,6 +185,8 @@ class SongLibrarian(Librarian):
                 pass
             else:
                 re_add.append(library)
+                if isinstance(library, PicklingMixin):
+                    library._journal_moved(song.key)
         song.rename(newname)
         for library in re_add:
             library._contents[song.key] = song
@@ -0,0 +1,224 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""Masked items saved separately per mount point.
+
+Items on mount points that aren't available are kept out of the library
+file, each mount point gets its own shard file in a directory next to it
+instead. A shard only gets read once its items are needed, usually when
+the mount point shows up again, and only gets written if it changed.
+
+File layout: three frames, each one a big endian uint32 length followed
+by the data. A header (format version, mount point, number of items),
+the item keys and the items as written by `dump_audio_files`. This way
+the header and keys can be read without loading the items.
+"""
+
+import hashlib
+import os
+import pickle
+import struct
+
+from quodlibet import util
+from quodlibet.formats import dump_audio_files, load_audio_files, SerializationError
+from quodlibet.fsn import fsnative
+from quodlibet.util.atomic import atomic_save
+from quodlibet.util.dprint import print_d, print_w
+from quodlibet.util.path import mkdir
+from quodlibet.util.picklehelper import pickle_dumps, pickle_loads
+
+MASKED_SUFFIX = ".masked"
+"""Appended to the library filename to get the shard directory"""
+
+_VERSION = 1
+_LENGTH = struct.Struct(">I")
+_EXT = ".shard"
+
+
+def shard_filename(dirname: fsnative, mountpoint: fsnative) -> fsnative:
+    """The file holding the masked items of the mount point"""
+
+    name = hashlib.sha1(os.fsencode(mountpoint)).hexdigest()
+    return os.path.join(dirname, name + _EXT)
+
+
+def _read_frame(fileobj) -> bytes:
+    data = fileobj.read(_LENGTH.size)
+    if len(data) != _LENGTH.size:
+        raise SerializationError("Truncated shard")
+    (length,) = _LENGTH.unpack(data)
+    data = fileobj.read(length)
+    if len(data) != length:
+        raise SerializationError("Truncated shard")
+    return data
+
+
+def _skip_frame(fileobj) -> None:
+    data = fileobj.read(_LENGTH.size)
+    if len(data) != _LENGTH.size:
+        raise SerializationError("Truncated shard")
+    fileobj.seek(_LENGTH.unpack(data)[0], os.SEEK_CUR)
+
+
+def _loads(data):
+    try:
+        return pickle_loads(data)
+    except (pickle.UnpicklingError, ValueError, TypeError) as e:
+        raise SerializationError(e) from e
+
+
+class MaskedShard:
+    """The masked items of one mount point.
+
+    If created with a filename the items get read from it on first
+    access, otherwise it starts out empty.
+    """
+
+    def __init__(
+        self, mountpoint: fsnative, filename: fsnative | None = None, count: int = 0
+    ):
+        self.mountpoint = mountpoint
+        self.filename = filename
+        self.dirty = False
+        """If the items changed since they were read or last saved"""
+
+        self._items: dict | None = {} if filename is None else None
+        self._keys: frozenset | None = None
+        self._count = count
+
+    @classmethod
+    def from_file(cls, filename: fsnative) -> "MaskedShard":
+        """Reads the header of a shard file.
+
+        Raises OSError and SerializationError
+        """
+
+        with open(filename, "rb") as h:
+            header = _loads(_read_frame(h))
+        try:
+            version, mountpoint, count = header
+        except (TypeError, ValueError) as e:
+            raise SerializationError(e) from e
+        if version != _VERSION:
+            raise SerializationError(f"Unknown shard version {version}")
+        return cls(mountpoint, filename, count)
+
+    @property
+    def loaded(self) -> bool:
+        """If the items were read already"""
+
+        return self._items is not None
+
+    def __len__(self):
+        return self._count if self._items is None else len(self._items)
+
+    def __contains__(self, key) -> bool:
+        """If an item with the key is masked, only reads the keys"""
+
+        if self._items is not None:
+            return key in self._items
+        if self._keys is None:
+            self._keys = self._read(_read_keys)
+        return key in self._keys
+
+    def _read(self, func):
+        try:
+            with open(self.filename, "rb") as h:
+                return func(h)
+        except (OSError, SerializationError):
+            print_w(f"Couldn't read masked items from {self.filename!r}")
+            util.print_exc()
+            return func(None)
+
+    def load(self) -> dict:
+        """A dict of key to item of all masked items"""
+
+        if self._items is None:
+            print_d(f"Reading masked items of {self.mountpoint!r}")
+            self._items = self._read(_read_items)
+            self._keys = None
+        return self._items
+
+    def keys(self):
+        return self.load().keys()
+
+    def values(self):
+        return self.load().values()
+
+    def items(self):
+        return self.load().items()
+
+    def update(self, items: dict) -> None:
+        """Adds (key, item) pairs, reading the existing items first"""
+
+        if items:
+            self.load().update(items)
+            self.dirty = True
+
+    def save(self, dirname: fsnative) -> None:
+        """Writes the items to a file in dirname if they changed and
+        drops them from memory.
+
+        Raises SerializationError and OSError
+        """
+
+        if not self.dirty:
+            return
+        items = self.load()
+        filename = shard_filename(dirname, self.mountpoint)
+        header = pickle_dumps((_VERSION, self.mountpoint, len(items)), 2)
+        keys = pickle_dumps(list(items), 2)
+        data = dump_audio_files(list(items.values()))
+        mkdir(dirname)
+        with atomic_save(filename, "wb") as h:
+            for frame in (header, keys, data):
+                h.write(_LENGTH.pack(len(frame)))
+                h.write(frame)
+        self.filename = filename
+        self.dirty = False
+        # read again once needed
+        self._count = len(items)
+        self._items = None
+
+
+def _read_keys(h) -> frozenset:
+    if h is None:
+        return frozenset()
+    _skip_frame(h)
+    return frozenset(_loads(_read_frame(h)))
+
+
+def _read_items(h) -> dict:
+    if h is None:
+        return {}
+    _skip_frame(h)
+    _skip_frame(h)
+    return {item.key: item for item in load_audio_files(_read_frame(h))}
+
+
+def load_shards(dirname: fsnative) -> dict[fsnative, MaskedShard]:
+    """All shards in dirname, by mount point. Only reads the headers."""
+
+    try:
+        names = os.listdir(dirname)
+    except FileNotFoundError:
+        return {}
+    except OSError:
+        print_w(f"Couldn't list masked items in {dirname!r}")
+        return {}
+
+    shards = {}
+    for name in sorted(names):
+        if not name.endswith(_EXT):
+            continue
+        filename = os.path.join(dirname, name)
+        try:
+            shard = MaskedShard.from_file(filename)
+        except (OSError, SerializationError):
+            print_w(f"Ignoring invalid masked items file {filename!r}")
+            util.print_exc()
+            continue
+        shards[shard.mountpoint] = shard
+    return shards
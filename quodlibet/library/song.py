@@ -2,17 +2,28 @@
 # it under the terms of the GNU General Public License as published by
 # the Free Software Foundation; either version 2 of the License, or
 # (at your option) any later version.
+from collections.abc import Generator
+from functools import partial
 from pathlib import Path
 from typing import TypeVar
 
-from quodlibet import print_d, util
-from quodlibet.formats import AudioFile, MusicFile
+from quodlibet import config, print_d, print_w, util
+from quodlibet.formats import AudioFile, MusicFile, SerializationError
 from quodlibet.library.album import AlbumLibrary
 from quodlibet.library.base import K, Library, PicklingMixin
 from quodlibet.library.file import WatchedFileLibraryMixin
 from quodlibet.library.playlist import PlaylistLibrary
-from quodlibet.query import Query
-from quodlibet.util.path import normalize_path
+from quodlibet.library import workers
+from quodlibet.library.columnar import (
+    CACHE_SUFFIX,
+    ColumnarCache,
+    LazySongDict,
+    dump_cache,
+)
+from quodlibet.qltk.notif import Task
+from quodlibet.fsn import fsnative
+from quodlibet.query import FoldedTags, NumericColumns, Query, QueryCache, TextIndex
+from quodlibet.util.path import ismount, normalize_path
 
 V = TypeVar("V", bound=AudioFile)
 
@@ -26,6 +37,54 @@ class SongLibrary(Library[K, V], PicklingMixin):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        self._text_index: TextIndex | None = None
+        self._numeric_columns: NumericColumns | None = None
+        self._folded_tags: FoldedTags | None = None
+        self._query_cache: QueryCache | None = None
+
+    def get_text_index(self) -> TextIndex | None:
+        """The search index of the library, if enabled"""
+
+        if not config.getboolean("browsers", "search_index"):
+            if self._text_index is not None:
+                self._text_index.destroy()
+                self._text_index = None
+        elif self._text_index is None:
+            self._text_index = TextIndex(self, Query.STAR)
+        return self._text_index
+
+    def get_numeric_columns(self) -> NumericColumns | None:
+        """The numeric tag columns of the library, if enabled"""
+
+        if not config.getboolean("browsers", "numeric_columns"):
+            if self._numeric_columns is not None:
+                self._numeric_columns.destroy()
+                self._numeric_columns = None
+        elif self._numeric_columns is None:
+            self._numeric_columns = NumericColumns(self)
+        return self._numeric_columns
+
+    def get_folded_tags(self) -> FoldedTags | None:
+        """The folded tag values of the library, if enabled"""
+
+        if not config.getboolean("browsers", "folded_tags"):
+            if self._folded_tags is not None:
+                self._folded_tags.destroy()
+                self._folded_tags = None
+        elif self._folded_tags is None:
+            self._folded_tags = FoldedTags(self)
+        return self._folded_tags
+
+    def get_query_cache(self) -> QueryCache | None:
+        """The shared results of recent queries, if enabled"""
+
+        if not config.getboolean("browsers", "query_cache"):
+            if self._query_cache is not None:
+                self._query_cache.destroy()
+                self._query_cache = None
+        elif self._query_cache is None:
+            self._query_cache = QueryCache(self)
+        return self._query_cache
 
     @util.cached_property
     def albums(self):
@@ -39,6 +98,18 @@ class SongLibrary(Library[K, V], PicklingMixin):
 
     def destroy(self):
         super().destroy()
+        if self._text_index is not None:
+            self._text_index.destroy()
+            self._text_index = None
+        if self._numeric_columns is not None:
+            self._numeric_columns.destroy()
+            self._numeric_columns = None
+        if self._folded_tags is not None:
+            self._folded_tags.destroy()
+            self._folded_tags = None
+        if self._query_cache is not None:
+            self._query_cache.destroy()
+            self._query_cache = None
         if "albums" in self.__dict__:
             self.albums.destroy()
         if "playlists" in self.__dict__:
@@ -65,6 +136,7 @@ class SongLibrary(Library[K, V], PicklingMixin):
             return
         print_d(f"Renaming {song.key!r} to {new_name!r}", self)
         del self._contents[song.key]
+        self._journal_moved(song.key)
         song.rename(new_name)
         self._contents[song.key] = song
         if changed is not None:
@@ -79,8 +151,7 @@ class SongLibrary(Library[K, V], PicklingMixin):
 
         songs = self.values()
         if text != "":
-            search = Query(text, star).search
-            songs = [s for s in songs if search(s)]
+            songs = Query(text, star).filter(self)
         return songs
 
 
@@ -92,6 +163,63 @@ class SongFileLibrary(SongLibrary, WatchedFileLibraryMixin):
         print_d(f"Initializing {type(self).__name__}: {name!r}")
         super().__init__(name)
 
+    def _load_snapshot(self, filename):
+        """Loads from the columnar cache if enabled and up to date,
+        otherwise from the library file (creating the cache)"""
+
+        if not config.getboolean("library", "columnar_cache"):
+            return super()._load_snapshot(filename)
+
+        cache_filename = filename + CACHE_SUFFIX
+        try:
+            cache = ColumnarCache(cache_filename, filename)
+        except FileNotFoundError:
+            pass
+        except (OSError, SerializationError) as e:
+            print_w(f"Ignoring library cache {cache_filename!r} ({e})", self._name)
+        else:
+            print_d(f"Using library cache with {len(cache)} songs", self._name)
+            return LazySongDict(cache)
+
+        contents = super()._load_snapshot(filename)
+        if contents:
+            self._save_cache(filename, list(contents.values()))
+        return contents
+
+    def _load_contents(self, contents):
+        if not isinstance(contents, LazySongDict):
+            super()._load_contents(contents)
+            return
+
+        # Like FileLibrary._load_init, but without reading all songs
+        for point, keys in contents.group_by_mountpoint().items():
+            if point is None:
+                continue
+            is_mounted = ismount(point)
+            if not is_mounted:
+                # autofs, see FileLibrary._load_init
+                contents[keys[0]].exists()
+                is_mounted = ismount(point)
+            if not is_mounted:
+                self._add_masked(point, {key: contents.pop(key) for key in keys})
+        self._contents = contents
+
+    def _get_snapshot_saved(self, filename):
+        if not config.getboolean("library", "columnar_cache"):
+            return None
+        return partial(self._save_cache, filename)
+
+    def _save_cache(self, filename, content):
+        """Writes the columnar cache of the content saved to filename,
+        might be called in a thread"""
+
+        cache_filename = filename + CACHE_SUFFIX
+        try:
+            dump_cache(cache_filename, filename, content)
+        except (OSError, SerializationError):
+            print_w(f"Couldn't write library cache {cache_filename!r}", self._name)
+            util.print_exc()
+
     def get_filename(self, filename):
         key = normalize_path(filename, True)
         return self._contents.get(key)
@@ -120,3 +248,24 @@ class SongFileLibrary(SongLibrary, WatchedFileLibraryMixin):
             song = self._contents[key]
 
         return song
+
+    def _load_filenames(
+        self, paths: list[fsnative], task: Task
+    ) -> Generator[AudioFile | None, None, None]:
+        """Like `FileLibrary._load_filenames`, but reads the tags in worker
+        processes for larger scans if configured to do so"""
+
+        processes = config.getint("library", "scan_workers", 0)
+        if processes < 2 or len(paths) < workers.MIN_FILES:
+            yield from super()._load_filenames(paths, task)
+            return
+
+        done = 0
+        for results in workers.iter_music_files(paths, processes):
+            if not results:
+                yield None
+                continue
+            done += len(results)
+            task.update(done / len(paths))
+            for _path, song in results:
+                yield song
@@ -0,0 +1,315 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""Watching library directories through a single inotify instance.
+
+Instead of a `Gio.FileMonitor` per directory, all directories are watched
+through one inotify file descriptor. Events only note which entries of
+a directory were touched; once no new events arrived for a short while
+the touched entries are compared with the library and all resulting
+changes are applied at once, with one signal emission each for added,
+changed and removed songs. Retagging a whole album thus results in a
+single "changed" emission instead of one per file and event.
+"""
+
+import os
+import time
+from collections.abc import Generator, Iterable
+from pathlib import Path
+
+from gi.repository import GLib
+
+from quodlibet import _, formats
+from quodlibet.qltk import io_add_watch
+from quodlibet.qltk.notif import Task
+from quodlibet.util import copool, print_exc
+from quodlibet.util.dprint import print_d, print_w
+from quodlibet.util.inotify import (
+    IN_ATTRIB,
+    IN_CLOSE_WRITE,
+    IN_CREATE,
+    IN_DELETE,
+    IN_DELETE_SELF,
+    IN_IGNORED,
+    IN_ISDIR,
+    IN_MOVED_FROM,
+    IN_MOVED_TO,
+    IN_ONLYDIR,
+    IN_Q_OVERFLOW,
+    Inotify,
+)
+from quodlibet.util.path import normalize_path, unexpand
+from quodlibet.fsn import fsn2text, fsnative
+
+WATCH_MASK = (
+    IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_CREATE
+    | IN_DELETE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_DELETE_SELF
+    | IN_ONLYDIR
+)
+
+DELAY = 0.5
+"""Seconds without new events after which the collected ones are handled"""
+
+MAX_DELAY = 3.0
+"""Events get handled after this many seconds even if more keep coming"""
+
+
+class BatchedWatcher:
+    """Watches directories for a `WatchedFileLibraryMixin`.
+
+    Raises OSError if inotify can't be set up.
+    """
+
+    def __init__(self, library, delay: float = DELAY, max_delay: float = MAX_DELAY):
+        self._library = library
+        self._name = library._name
+        self._delay = delay
+        self._max_delay = max_delay
+        self._inotify = Inotify()
+        self._paths: dict[int, fsnative] = {}
+        self._wds: dict[fsnative, int] = {}
+        self._roots: list[fsnative] = []
+
+        self._pending: dict[fsnative, set[str]] = {}
+        """Directory path to touched entry names"""
+        self._moved_from: dict[int, fsnative] = {}
+        self._moves: list[tuple[fsnative, fsnative, bool]] = []
+        self._overflow = False
+        self._first_event = 0.0
+        self._timeout_id: int | None = None
+
+        self._source_id = io_add_watch(
+            self._inotify.fileno(),
+            GLib.PRIORITY_DEFAULT,
+            GLib.IO_IN | GLib.IO_ERR | GLib.IO_HUP,
+            self._on_readable,
+        )
+
+    def __len__(self):
+        return len(self._wds)
+
+    def __contains__(self, path: fsnative) -> bool:
+        return path in self._wds
+
+    def watch(
+        self, paths: Iterable[fsnative], exclude: Iterable[fsnative] = ()
+    ) -> Generator[None, None, None]:
+        """Watches all directories below the paths, to be run in a copool"""
+
+        exclude = [Path(e) for e in exclude]
+        for fullpath in paths:
+            desc = _("Adding watches for %s") % (fsn2text(unexpand(fullpath)))
+            with Task(_("Library"), desc) as task:
+                root = normalize_path(os.path.expanduser(fullpath), True)
+                if any(e in Path(root).parents for e in exclude):
+                    continue
+                if root not in self._roots:
+                    self._roots.append(root)
+                for i, _path in enumerate(self._watch_tree(root)):
+                    if not i % 50:
+                        task.pulse()
+                        yield
+        print_d(f"Watching {len(self._wds)} directories", self._name)
+
+    def _watch_tree(self, root: fsnative) -> Generator[fsnative, None, None]:
+        self._add_watch(root)
+        for path, dirs, _files in os.walk(root):
+            for d in dirs:
+                sub = os.path.join(path, d)
+                # os.walk() doesn't follow them either
+                if not os.path.islink(sub):
+                    self._add_watch(sub)
+            yield path
+
+    def _add_watch(self, path: fsnative) -> None:
+        try:
+            wd = self._inotify.add_watch(path, WATCH_MASK)
+        except OSError as e:
+            print_w(f"Couldn't watch {path} ({e})", self._name)
+            return
+        self._paths[wd] = path
+        self._wds[path] = wd
+
+    def _unwatch_tree(self, root: fsnative) -> None:
+        prefix = os.path.join(root, "")
+        for path in [p for p in self._wds if p == root or p.startswith(prefix)]:
+            wd = self._wds.pop(path)
+            self._paths.pop(wd, None)
+            self._inotify.rm_watch(wd)
+
+    def _rename_tree(self, old: fsnative, new: fsnative) -> None:
+        """Directories keep their watches when moved, update their paths"""
+
+        prefix = os.path.join(old, "")
+        for path in [p for p in self._wds if p == old or p.startswith(prefix)]:
+            wd = self._wds.pop(path)
+            moved = new + path[len(old) :]
+            self._wds[moved] = wd
+            self._paths[wd] = moved
+
+    def _on_readable(self, fd, condition) -> bool:
+        if condition & (GLib.IO_ERR | GLib.IO_HUP):
+            print_w("Lost inotify connection", self._name)
+            self._source_id = None
+            return False
+
+        for event in self._inotify.read_events():
+            if event.mask & IN_Q_OVERFLOW:
+                self._overflow = True
+                continue
+            dirpath = self._paths.get(event.wd)
+            if dirpath is None:
+                continue
+            if event.mask & IN_IGNORED:
+                # the directory is gone, the parent reports that
+                if self._wds.get(dirpath) == event.wd:
+                    del self._wds[dirpath]
+                del self._paths[event.wd]
+                continue
+            if event.mask & IN_DELETE_SELF or not event.name:
+                continue
+
+            path = os.path.join(dirpath, event.name)
+            if event.mask & IN_MOVED_FROM:
+                self._moved_from[event.cookie] = path
+            elif event.mask & IN_MOVED_TO:
+                old = self._moved_from.pop(event.cookie, None)
+                if old is not None:
+                    is_dir = bool(event.mask & IN_ISDIR)
+                    if is_dir:
+                        # so events from inside get the right path
+                        self._rename_tree(old, path)
+                    self._moves.append((old, path, is_dir))
+            self._pending.setdefault(dirpath, set()).add(event.name)
+
+        if self._pending or self._overflow:
+            self._schedule()
+        return True
+
+    def _schedule(self) -> None:
+        now = time.monotonic()
+        if self._timeout_id is not None:
+            if now - self._first_event >= self._max_delay:
+                return
+            GLib.source_remove(self._timeout_id)
+        else:
+            self._first_event = now
+        self._timeout_id = GLib.timeout_add(int(self._delay * 1000), self._flush)
+
+    def _flush(self) -> bool:
+        self._timeout_id = None
+        try:
+            self.flush()
+        except Exception:
+            print_w("Failed to handle file changes", self._name)
+            print_exc()
+        return False
+
+    def flush(self) -> None:
+        """Applies all collected changes to the library"""
+
+        pending, self._pending = self._pending, {}
+        moves, self._moves = self._moves, []
+        self._moved_from.clear()
+        library = self._library
+
+        if self._overflow:
+            self._overflow = False
+            print_w("Missed file changes, checking the whole library", self._name)
+            copool.add(library.rebuild, list(self._roots), funcid="watch_rescan")
+            return
+
+        added: list = []
+        changed: set = set()
+        removed: set = set()
+        new_dirs: list[fsnative] = []
+        gone_dirs: list[fsnative] = []
+        handled: set[fsnative] = set()
+
+        for old, new, is_dir in moves:
+            if is_dir:
+                handled.update((old, new))
+                self._move_root(old, new)
+                continue
+            song = library.get(normalize_path(old, True))
+            if song is not None:
+                library.move_song(song, normalize_path(new, True))
+                changed.add(song)
+                handled.add(old)
+
+        for dirpath, names in pending.items():
+            for name in names:
+                path = os.path.join(dirpath, name)
+                if path in handled:
+                    continue
+                key = normalize_path(path, True)
+                if os.path.isdir(key):
+                    if key not in self._wds:
+                        new_dirs.append(key)
+                elif key in self._wds:
+                    gone_dirs.append(key)
+                else:
+                    song = library.get(key)
+                    if song is not None:
+                        if not song.valid():
+                            library.reload(song, changed, removed)
+                    elif formats.filter(key) and os.path.isfile(key):
+                        song = library.add_filename(key, False)
+                        if song is not None:
+                            added.append(song)
+
+        if gone_dirs:
+            prefixes = tuple(os.path.join(d, "") for d in gone_dirs)
+            for key, song in list(library.iteritems()):
+                if key.startswith(prefixes):
+                    library.reload(song, changed, removed)
+            for path in gone_dirs:
+                self._unwatch_tree(path)
+
+        for path in new_dirs:
+            for _x in self._watch_tree(path):
+                pass
+        if new_dirs:
+            copool.add(library.scan, new_dirs)
+
+        print_d(
+            f"Handled changes in {len(pending)} directories: {len(added)} added, "
+            f"{len(changed)} changed, {len(removed)} removed",
+            self._name,
+        )
+        if added:
+            library.add(added)
+        if changed:
+            library.emit("changed", changed)
+        if removed:
+            library.emit("removed", removed)
+
+    def _move_root(self, old: fsnative, new: fsnative) -> None:
+        librarian = self._library.librarian
+        if librarian:
+            print_d(f"Moving tracks from {old} -> {new}...", self._name)
+            copool.add(
+                librarian.move_root,
+                old,
+                new,
+                write_files=False,
+                priority=GLib.PRIORITY_DEFAULT,
+            )
+
+    def destroy(self) -> None:
+        if self._timeout_id is not None:
+            GLib.source_remove(self._timeout_id)
+            self._timeout_id = None
+        if self._source_id is not None:
+            GLib.source_remove(self._source_id)
+            self._source_id = None
+        self._inotify.close()
+        self._paths.clear()
+        self._wds.clear()
@@ -0,0 +1,105 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""Reading tags of many files in worker processes, for library scans.
+
+Parsing tags with mutagen is CPU bound, so threads don't help. Files get
+sent to a process pool in chunks and the plain tag dicts are sent back,
+which get turned into AudioFile instances in the main process the same
+way unpickling the library does it.
+"""
+
+import multiprocessing
+from collections.abc import Generator, Sequence
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from quodlibet import config
+from quodlibet.formats import AudioFile, MusicFile
+from quodlibet.formats._intern import intern_item
+from quodlibet.fsn import fsnative
+from quodlibet.util import print_exc
+from quodlibet.util.dprint import print_d, print_w
+
+CHUNK_SIZE = 32
+"""Number of files a worker reads before returning the results"""
+
+MIN_FILES = 500
+"""Below this it's not worth starting worker processes"""
+
+
+def _init_worker(config_file: str | None) -> None:
+    import quodlibet
+
+    quodlibet.init_cli(no_translations=True, config_file=config_file)
+
+
+def _read_tags(paths: Sequence[fsnative]) -> list[tuple[type, dict] | None]:
+    """Runs in the worker. Returns the type and tags for each path"""
+
+    results: list[tuple[type, dict] | None] = []
+    for path in paths:
+        try:
+            song = MusicFile(path)
+        except Exception:
+            print_exc()
+            song = None
+        results.append(None if song is None else (type(song), dict(song)))
+    return results
+
+
+def _to_audio_file(kind: type, tags: dict) -> AudioFile:
+    # bypass __setitem__, like load_audio_files() does
+    song = dict.__new__(kind)
+    dict.update(song, map(intern_item, tags.keys(), tags.values()))
+    return song
+
+
+def iter_music_files(
+    paths: Sequence[fsnative], workers: int, timeout: float = 0.015
+) -> Generator[list[tuple[fsnative, AudioFile | None]], None, None]:
+    """Loads the files in `workers` processes.
+
+    Yields lists of (path, AudioFile or None) in completion order.
+    If nothing is ready after `timeout` seconds an empty list is yielded
+    instead, so the caller can get back to the main loop.
+
+    Chunks failing because of a broken worker get loaded in this process.
+    Closing the generator cancels all pending work.
+    """
+
+    print_d(f"Reading {len(paths)} files using {workers} processes")
+    executor = ProcessPoolExecutor(
+        workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(config.get_filename(),),
+    )
+    try:
+        pending = {}
+        for start in range(0, len(paths), CHUNK_SIZE):
+            chunk = paths[start : start + CHUNK_SIZE]
+            pending[executor.submit(_read_tags, chunk)] = chunk
+
+        while pending:
+            done, _not_done = wait(
+                pending, timeout=timeout, return_when=FIRST_COMPLETED
+            )
+            if not done:
+                yield []
+                continue
+            for future in done:
+                chunk = pending.pop(future)
+                try:
+                    results = future.result()
+                except Exception as e:
+                    print_w(f"Worker failed ({e!r}), loading {len(chunk)} files here")
+                    yield [(path, MusicFile(path)) for path in chunk]
+                else:
+                    yield [
+                        (path, None if r is None else _to_audio_file(*r))
+                        for path, r in zip(chunk, results, strict=True)
+                    ]
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
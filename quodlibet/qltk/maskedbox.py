@@ -62,7 +62,7 @@ class MaskedBox(Gtk.HBox):
 
         def cdf_count(column, cell, model, iter, data):
             mount = model[iter][0]
-            song_count = len(library.get_masked(mount))
+            song_count = library.count_masked(mount)
             text = ngettext("%d song", "%d songs", song_count) % song_count
             cell.set_property("text", text)
 
@@ -6,9 +6,13 @@
 # the Free Software Foundation; either version 2 of the License, or
 # (at your option) any later version.
 
+from itertools import count, islice
+from math import isqrt
+from typing import Any
+
 from gi.repository import Gtk, GObject
 
-from quodlibet.util import cmp
+from quodlibet.util import cached_func, cmp
 
 
 _auto_types = [float, bool, GObject.Object, int, str]
@@ -269,3 +273,417 @@ class ObjectStore(_ModelMixin, Gtk.ListStore):
 
     def prepend(self, row=None):
         return self.insert(0, row)
+
+
+MAX_PATH_SCANS = 16
+"""Number of path lookups after a change done by searching the rows,
+before building an index of the row positions"""
+
+MIN_POSITION_SHIFTS = 64
+"""Number of inserts and removes the index of row positions gets updated
+for before it gets rebuilt, at least. More for large models, up to the
+square root of the number of rows."""
+
+_stamps = count(1)
+
+
+@cached_func
+def _get_row_signals():
+    names = ["row-inserted", "row-deleted", "row-changed", "rows-reordered"]
+    return {name: GObject.signal_lookup(name, Gtk.TreeModel) for name in names}
+
+
+class ObjectListModel(_ModelMixin, GObject.Object, Gtk.TreeModel):
+    """Like an ObjectStore, but keeps the objects in a python list instead
+    of creating a GTK row for each of them.
+
+    Iters stay valid as long as their row exists, also when rows get
+    moved, like with a ListStore. Getting a row by its path is O(1), the
+    path of an iter gets looked up in an index of the row positions. Rows
+    inserted or removed since the index got built are applied to the
+    positions on lookup, reordering rows makes it get rebuilt.
+
+    Row signals only get emitted if anything is connected to them, so
+    filling or sorting a model not shown in a view is cheap.
+    """
+
+    def __init__(self, *args):
+        if len(args) > 1:
+            raise ValueError
+        if args and object not in args and GObject.TYPE_PYOBJECT not in args:
+            raise ValueError
+        super().__init__()
+        self._stamp = next(_stamps)
+        self._next_id = 1
+        self._ids: list[int] = []
+        """Row IDs in order"""
+        self._values: dict[int, Any] = {}
+        self._positions: dict[int, int] | None = {}
+        """Position by row ID, or None if it needs to be rebuilt"""
+        self._shifts: list[tuple[int, int]] = []
+        """(position, count) of rows inserted (or removed if negative)
+        since the index got built, rows at and after position moved"""
+        self._inserted: dict[int, tuple[int, int]] = {}
+        """(position, number of shifts before) by ID of rows inserted since
+        the index got built"""
+        self._scans = 0
+
+    def _is_connected(self, signal: str) -> bool:
+        signal_id = _get_row_signals()[signal]
+        return GObject.signal_has_handler_pending(self, signal_id, 0, True)
+
+    def _iter(self, id_: int) -> Gtk.TreeIter:
+        iter_ = Gtk.TreeIter()
+        iter_.stamp = self._stamp
+        iter_.user_data = id_
+        return iter_
+
+    def _id(self, iter_: Gtk.TreeIter) -> int:
+        if iter_.stamp != self._stamp or iter_.user_data not in self._values:
+            raise ValueError("invalid iter")
+        return iter_.user_data
+
+    def _position(self, id_: int) -> int:
+        positions = self._positions
+        if positions is None:
+            if self._scans < MAX_PATH_SCANS:
+                self._scans += 1
+                return self._ids.index(id_)
+            positions = self._build_index()
+        elif len(self._shifts) > max(MIN_POSITION_SHIFTS, isqrt(len(self._ids))):
+            positions = self._build_index()
+
+        position = positions.get(id_)
+        shifts = self._shifts
+        if position is None:
+            position, start = self._inserted[id_]
+            shifts = islice(shifts, start, None)
+        for at, moved in shifts:
+            if position >= at:
+                position += moved
+        return position
+
+    def _build_index(self) -> dict[int, int]:
+        positions = self._positions = {i: p for p, i in enumerate(self._ids)}
+        self._shifts = []
+        self._inserted = {}
+        return positions
+
+    def _moved(self):
+        self._positions = None
+        self._shifts = []
+        self._inserted = {}
+        self._scans = 0
+
+    def _added(self, position: int, new_ids):
+        """Updates the index after inserting the rows at position"""
+
+        if self._positions is None:
+            return
+        if position + len(new_ids) == len(self._ids):
+            if not self._shifts:
+                self._positions.update(
+                    zip(new_ids, range(position, len(self._ids)), strict=True)
+                )
+                return
+        else:
+            self._shifts.append((position, len(new_ids)))
+        start = len(self._shifts)
+        for index, id_ in enumerate(new_ids, position):
+            self._inserted[id_] = (index, start)
+
+    def _removed(self, position: int, id_: int):
+        """Updates the index after removing the row at position"""
+
+        if self._positions is None:
+            return
+        if self._positions.pop(id_, None) is None:
+            del self._inserted[id_]
+        if position < len(self._ids):
+            self._shifts.append((position + 1, -1))
+
+    def _new_ids(self, objects: list) -> range:
+        new_ids = range(self._next_id, self._next_id + len(objects))
+        self._next_id += len(objects)
+        self._values.update(zip(new_ids, objects, strict=True))
+        return new_ids
+
+    def _insert(self, position: int, objects) -> range:
+        objects = list(objects)
+        ids = self._ids
+        if position < 0 or position > len(ids):
+            position = len(ids)
+        new_ids = self._new_ids(objects)
+
+        if not self._is_connected("row-inserted"):
+            ids[position:position] = new_ids
+            self._added(position, new_ids)
+            return new_ids
+        path = Gtk.TreePath.new_from_indices
+        for index, id_ in enumerate(new_ids, position):
+            ids.insert(index, id_)
+            self._added(index, [id_])
+            self.row_inserted(path([index]), self._iter(id_))
+        return new_ids
+
+    def _reordered(self, new_order: list[int]):
+        self._moved()
+        if self._is_connected("rows-reordered"):
+            self.rows_reordered(Gtk.TreePath(), None, new_order)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def get_value(self, iter_, column=0):
+        return self._values[self._id(iter_)]
+
+    def set_value(self, iter_, column, value):
+        if isinstance(value, GObject.Value):
+            value = value.get_value()
+        id_ = self._id(iter_)
+        self._values[id_] = value
+        if self._is_connected("row-changed"):
+            self.row_changed(self.get_path(iter_), iter_)
+
+    def iter_is_valid(self, iter_):
+        return iter_.stamp == self._stamp and iter_.user_data in self._values
+
+    def is_empty(self):
+        return not self._ids
+
+    def itervalues(self, iter_=None):
+        """Yields all values"""
+
+        if iter_ is not None:
+            return
+        values = self._values
+        yield from [values[id_] for id_ in self._ids]
+
+    def iterrows(self, iter_=None):
+        """Yields (iter, value) tuples"""
+
+        if iter_ is not None:
+            return
+        values = self._values
+        for id_ in list(self._ids):
+            if id_ in values:
+                yield self._iter(id_), values[id_]
+
+    def append(self, row=None):
+        if not row:
+            assert not self.ATOMIC
+            row = [None]
+        return self._iter(self._insert(-1, row[:1])[0])
+
+    def insert(self, position, row=None):
+        if not row:
+            assert not self.ATOMIC
+            row = [None]
+        return self._iter(self._insert(position, row[:1])[0])
+
+    def prepend(self, row=None):
+        return self.insert(0, row)
+
+    def insert_before(self, sibling, row=None):
+        position = -1 if sibling is None else self._position(self._id(sibling))
+        if row is None:
+            assert not self.ATOMIC
+            row = [None]
+        return self._iter(self._insert(position, row[:1])[0])
+
+    def insert_after(self, sibling, row=None):
+        position = 0 if sibling is None else self._position(self._id(sibling)) + 1
+        if row is None:
+            assert not self.ATOMIC
+            row = [None]
+        return self._iter(self._insert(position, row[:1])[0])
+
+    def iter_append_many(self, objects):
+        """Append a list of python objects, yield iters"""
+
+        return map(self._iter, self._insert(-1, objects))
+
+    def append_many(self, objects):
+        """Append a list of python objects"""
+
+        self._insert(-1, objects)
+
+    def insert_many(self, position, objects):
+        self._insert(position, objects)
+
+    def merge_many(self, positions, objects):
+        """Inserts each object before the row at the matching position, or
+        appends it for `len(self)`. The positions have to be ascending and
+        refer to the rows before inserting any of the objects.
+
+        Like inserting them one by one, but the rows only get rearranged
+        once if no view is connected.
+        """
+
+        objects = list(objects)
+        positions = list(positions)
+        ids = self._ids
+        if len(positions) != len(objects):
+            raise ValueError("positions don't match the objects")
+        if positions != sorted(positions):
+            raise ValueError("positions aren't ascending")
+        if positions and (positions[0] < 0 or positions[-1] > len(ids)):
+            raise ValueError("position out of range")
+        new_ids = self._new_ids(objects)
+
+        if self._is_connected("row-inserted"):
+            path = Gtk.TreePath.new_from_indices
+            for index, id_ in enumerate(new_ids):
+                index += positions[index]
+                ids.insert(index, id_)
+                self._added(index, [id_])
+                self.row_inserted(path([index]), self._iter(id_))
+            return
+
+        merged = []
+        last = 0
+        for position, id_ in zip(positions, new_ids, strict=True):
+            merged += ids[last:position]
+            merged.append(id_)
+            last = position
+        merged += ids[last:]
+        self._ids = merged
+        self._moved()
+
+    def remove(self, iter_):
+        """Removes the row, and makes iter_ point to the next one.
+        Returns False if there is none."""
+
+        id_ = self._id(iter_)
+        position = self._position(id_)
+        ids = self._ids
+        del ids[position]
+        del self._values[id_]
+        self._removed(position, id_)
+
+        if self._is_connected("row-deleted"):
+            self.row_deleted(Gtk.TreePath.new_from_indices([position]))
+        if position < len(ids):
+            iter_.user_data = ids[position]
+            return True
+        iter_.stamp = 0
+        return False
+
+    def clear(self):
+        ids = self._ids
+        if self._is_connected("row-deleted"):
+            path = Gtk.TreePath.new_from_indices
+            while ids:
+                del self._values[ids.pop()]
+                self.row_deleted(path([len(ids)]))
+        self._ids = []
+        self._values = {}
+        self._build_index()
+
+    def reorder(self, new_order):
+        """Reorders the rows so that the row at `new_order[i]` ends up at
+        position i"""
+
+        ids = self._ids
+        if len(new_order) != len(ids):
+            raise ValueError("new_order doesn't match the number of rows")
+        self._ids = [ids[i] for i in new_order]
+        self._reordered(list(new_order))
+
+    def _move(self, iter_, position: int):
+        id_ = self._id(iter_)
+        old = self._position(id_)
+        if position > old:
+            position -= 1
+        if position == old:
+            return
+        order = list(range(len(self._ids)))
+        del order[old]
+        order.insert(position, old)
+        ids = self._ids
+        del ids[old]
+        ids.insert(position, id_)
+        self._reordered(order)
+
+    def move_before(self, iter_, position):
+        """Moves the row before the one of position, or to the end if None"""
+
+        if position is None:
+            self._move(iter_, len(self._ids))
+        else:
+            self._move(iter_, self._position(self._id(position)))
+
+    def move_after(self, iter_, position):
+        """Moves the row after the one of position, or to the start if None"""
+
+        if position is None:
+            self._move(iter_, 0)
+        else:
+            self._move(iter_, self._position(self._id(position)) + 1)
+
+    def swap(self, a, b):
+        first = self._position(self._id(a))
+        second = self._position(self._id(b))
+        if first == second:
+            return
+        order = list(range(len(self._ids)))
+        order[first], order[second] = second, first
+        ids = self._ids
+        ids[first], ids[second] = ids[second], ids[first]
+        self._reordered(order)
+
+    def do_get_flags(self):
+        return Gtk.TreeModelFlags.ITERS_PERSIST | Gtk.TreeModelFlags.LIST_ONLY
+
+    def do_get_n_columns(self):
+        return 1
+
+    def do_get_column_type(self, index):
+        return GObject.TYPE_PYOBJECT
+
+    def do_get_iter(self, path):
+        indices = path.get_indices()
+        if len(indices) == 1 and 0 <= indices[0] < len(self._ids):
+            return True, self._iter(self._ids[indices[0]])
+        return False, None
+
+    def do_get_path(self, iter_):
+        return Gtk.TreePath.new_from_indices([self._position(self._id(iter_))])
+
+    def do_get_value(self, iter_, column):
+        return self._get_marshalable(self._values[self._id(iter_)])
+
+    def do_iter_next(self, iter_):
+        position = self._position(self._id(iter_)) + 1
+        if position < len(self._ids):
+            iter_.user_data = self._ids[position]
+            return True
+        iter_.stamp = 0
+        return False
+
+    def do_iter_previous(self, iter_):
+        position = self._position(self._id(iter_)) - 1
+        if position >= 0:
+            iter_.user_data = self._ids[position]
+            return True
+        iter_.stamp = 0
+        return False
+
+    def do_iter_children(self, parent):
+        if parent is None and self._ids:
+            return True, self._iter(self._ids[0])
+        return False, None
+
+    def do_iter_has_child(self, iter_):
+        return False
+
+    def do_iter_n_children(self, iter_):
+        return len(self._ids) if iter_ is None else 0
+
+    def do_iter_nth_child(self, parent, n):
+        if parent is None and 0 <= n < len(self._ids):
+            return True, self._iter(self._ids[n])
+        return False, None
+
+    def do_iter_parent(self, child):
+        return False, None
@@ -117,7 +117,7 @@ class SearchBarBox(Gtk.Box):
 
     def _update_query_from(self, text):
         # TODO: remove tight coupling to Query
-        self._query = Query(text, star=self._star)
+        self._query = Query.cached(text, star=self._star)
 
     def get_text(self):
         """Get the active text as unicode"""
@@ -260,6 +260,12 @@ class LimitSearchBarBox(SearchBarBox):
     def __limit_changed(self, *args):
         self.changed()
 
+    @property
+    def limited(self) -> bool:
+        """If `limit` can leave out songs"""
+
+        return self.__limit.get_visible()
+
     def limit(self, songs):
         if self.__limit.get_visible():
             return limit_songs(songs, self.__limit.value, self.__limit.weighted)
@@ -340,8 +346,10 @@ class MultiSearchBarBox(LimitSearchBarBox):
 
     def _update_query_from(self, text):
         if self.flow_box.get_visible():
-            matches = [lq.query._unpack() for lq in self.flow_box.get_children()]
+            items = self.flow_box.get_children()
+            matches = [lq.query._unpack() for lq in items]
 
+            # not a cached one, as it gets changed
             self._query = Query(text, star=self._star)
             self._query._match = reduce(operator.and_, matches, self._query._match)
         else:
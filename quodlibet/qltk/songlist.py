@@ -9,6 +9,7 @@
 # the Free Software Foundation; either version 2 of the License, or
 # (at your option) any later version.
 
+import time
 from collections.abc import Sequence
 
 from gi.repository import Gtk, GLib, Gdk, GObject
@@ -181,6 +182,42 @@ def get_sort_tag(tag):
     return tag
 
 
+def _sort_key(song):
+    return song.sort_key
+
+
+def _sort_ranks(values: list, reverse: bool = False) -> list[int]:
+    """Numbers sorting like the values (or the opposite way), equal for
+    equal values"""
+
+    distinct = sorted(set(values), reverse=reverse)
+    ranks = {value: i for i, value in enumerate(distinct)}
+    return list(map(ranks.__getitem__, values))
+
+
+def _song_order(songs: list[AudioFile], key_funcs) -> list[int]:
+    """Positions of the songs when sorted by each of the (key, reverse)
+    pairs in turn, so the last one is the most important. The first one
+    has to be the default sort key.
+
+    Sorts only once, by the ranks of the keys and the default sort key.
+    """
+
+    reverse = key_funcs[0][1]
+    columns = []
+    for key, key_reverse in reversed(key_funcs[1:]):
+        if key is _sort_key:
+            values = [tuple(s.sort_key) for s in songs]
+        else:
+            values = list(map(key, songs))
+        columns.append(_sort_ranks(values, key_reverse != reverse))
+    # compare the song parts of the default keys only within albums
+    columns.append(_sort_ranks([s.album_key for s in songs]))
+    columns.append([s.sort_key[1] for s in songs])
+    keys = list(zip(*columns, strict=True))
+    return sorted(range(len(songs)), key=keys.__getitem__, reverse=reverse)
+
+
 def header_tag_split(header):
     """Split a pattern or a tied tag into separate tags"""
 
@@ -807,9 +844,12 @@ class SongList(AllTreeView, SongListDnDMixin, DragScroll, util.InstanceTracker):
 
         orders = self.get_sort_orders()
         if orders:
-            song_order = list(range(len(songs)))
-            for key, reverse in self.__get_song_sort_key_func(orders):
-                song_order.sort(key=lambda i: key(songs[i]), reverse=reverse)
+            start = time.perf_counter()
+            song_order = _song_order(songs, self.__get_song_sort_key_func(orders))
+            print_d(
+                f"Sorted {len(songs)} songs by {orders} "
+                f"in {time.perf_counter() - start:.3f}s"
+            )
             return song_order
         return None
 
@@ -824,7 +864,7 @@ class SongList(AllTreeView, SongListDnDMixin, DragScroll, util.InstanceTracker):
             # always sort using the default sort key first
             if first:
                 first = False
-                key_func.append((lambda s: s.sort_key, reverse))
+                key_func.append((_sort_key, reverse))
                 last_order = reverse
                 last_tag = ""
 
@@ -835,7 +875,7 @@ class SongList(AllTreeView, SongListDnDMixin, DragScroll, util.InstanceTracker):
             last_tag = tag
 
             if tag == "":
-                key_func.append((lambda s: s.sort_key, reverse))
+                key_func.append((_sort_key, reverse))
             else:
                 sort_func = AudioFile.sort_by_func(tag)
                 key_func.append((sort_func, reverse))
@@ -856,9 +896,23 @@ class SongList(AllTreeView, SongListDnDMixin, DragScroll, util.InstanceTracker):
             model.append_many(songs)
             return
 
+        # sort once and merge them in, instead of inserting one by one
+        order = self._get_song_order(songs)
+        if order is not None:
+            songs = [songs[i] for i in order]
+        positions = []
+        position = 0
         for song in songs:
-            insert_iter = self.__find_song_position(song)
-            model.insert_before(insert_iter, row=[song])
+            position = self.__find_song_index(song, position)
+            positions.append(position)
+        model.merge_many(positions, songs)
+
+    def remove_songs(self, songs):
+        """Remove all rows of the songs"""
+
+        iters = self.get_model().find_all(songs)
+        if iters:
+            self.remove_iters(iters)
 
     def set_songs(
         self,
@@ -980,21 +1034,31 @@ class SongList(AllTreeView, SongListDnDMixin, DragScroll, util.InstanceTracker):
         Returns None if the correct position is at the end of the song list.
         """
 
+        model = self.get_model()
+        index = self.__find_song_index(song)
+        if index < len(model):
+            return model.iter_nth_child(None, index)
+        return None
+
+    def __find_song_index(self, song, start=0):
+        """The index of the first row after `start` that comes after the
+        song in the current sort order, or the number of rows"""
+
         model = self.get_model()
         order = self.get_sort_orders()
         sort_key_func = list(enumerate(reversed(self.__get_song_sort_key_func(order))))
         song_sort_keys = [key(song) for i, (key, r) in sort_key_func]
-        i = 0
+        i = start
         j = len(model)
         while i < j:
             mid = (i + j) // 2
             other_song_iter = model.iter_nth_child(None, mid)
             other_song = model.get_value(other_song_iter)
             song_is_lower = False
-            for i, (key, reverse) in sort_key_func:
+            for k, (key, reverse) in sort_key_func:
                 other_key = key(other_song)
-                is_lower = song_sort_keys[i] < other_key
-                is_greater = song_sort_keys[i] > other_key
+                is_lower = song_sort_keys[k] < other_key
+                is_greater = song_sort_keys[k] > other_key
                 if not reverse and is_lower or reverse and is_greater:
                     song_is_lower = True
                     break
@@ -1004,9 +1068,7 @@ class SongList(AllTreeView, SongListDnDMixin, DragScroll, util.InstanceTracker):
                 j = mid
             else:
                 i = mid + 1
-        if i < len(model):
-            return model.iter_nth_child(None, i)
-        return None
+        return i
 
     def __find_iters_in_selection(self, songs) -> tuple[list, list, bool]:
         model, rows = self.get_selection().get_selected_rows()
@@ -1050,6 +1112,8 @@ class SongList(AllTreeView, SongListDnDMixin, DragScroll, util.InstanceTracker):
 
     def __song_added(self, librarian, songs):
         window = qltk.get_top_parent(self)
+        if getattr(window.browser, "standing_query", None) is not None:
+            return
         filter_ = window.browser.active_filter
         if callable(filter_):
             self.add_songs(list(filter(filter_, songs)))
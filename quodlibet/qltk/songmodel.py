@@ -14,7 +14,7 @@ from gi.repository import Gtk
 
 from quodlibet.order import Order
 from quodlibet.qltk.playorder import OrderInOrder
-from quodlibet.qltk.models import ObjectStore
+from quodlibet.qltk.models import ObjectListModel
 from quodlibet.util import print_d
 from quodlibet import config
 
@@ -143,7 +143,7 @@ class PlaylistMux:
             q.remove(iter_)
 
 
-class TrackCurrentModel(ObjectStore):
+class TrackCurrentModel(ObjectListModel):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.__iter = None
@@ -159,9 +159,10 @@ class TrackCurrentModel(ObjectStore):
         self.__iter = None
 
         oldsong = self.last_current
-        for iter_, song in zip(self.iter_append_many(songs), songs, strict=False):
-            if song is oldsong:
-                self.__iter = iter_
+        self.append_many(songs)
+        positions = [i for i, song in enumerate(songs) if song is oldsong]
+        if positions:
+            self.__iter = self.iter_nth_child(None, positions[-1])
 
     def get(self) -> list[Any]:
         """A list of all contained songs"""
@@ -207,9 +208,9 @@ class TrackCurrentModel(ObjectStore):
             return self.current_iter
 
         # search the rest
-        for iter_, value in self.iterrows():
+        for i, value in enumerate(self.itervalues()):
             if value == song:
-                return iter_
+                return self.iter_nth_child(None, i)
         return None
 
     def find_all(self, songs: Iterable[Any]):
@@ -218,7 +219,8 @@ class TrackCurrentModel(ObjectStore):
         """
 
         songs = set(songs)
-        return [iter_ for iter_, value in self.iterrows() if value in songs]
+        positions = [i for i, value in enumerate(self.itervalues()) if value in songs]
+        return [self.iter_nth_child(None, i) for i in positions]
 
     def remove(self, iter_):
         if self.__iter and self[iter_].path == self[self.__iter].path:
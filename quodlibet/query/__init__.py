@@ -3,7 +3,12 @@
 # the Free Software Foundation; either version 2 of the License, or
 # (at your option) any later version.
 
+from ._cache import QueryCache
+from ._columns import NumericColumns
+from ._folded import FoldedTags
+from ._index import TextIndex
 from ._query import Query, QueryType
+from ._standing import StandingQuery
 
 
-Query, QueryType
+Query, QueryType, TextIndex, NumericColumns, QueryCache, StandingQuery, FoldedTags
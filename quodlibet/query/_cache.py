@@ -0,0 +1,243 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""Sharing the results of recent queries on a library.
+
+Results are keyed by what the parsed queries match (see `query_key`) and
+remember the library generation they are valid for. Once the library changes, the
+songs added, changed or removed since then get re-tested instead of the
+whole library, as long as those changes are still in the change log.
+Songs that start matching with an update get appended, so updated
+results aren't necessarily in library order.
+"""
+
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+
+from quodlibet import config
+from quodlibet.formats import TIME_TAGS
+from quodlibet.formats._audio import UNCACHED_SORT_TAGS
+from quodlibet.util import tagsplit
+from quodlibet.util.dprint import print_d
+from . import _match as match
+
+MAX_QUERIES = 32
+"""Number of query results to keep"""
+
+MAX_SONGS = 1_000_000
+"""Total number of songs in all kept results"""
+
+MAX_LOG_SONGS = 50_000
+"""Number of added, changed or removed songs to remember for updating
+results, anything older needs a full search"""
+
+
+def cacheable(node: match.Node) -> bool:
+    """If the results of node only depend on the songs.
+
+    Not the case for comparisons relative to the current time, tags which
+    can change without the song changing, like the playlists songs are in
+    or their lyrics, and query plugins, which can do anything.
+    """
+
+    node = node._unpack()
+    if isinstance(node, match.Inter | match.Union):
+        return all(map(cacheable, node.res))
+    if isinstance(node, match.Neg):
+        return cacheable(node.res)
+    if isinstance(node, match.Tag):
+        return all(UNCACHED_SORT_TAGS.isdisjoint(tagsplit(n)) for n in node.names)
+    if isinstance(node, match.Numcmp):
+        for expr in (node._expr, node._expr2):
+            if type(expr) is match.NumexprTag:
+                if expr._base_ftag in TIME_TAGS:
+                    return False
+            elif type(expr) not in (match.NumexprNumber, match.NumexprNumberOrDate):
+                return False
+        return True
+    return isinstance(node, match.True_ | match.False_)
+
+
+def _node_key(node: match.Node) -> str:
+    node = node._unpack()
+    if isinstance(node, match.Inter | match.Union):
+        # the planner reorders them
+        children = sorted(map(_node_key, node.res))
+        return f"<{type(node).__name__} {children!r}>"
+    if isinstance(node, match.Neg):
+        return f"<Neg {_node_key(node.res)}>"
+    if isinstance(node, match.Tag):
+        return f"<Tag names={node.names!r}, res={_node_key(node.res)}>"
+    return repr(node)
+
+
+def query_key(query) -> tuple:
+    """What the results of the query get shared by: its parsed form, the
+    star tags and the ignored characters, which change the parsing"""
+
+    return (
+        _node_key(query._match),
+        tuple(query.star),
+        config.get("browsers", "ignored_characters"),
+    )
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.updates = 0
+        """Results updated with the songs changed since"""
+        self.refresh_time = 0.0
+        """Seconds spent on searching for misses and updates"""
+
+    def __repr__(self):
+        return (
+            f"<CacheStats hits={self.hits} misses={self.misses} "
+            f"updates={self.updates} refresh_time={self.refresh_time:.3f}>"
+        )
+
+
+class _Entry:
+    def __init__(self, query, generation, songs):
+        self.query = query
+        self.generation = generation
+        self.songs = dict.fromkeys(songs)
+
+
+class QueryCache:
+    """Results of the recently used queries on a library"""
+
+    def __init__(self, library, max_queries=MAX_QUERIES, max_songs=MAX_SONGS):
+        self._library = library
+        self._max_queries = max_queries
+        self._max_songs = max_songs
+        self._entries: OrderedDict[tuple, _Entry] = OrderedDict()
+        self._log: list[tuple[int, bool, list]] = []
+        """(generation, removed, songs) for each signal"""
+        self._log_songs = 0
+        self._log_start = library.generation
+        """The log has all changes after this generation"""
+        self._seen = library.generation
+        """The generation of the last signal handled"""
+        self.stats = CacheStats()
+
+        self._sigs = [
+            library.connect("added", self.__changed, False),
+            library.connect("changed", self.__changed, False),
+            library.connect("removed", self.__changed, True),
+        ]
+
+    def destroy(self):
+        for sig in self._sigs:
+            self._library.disconnect(sig)
+        self._sigs = []
+        self.clear()
+
+    def clear(self):
+        self._entries.clear()
+        self._log = []
+        self._log_songs = 0
+        self._log_start = self._library.generation
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __changed(self, library, songs, removed):
+        self._seen = library.generation
+        if not self._entries:
+            self._log_start = library.generation
+            return
+        songs = list(songs)
+        self._log.append((library.generation, removed, songs))
+        self._log_songs += len(songs)
+        while self._log_songs > MAX_LOG_SONGS:
+            generation, _removed, old = self._log.pop(0)
+            self._log_songs -= len(old)
+            self._log_start = generation
+
+    def filter(self, query) -> list | None:
+        """The songs of the library matching query, or None if the
+        results of the query can't be cached"""
+
+        result = self.get(query)
+        if result is not None or not self._usable(query):
+            return result
+
+        start = time.perf_counter()
+        self.stats.misses += 1
+        generation = self._library.generation
+        songs = query._filter(self._library)
+        self.put(query, songs, generation)
+        self.stats.refresh_time += time.perf_counter() - start
+        return songs
+
+    def get(self, query) -> list | None:
+        """The cached songs matching query, updated if needed, or None if
+        there are none"""
+
+        if not self._usable(query):
+            return None
+
+        key = query_key(query)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.generation == self._library.generation:
+            self.stats.hits += 1
+        elif entry.generation >= self._log_start:
+            start = time.perf_counter()
+            self.stats.updates += 1
+            self._update(entry)
+            self.stats.refresh_time += time.perf_counter() - start
+        else:
+            return None
+        self._entries.move_to_end(key)
+        return list(entry.songs)
+
+    def put(self, query, songs, generation: int) -> None:
+        """Remember the songs matching query, as of the library
+        generation. Changes since then get applied when needed."""
+
+        if not self._usable(query):
+            return
+        key = query_key(query)
+        self._entries[key] = _Entry(query, generation, songs)
+        self._entries.move_to_end(key)
+        self._evict()
+
+    def _usable(self, query) -> bool:
+        if not cacheable(query._match):
+            return False
+        # not if called from a handler of a signal that didn't reach us yet
+        return self._seen == self._library.generation
+
+    def _update(self, entry: _Entry):
+        songs = entry.songs
+        search = entry.query.search
+        for generation, removed, changed in self._log:
+            if generation <= entry.generation:
+                continue
+            for song in changed:
+                if removed or not search(song):
+                    songs.pop(song, None)
+                else:
+                    songs[song] = None
+        entry.generation = self._library.generation
+
+    def _evict(self):
+        total = sum(len(e.songs) for e in self._entries.values())
+        while self._entries and (
+            len(self._entries) > self._max_queries or total > self._max_songs
+        ):
+            key, entry = self._entries.popitem(last=False)
+            total -= len(entry.songs)
+            print_d(f"Dropped cached results of {key[0]!r}")
+        if not self._entries:
+            self._log = []
+            self._log_songs = 0
+            self._log_start = self._library.generation
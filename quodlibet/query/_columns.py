@@ -0,0 +1,371 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""Columns of numeric tag values of all songs of a library, for
+evaluating numeric comparisons without going through each song.
+
+Each `~#` tag (and the parsed `date`) used in a comparison gets an
+array of doubles with one value per song, NaN for songs without one.
+Comparing against a constant then maps a bound float comparison over
+the array, which never calls back into Python code per song.
+
+Time tags and dates, which searches usually look at a range of, also get
+their values sorted, so the matching songs can be found by bisecting.
+"""
+
+from __future__ import annotations
+
+import math
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import compress, repeat
+
+from quodlibet.formats import TIME_TAGS
+from quodlibet.util import parse_date
+from quodlibet.util.dprint import print_d
+from . import _match as match
+
+NAN = float("nan")
+
+# val <op> c is the same as c.<method>(val)
+_REFLECTED = {
+    "lt": "__gt__",
+    "le": "__ge__",
+    "gt": "__lt__",
+    "ge": "__le__",
+    "eq": "__eq__",
+    "ne": "__ne__",
+}
+
+_CONSTANT_TYPES = (
+    match.NumexprNumber,
+    match.NumexprNow,
+    match.NumexprNumberOrDate,
+)
+
+
+SORTED_TAGS = TIME_TAGS | {"date"}
+"""Tags to keep sorted values of"""
+
+MAX_SORTED_UPDATES = 1000
+"""Above this many changed songs sorted values get sorted again instead"""
+
+
+def _number(value) -> float:
+    if isinstance(value, int | float):
+        return float(value)
+    return NAN
+
+
+def _match_range(values: array, matches) -> tuple[int, int]:
+    """The range of sorted values matching, for a predicate that is
+    either true for all values up to some point or from some point on"""
+
+    if not values:
+        return 0, 0
+    first, last = matches(values[0]), matches(values[-1])
+    if first and last:
+        return 0, len(values)
+    if first:
+        return 0, bisect_left(values, True, key=lambda v: not matches(v))
+    if last:
+        return bisect_left(values, True, key=matches), len(values)
+    return 0, 0
+
+
+class NumericColumns:
+    """Numeric tag values of all songs in a library, one column per tag.
+
+    Columns get created on first use and are kept up to date using the
+    library signals. Like `TextIndex` removed songs leave a gap until
+    the columns get rebuilt.
+    """
+
+    def __init__(self, library):
+        self._library = library
+        self._songs: list = []
+        self._ids: dict = {}
+        self._columns: dict[str, array] = {}
+        self._sorted: dict[str, tuple[array, array]] = {}
+        """The finite values of a column and their song ids, by value"""
+        self._stale = 0
+        self._built = False
+
+        self._sigs = [
+            library.connect("added", self.__added),
+            library.connect("changed", self.__changed),
+            library.connect("removed", self.__removed),
+        ]
+
+    def destroy(self):
+        for sig in self._sigs:
+            self._library.disconnect(sig)
+        self._sigs = []
+        self._clear()
+
+    def _clear(self):
+        self._songs = []
+        self._ids = {}
+        self._columns = {}
+        self._sorted = {}
+        self._stale = 0
+        self._built = False
+
+    def _build(self):
+        tags = list(self._columns)
+        self._clear()
+        self._built = True
+        self._add(self._library.values())
+        for tag in tags:
+            self.column(tag)
+
+    def _value(self, song, tag: str) -> float:
+        if tag == "date":
+            date = song("date")
+            if not date:
+                return NAN
+            try:
+                return round(parse_date(date), 2)
+            except ValueError:
+                return NAN
+        num = _number(song(tag, None))
+        if tag.split(":")[0] not in TIME_TAGS:
+            num = round(num, 2)
+        return num
+
+    def _add(self, songs):
+        for song in songs:
+            if song in self._ids:
+                continue
+            song_id = self._ids[song] = len(self._songs)
+            self._songs.append(song)
+            for tag, column in self._columns.items():
+                column.append(NAN)
+                self._set(tag, column, song_id, self._value(song, tag))
+
+    def _set(self, tag: str, column: array, song_id: int, value: float):
+        old = column[song_id]
+        column[song_id] = value
+        values_ids = self._sorted.get(tag)
+        if values_ids is None:
+            return
+        values, ids = values_ids
+        if math.isfinite(old):
+            index = bisect_left(values, old)
+            while ids[index] != song_id:
+                index += 1
+            del values[index]
+            del ids[index]
+        if math.isfinite(value):
+            index = bisect_right(values, value)
+            values.insert(index, value)
+            ids.insert(index, song_id)
+
+    def __added(self, library, songs):
+        if self._built:
+            self._forget_sorted(songs)
+            self._add(songs)
+
+    def __changed(self, library, songs):
+        if not self._built:
+            return
+        self._forget_sorted(songs)
+        for song in songs:
+            song_id = self._ids.get(song)
+            if song_id is None:
+                self._add([song])
+                continue
+            for tag, column in self._columns.items():
+                self._set(tag, column, song_id, self._value(song, tag))
+
+    def __removed(self, library, songs):
+        if not self._built:
+            return
+        self._forget_sorted(songs)
+        for song in songs:
+            song_id = self._ids.pop(song, None)
+            if song_id is not None:
+                self._songs[song_id] = None
+                self._stale += 1
+                for tag, column in self._columns.items():
+                    self._set(tag, column, song_id, NAN)
+
+    def _forget_sorted(self, songs):
+        """Sorting again is faster than updating for lots of songs"""
+
+        if self._sorted and len(songs) > MAX_SORTED_UPDATES:
+            self._sorted = {}
+
+    def column(self, tag: str) -> array:
+        """The values of tag (`~#` tags or "date") for all songs,
+        rounded like `NumexprTag` does unless they are times"""
+
+        column = self._columns.get(tag)
+        if column is None:
+            start = time.perf_counter()
+            value = self._value
+            column = array(
+                "d", (NAN if s is None else value(s, tag) for s in self._songs)
+            )
+            self._columns[tag] = column
+            print_d(
+                f"Read {tag!r} of {len(column)} songs "
+                f"in {time.perf_counter() - start:.2f}s"
+            )
+        return column
+
+    def sorted_column(self, tag: str) -> tuple[array, array]:
+        """The finite values of the column of tag in ascending order and
+        the ids of their songs"""
+
+        values_ids = self._sorted.get(tag)
+        if values_ids is None:
+            column = self.column(tag)
+            ids = sorted(
+                filter(lambda i: math.isfinite(column[i]), range(len(column))),
+                key=column.__getitem__,
+            )
+            values_ids = array("d", map(column.__getitem__, ids)), array("I", ids)
+            self._sorted[tag] = values_ids
+        return values_ids
+
+    def _all(self) -> int:
+        return int.from_bytes(b"\x01" * len(self._songs), "little")
+
+    def _numcmp_mask(self, node: match.Numcmp, now: float) -> int | None:
+        expr, expr2, op = node._expr, node._expr2, node._op
+        if type(expr) is not match.NumexprTag:
+            if type(expr2) is not match.NumexprTag:
+                return None
+            expr, expr2 = expr2, expr
+            op = {"lt": "gt", "le": "ge", "gt": "lt", "ge": "le"}.get(
+                op.__name__, op.__name__
+            )
+        else:
+            op = op.__name__
+        if not isinstance(expr2, _CONSTANT_TYPES):
+            return None
+
+        use_date = expr.use_date() or expr2.use_date()
+        value = expr2.evaluate(None, now, use_date)
+        if value is None:
+            return None
+        tag = "date" if expr._tag == "date" else expr._ftag
+
+        if tag in SORTED_TAGS:
+            return self._range_mask(tag, expr._base_ftag in TIME_TAGS, op, value, now)
+
+        values = self.column(tag)
+        if expr._base_ftag in TIME_TAGS and tag != "date":
+            values = list(map(round, map(now.__sub__, values), repeat(2)))
+        mask = map(getattr(float(value), _REFLECTED[op]), values)
+        if op == "ne":
+            # songs without a value never match
+            mask = map(bool.__and__, mask, map(math.isfinite, values))
+        return int.from_bytes(bytes(mask), "little")
+
+    def _range_mask(self, tag: str, age: bool, op: str, value, now: float) -> int:
+        """Like the other comparisons, but bisecting the sorted values.
+        If age is set, the rounded time since the value gets compared."""
+
+        values, ids = self.sorted_column(tag)
+
+        def predicate(op):
+            compare = getattr(float(value), _REFLECTED[op])
+            if age:
+                return lambda v: compare(round(now - v, 2))
+            return compare
+
+        if op in ("eq", "ne"):
+            start, end = _match_range(values, predicate("ge"))
+            start2, end2 = _match_range(values, predicate("le"))
+            start, end = max(start, start2), min(end, end2)
+            end = max(start, end)
+            matched = ids[start:end] if op == "eq" else ids[:start] + ids[end:]
+        else:
+            start, end = _match_range(values, predicate(op))
+            matched = ids[start:end]
+
+        flags = bytearray(len(self._songs))
+        for song_id in matched:
+            flags[song_id] = 1
+        return int.from_bytes(flags, "little")
+
+    def _node_mask(self, node, now) -> int | None:
+        """One byte per song, 1 if it matches, as an int so masks can be
+        combined with bitwise operators"""
+
+        node = node._unpack()
+        if isinstance(node, match.Numcmp):
+            return self._numcmp_mask(node, now)
+        if isinstance(node, match.Inter):
+            result = self._all()
+            for child in node.res:
+                mask = self._node_mask(child, now)
+                if mask is None:
+                    return None
+                result &= mask
+            return result
+        if isinstance(node, match.Union):
+            result = 0
+            for child in node.res:
+                mask = self._node_mask(child, now)
+                if mask is None:
+                    return None
+                result |= mask
+            return result
+        if isinstance(node, match.Neg):
+            mask = self._node_mask(node.res, now)
+            return None if mask is None else mask ^ self._all()
+        if isinstance(node, match.True_):
+            return self._all()
+        if isinstance(node, match.False_):
+            return 0
+        return None
+
+    def filter(self, node: match.Node, songs) -> list | None:
+        """The songs matching node, or None if the columns can't help.
+
+        Parts of an intersection that can be evaluated on the columns
+        are, the other parts only get matched against the remaining
+        songs.
+        """
+
+        node = node._unpack()
+        if not self._built or self._stale > len(self._ids) // 2:
+            self._build()
+
+        now = time.time()
+        parts = node.res if isinstance(node, match.Inter) else [node]
+        rest = []
+        mask = None
+        for part in parts:
+            part_mask = self._node_mask(part, now)
+            if part_mask is None:
+                rest.append(part)
+            else:
+                mask = part_mask if mask is None else mask & part_mask
+        if mask is None:
+            return None
+        flags = mask.to_bytes(len(self._songs), "little")
+
+        if songs is self._library:
+            # the columns are in library order
+            result = [s for s in compress(self._songs, flags) if s is not None]
+            return match.Inter(rest).filter(result) if rest else result
+
+        get_id = self._ids.get
+        search = match.Inter(rest).search if rest else None
+        result = []
+        for song in songs:
+            song_id = get_id(song)
+            if song_id is None:
+                # not in the library, nothing known about it
+                if node.search(song):
+                    result.append(song)
+            elif flags[song_id] and (search is None or search(song)):
+                result.append(song)
+        return result
@@ -0,0 +1,159 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""Compiling parsed queries to a single Python function.
+
+Like `PatternCompiler` this generates Python code: the node tree becomes
+one boolean expression with the tag lookups of `Tag.search` written out,
+the regex search functions bound as globals and `and`/`or` doing the
+short-circuiting. Nodes the compiler doesn't know about get their own
+search method called.
+"""
+
+from __future__ import annotations
+
+import math
+import operator
+from collections.abc import Callable
+
+from quodlibet.formats import FILESYSTEM_TAGS, TIME_TAGS
+from quodlibet.fsn import fsn2text, fsnative
+from . import _match as match
+
+_OPERATORS = {
+    operator.lt: "<",
+    operator.le: "<=",
+    operator.gt: ">",
+    operator.ge: ">=",
+    operator.eq: "==",
+    operator.ne: "!=",
+}
+
+
+class QueryCompiler:
+    def __init__(self, node: match.Node):
+        self.__root = node._unpack()
+        self.__uses_get = False
+
+    def compile(self) -> Callable[[object], bool]:
+        """Returns a function doing what the search method of the node
+        does"""
+
+        scope = {"fsn2text": fsn2text, "fs_default": fsnative()}
+        defs: list[str] = []
+        expr = self.__node(self.__root, scope, defs)
+        content = defs + ["def f(s):"]
+        if self.__uses_get:
+            content.append("  g = s.get")
+        content.append(f"  return {expr}")
+        code = "\n".join(content)
+        exec(compile(code, "<query>", "exec"), scope)
+        return scope["f"]
+
+    def __bind(self, obj, scope, prefix: str) -> str:
+        var = "%s%d" % (prefix, len(scope))
+        scope[var] = obj
+        return var
+
+    def __join(self, exprs: list[str], op: str, empty: str) -> str:
+        if not exprs:
+            return empty
+        if len(exprs) == 1:
+            return exprs[0]
+        return "(" + f" {op} ".join(exprs) + ")"
+
+    def __node(self, node, scope, defs) -> str:
+        node = node._unpack()
+        if isinstance(node, match.True_):
+            return "True"
+        if isinstance(node, match.False_):
+            return "False"
+        if isinstance(node, match.Inter):
+            exprs = [self.__node(n, scope, defs) for n in node.res]
+            return self.__join(exprs, "and", "True")
+        if isinstance(node, match.Union):
+            exprs = [self.__node(n, scope, defs) for n in node.res]
+            return self.__join(exprs, "or", "False")
+        if isinstance(node, match.Neg):
+            return f"(not {self.__node(node.res, scope, defs)})"
+        if isinstance(node, match.Tag):
+            return self.__tag(node, scope, defs)
+        if isinstance(node, match.Numcmp):
+            expr = self.__numcmp(node, scope)
+            if expr is not None:
+                return expr
+        return f"{self.__bind(node.search, scope, 'n')}(s)"
+
+    def __value(self, node, var: str, scope) -> str:
+        """Expression matching the text in var against a value node"""
+
+        if isinstance(node, match.Regex):
+            return f"{self.__bind(node.search, scope, 'm')}({var})"
+        if isinstance(node, match.True_):
+            return "True"
+        if isinstance(node, match.False_):
+            return "False"
+        if isinstance(node, match.Inter):
+            exprs = [self.__value(n, var, scope) for n in node.res]
+            return self.__join(exprs, "and", "True")
+        if isinstance(node, match.Union):
+            exprs = [self.__value(n, var, scope) for n in node.res]
+            return self.__join(exprs, "or", "False")
+        if isinstance(node, match.Neg):
+            return f"(not {self.__value(node.res, var, scope)})"
+        return f"{self.__bind(node.search, scope, 'n')}({var})"
+
+    def __tag(self, node: match.Tag, scope, defs) -> str:
+        res = node.res
+        if isinstance(res, match.Regex):
+            func = self.__bind(res.search, scope, "m")
+        else:
+            func = "v%d" % len(defs)
+            defs.extend(
+                [f"def {func}(v):", f"  return {self.__value(res, 'v', scope)}"]
+            )
+
+        exprs = []
+        for name in node.names:
+            if name[:1] == "~":
+                if name in FILESYSTEM_TAGS:
+                    exprs.append(f"{func}(fsn2text(s({name!r}, fs_default)))")
+                else:
+                    exprs.append(f"{func}(s({name!r}))")
+                continue
+            self.__uses_get = True
+            if name in ("filename", "mountpoint"):
+                fallback = f"fsn2text(g({'~' + name!r}, fs_default))"
+            else:
+                fallback = f"g({'~' + name!r}, '')"
+            exprs.append(
+                f"({func}(v) if (v := g({name!r})) is not None else {func}({fallback}))"
+            )
+        return self.__join(exprs, "or", "False")
+
+    def __numcmp(self, node: match.Numcmp, scope) -> str | None:
+        """Inlines comparing a plain numeric tag to a number"""
+
+        expr, expr2 = node._expr, node._expr2
+        op = _OPERATORS.get(node._op)
+        if (
+            op is None
+            or type(expr) is not match.NumexprTag
+            or type(expr2) is not match.NumexprNumber
+            or expr.use_date()
+            or expr._base_ftag in TIME_TAGS
+            or not math.isfinite(expr2._value)
+        ):
+            return None
+        return (
+            f"((v := s({expr._ftag!r}, None)) is not None "
+            f"and round(v, 2) {op} {expr2._value!r})"
+        )
+
+
+def compile_query(node: match.Node) -> Callable[[object], bool]:
+    """A function doing what node.search does, but faster"""
+
+    return QueryCompiler(node).compile()
@@ -0,0 +1,118 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""Matching plain text against folded tag values.
+
+Free text searches get turned into plain text patterns matched with
+`unisearch`, which compiles each of them to a large regular expression
+matching all the variants of each character. For ASCII text the same
+can be done by folding the tag values once (see `unisearch.fold`) and
+looking for the lower case text in them.
+"""
+
+from __future__ import annotations
+
+import operator
+
+from quodlibet.unisearch.fold import can_fold, fold
+from . import _match as match
+from ._index import _tag_value
+
+_UNCACHED_TAGS = {"~playlists"}
+"""Internal tags which can change without the song changing"""
+
+
+def _foldable(node: match.Node) -> bool:
+    if not isinstance(node, match.Regex):
+        return False
+    text = node.text
+    return text is not None and node.asym and node.ignore_case and can_fold(text)
+
+
+class FoldedTag(match.Node):
+    """A `Tag` with a plain text pattern, matched against folded values"""
+
+    def __init__(self, tag: match.Tag, folded: FoldedTags):
+        self._tag = tag
+        self._names = tag.names
+        self._text = tag.res.text.lower()
+        self._folded = folded
+
+    def search(self, data):
+        text = self._text
+        get = self._folded.get
+        for name in self._names:
+            value = get(data, name)
+            if value is None:
+                # can't be folded, use the pattern
+                if self._tag.res.search(_tag_value(data, name)):
+                    return True
+            elif text in value:
+                return True
+        return False
+
+    def __repr__(self):
+        # shares the match statistics
+        return repr(self._tag)
+
+
+class FoldedTags:
+    """Folded tag values of the songs of a library, for the tags searched
+    so far. Values of changed songs get folded again on next use."""
+
+    def __init__(self, library):
+        self._library = library
+        self._songs: dict = {}
+
+        self._sigs = [
+            library.connect("changed", self.__forget),
+            library.connect("removed", self.__forget),
+        ]
+
+    def destroy(self):
+        for sig in self._sigs:
+            self._library.disconnect(sig)
+        self._sigs = []
+        self._songs = {}
+
+    def __len__(self):
+        return len(self._songs)
+
+    def __forget(self, library, songs):
+        pop = self._songs.pop
+        for song in songs:
+            pop(song, None)
+
+    def get(self, song, name: str) -> str | None:
+        """The folded value of the tag, None if it can't be folded"""
+
+        values = self._songs.get(song)
+        if values is None:
+            values = self._songs[song] = {}
+        elif name in values:
+            return values[name]
+        folded = fold(_tag_value(song, name))
+        if name not in _UNCACHED_TAGS:
+            values[name] = folded
+        return folded
+
+    def bind(self, node: match.Node) -> match.Node:
+        """node, with all tags searched for plain text replaced by ones
+        searching in the folded values"""
+
+        node = node._unpack()
+        if isinstance(node, match.Tag):
+            if _foldable(node.res):
+                return FoldedTag(node, self)
+            return node
+        if isinstance(node, match.Inter | match.Union):
+            res = [self.bind(n) for n in node.res]
+            if all(map(operator.is_, res, node.res)):
+                return node
+            return type(node)(res)
+        if isinstance(node, match.Neg):
+            res = self.bind(node.res)
+            return node if res is node.res else match.Neg(res)
+        return node
@@ -0,0 +1,316 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""An inverted index of the words in song tags, for narrowing down the
+songs a query has to be matched against.
+
+Tag values get folded the way `unisearch` matches them: lower case and
+with all characters that an ASCII letter or digit in a pattern can match
+replaced by that ASCII text. The remaining runs of ASCII letters and
+digits are the indexed words. Any text a plain string pattern matches
+then contains the folded ASCII runs of the pattern as part of a word, so
+the songs with a word containing them are a superset of the matching
+songs. Those still get matched by the query itself.
+"""
+
+from __future__ import annotations
+
+import re
+import time
+import unicodedata
+from array import array
+from bisect import bisect_right
+from collections.abc import Iterable
+
+from quodlibet.formats import FILESYSTEM_TAGS
+from quodlibet.fsn import fsn2text, fsnative
+from quodlibet.unisearch.db import get_replacement_mapping
+from quodlibet.util import cached_func
+from quodlibet.util.dprint import print_d
+from . import _match as match
+
+MIN_RUN = 2
+"""Shorter runs of letters in a pattern match too many words to be useful"""
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+@cached_func
+def _fold_table() -> tuple[dict[int, str], frozenset[str]]:
+    """A str.translate() table for folding and the folded texts that
+    can't be searched for safely"""
+
+    table: dict[int, str] = {}
+    unsafe = set()
+    for key, variants in get_replacement_mapping().items():
+        if not (key.isascii() and key.isalnum()):
+            continue
+        key = key.lower()
+        for variant in variants:
+            for char in {variant, variant.lower(), variant.upper()}:
+                if len(char) != 1 or char.isascii():
+                    continue
+                other = table.setdefault(ord(char), key)
+                if other != key:
+                    unsafe.update((key, other))
+
+    # these match ASCII letters when ignoring case
+    table.update({ord("İ"): "i", ord("ı"): "i", ord("K"): "k", ord("ſ"): "s"})
+    return table, frozenset(unsafe)
+
+
+def fold(text: str) -> str:
+    """Folds text for the index, see the module docs"""
+
+    table, _unsafe = _fold_table()
+    return unicodedata.normalize("NFC", text).translate(table).lower()
+
+
+def words(text: str) -> set[str]:
+    return set(_WORD.findall(fold(text)))
+
+
+def _tag_value(song, name: str) -> str:
+    """The text `Tag.search` matches against for the name"""
+
+    if name[:1] == "~":
+        if name in FILESYSTEM_TAGS:
+            return fsn2text(song(name, fsnative()))
+        return song(name)
+    value = song.get(name)
+    if value is None:
+        if name in ("filename", "mountpoint"):
+            return fsn2text(song.get("~" + name, fsnative()))
+        return song.get("~" + name, "")
+    return value
+
+
+def _tag_names(node) -> set[str]:
+    if isinstance(node, match.Tag):
+        return set(node.names)
+    if isinstance(node, match.Inter | match.Union):
+        return set().union(*map(_tag_names, node.res))
+    return set()
+
+
+class TextIndex:
+    """Words in the given tags of all songs of a library.
+
+    Follows the library signals. Songs keep the number they got when
+    added, changes only add words and removed songs stay in the lists of
+    words until the index gets rebuilt, which happens once they make up a
+    large part of it.
+    """
+
+    def __init__(self, library, tags: Iterable[str] = ()):
+        self._library = library
+        self._tags: set[str] = set()
+        self._songs: list = []
+        self._ids: dict = {}
+        self._postings: dict[str, array] = {}
+        self._vocab: str | None = None
+        self._vocab_words: list[str] = []
+        self._vocab_starts: list[int] = []
+        self._stale = 0
+        """Changed or removed songs since the last rebuild"""
+        self._built = False
+        self.add_tags(tags)
+
+        self._sigs = [
+            library.connect("added", self.__added),
+            library.connect("changed", self.__changed),
+            library.connect("removed", self.__removed),
+        ]
+
+    def destroy(self):
+        for sig in self._sigs:
+            self._library.disconnect(sig)
+        self._sigs = []
+        self._clear()
+
+    @property
+    def tags(self) -> frozenset[str]:
+        return frozenset(self._tags)
+
+    def add_tags(self, tags: Iterable[str]) -> None:
+        """Also index the given tags, rebuilds the index if needed"""
+
+        new = set(tags) - self._tags
+        if new:
+            self._tags |= new
+            self._clear()
+
+    def _clear(self):
+        self._songs = []
+        self._ids = {}
+        self._postings = {}
+        self._vocab = None
+        self._stale = 0
+        self._built = False
+
+    def _build(self):
+        start = time.perf_counter()
+        self._clear()
+        self._built = True
+        self._add(self._library.values())
+        print_d(
+            f"Indexed {len(self._postings)} words of {len(self._ids)} songs "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
+
+    def _song_words(self, song) -> set[str]:
+        return words("\n".join(_tag_value(song, name) for name in self._tags))
+
+    def _add(self, songs):
+        for song in songs:
+            if song in self._ids:
+                continue
+            song_id = self._ids[song] = len(self._songs)
+            self._songs.append(song)
+            self._index(song, song_id)
+
+    def _index(self, song, song_id):
+        postings = self._postings
+        for word in self._song_words(song):
+            ids = postings.get(word)
+            if ids is None:
+                ids = postings[word] = array("I")
+                self._vocab = None
+            elif ids[-1] == song_id:
+                continue
+            ids.append(song_id)
+
+    def __added(self, library, songs):
+        if self._built:
+            self._add(songs)
+
+    def __changed(self, library, songs):
+        if not self._built:
+            return
+        for song in songs:
+            song_id = self._ids.get(song)
+            if song_id is None:
+                self._add([song])
+            else:
+                # old words stay, they only result in more candidates
+                self._stale += 1
+                self._index(song, song_id)
+
+    def __removed(self, library, songs):
+        if not self._built:
+            return
+        for song in songs:
+            song_id = self._ids.pop(song, None)
+            if song_id is not None:
+                self._songs[song_id] = None
+                self._stale += 1
+
+    def _update_vocab(self):
+        if self._vocab is not None:
+            return
+        words = sorted(self._postings)
+        starts = []
+        offset = 0
+        for word in words:
+            starts.append(offset)
+            offset += len(word) + 1
+        self._vocab = "\0".join(words)
+        self._vocab_words = words
+        self._vocab_starts = starts
+
+    def _containing(self, run: str) -> list[array]:
+        """The postings of all words containing run"""
+
+        vocab = self._vocab
+        words = self._vocab_words
+        starts = self._vocab_starts
+        postings = self._postings
+        result = []
+        last = -1
+        pos = vocab.find(run)
+        while pos != -1:
+            index = bisect_right(starts, pos) - 1
+            if index != last:
+                result.append(postings[words[index]])
+                last = index
+            # continue after the word
+            if index + 1 < len(starts):
+                pos = vocab.find(run, starts[index + 1])
+            else:
+                break
+        return result
+
+    def _literal_ids(self, literal: str) -> set[int] | None:
+        _table, unsafe = _fold_table()
+        runs = [r for r in _WORD.findall(fold(literal)) if len(r) >= MIN_RUN]
+        if not runs or any(u in r for r in runs for u in unsafe):
+            return None
+
+        limit = len(self._songs) // 2
+        result = None
+        for run in sorted(runs, key=len, reverse=True):
+            lists = self._containing(run)
+            if sum(map(len, lists)) > limit:
+                # not worth it
+                continue
+            ids = set().union(*lists)
+            result = ids if result is None else result & ids
+            if not result:
+                break
+        return result
+
+    def _value_ids(self, node) -> set[int] | None:
+        if isinstance(node, match.Regex):
+            literal = node.literal
+            return None if literal is None else self._literal_ids(literal)
+        if isinstance(node, match.Inter):
+            return self._intersection(self._value_ids(n) for n in node.res)
+        if isinstance(node, match.Union):
+            return self._union(self._value_ids(n) for n in node.res)
+        return None
+
+    def _node_ids(self, node) -> set[int] | None:
+        if isinstance(node, match.Tag):
+            if not self._tags.issuperset(node.names):
+                return None
+            return self._value_ids(node.res)
+        if isinstance(node, match.Inter):
+            return self._intersection(self._node_ids(n) for n in node.res)
+        if isinstance(node, match.Union):
+            return self._union(self._node_ids(n) for n in node.res)
+        if isinstance(node, match.False_):
+            return set()
+        return None
+
+    def _intersection(self, sets) -> set[int] | None:
+        result = None
+        for ids in sets:
+            if ids is not None:
+                result = ids if result is None else result & ids
+        return result
+
+    def _union(self, sets) -> set[int] | None:
+        result = set()
+        for ids in sets:
+            if ids is None:
+                return None
+            result |= ids
+        return result
+
+    def candidates(self, node: match.Node) -> list | None:
+        """The songs that can match node in library order, or None if the
+        index can't narrow them down"""
+
+        node = node._unpack()
+        self.add_tags(_tag_names(node))
+        if not self._built or self._stale > len(self._ids) // 2:
+            self._build()
+        self._update_vocab()
+
+        ids = self._node_ids(node)
+        if ids is None:
+            return None
+        songs = self._songs
+        return [songs[i] for i in sorted(ids) if songs[i] is not None]
@@ -13,6 +13,13 @@ from __future__ import annotations
 
 import operator
 import time
+
+try:
+    from re import _parser as sre_parse  # type: ignore
+    from re import _constants as sre_constants  # type: ignore
+except ImportError:
+    import sre_parse
+    import sre_constants
 from enum import auto, Enum
 from numbers import Real
 from typing import TypeVar
@@ -21,7 +28,7 @@ from collections.abc import Iterable
 from quodlibet.formats import FILESYSTEM_TAGS, TIME_TAGS
 from quodlibet.formats._audio import SIZE_TAGS, DURATION_TAGS
 from quodlibet.unisearch import compile
-from quodlibet.util import parse_date
+from quodlibet.util import cached_property, parse_date, re_escape
 from quodlibet.fsn import fsn2text, fsnative
 
 T = TypeVar("T")
@@ -35,6 +42,46 @@ class ParseError(Error):
     pass
 
 
+class HitRates:
+    """How often nodes matched the items they were tested against,
+    for this session. Nodes with the same repr share their counts."""
+
+    MAX_NODES = 2000
+
+    def __init__(self):
+        self._counts: dict[str, list[int]] = {}
+
+    def record(self, node: Node, tested: int, hits: int) -> None:
+        if not tested:
+            return
+        key = repr(node)
+        counts = self._counts.get(key)
+        if counts is None:
+            if len(self._counts) >= self.MAX_NODES:
+                self._counts.clear()
+            counts = self._counts[key] = [0, 0]
+        counts[0] += tested
+        counts[1] += hits
+
+    def get(self, node: Node) -> tuple[int, int]:
+        """(tested, hits) for the node"""
+
+        tested, hits = self._counts.get(repr(node), (0, 0))
+        return tested, hits
+
+    def rate(self, node: Node) -> float:
+        """The estimated share of items the node matches, 0.5 if unknown"""
+
+        tested, hits = self.get(node)
+        return (hits + 1) / (tested + 2)
+
+    def clear(self) -> None:
+        self._counts.clear()
+
+
+hit_rates = HitRates()
+
+
 class Node:
     def search(self, data: T) -> bool:
         raise NotImplementedError
@@ -64,17 +111,53 @@ class Regex(Node):
         self.pattern = str(pattern)
         self.mod_string = str(mod_string)
 
-        ignore_case = "c" not in self.mod_string or "i" in self.mod_string
-        dot_all = "s" in self.mod_string
-        asym = "d" in self.mod_string
+        self.ignore_case = "c" not in self.mod_string or "i" in self.mod_string
+        self.dot_all = "s" in self.mod_string
+        self.asym = "d" in self.mod_string
+        if self.text is None:
+            # plain text is always valid and only gets compiled on first
+            # use, which might never happen, see `FoldedTags`
+            self.search = self._compile()  # type: ignore
+
+    @cached_property
+    def search(self):
+        return self._compile()
+
+    def _compile(self):
         try:
-            re = compile(self.pattern, ignore_case, dot_all, asym)
-            self.search = re  # type: ignore
+            return compile(self.pattern, self.ignore_case, self.dot_all, self.asym)
         except ValueError as e:
             raise ParseError(
                 f"The regular expression /{self.pattern}/ is invalid."
             ) from e
 
+    @cached_property
+    def text(self) -> str | None:
+        """The text this matches anywhere if the pattern is plain text,
+        or None"""
+
+        literal = self.literal
+        if literal is None or re_escape(literal) != self.pattern:
+            return None
+        return literal
+
+    @cached_property
+    def literal(self) -> str | None:
+        """The text this matches if the pattern is a plain string
+        (ignoring anchors), or None"""
+
+        try:
+            parsed = sre_parse.parse(self.pattern)
+        except Exception:
+            return None
+        chars = []
+        for op, value in parsed:
+            if op == sre_constants.LITERAL:
+                chars.append(chr(value))
+            elif op != sre_constants.AT:
+                return None
+        return "".join(chars)
+
     def __repr__(self):
         return f"<Regex pattern={self.pattern} mod={self.mod_string}>"
 
@@ -129,6 +212,22 @@ class Union(Node):
                 return True
         return False
 
+    def filter(self, sequence):
+        sequence = list(sequence)
+        remaining = sequence
+        matched = set()
+        for re in self.res:
+            if not remaining:
+                break
+            hits = re.filter(remaining)
+            hit_rates.record(re, len(remaining), len(hits))
+            if hits:
+                matched.update(map(id, hits))
+                remaining = [s for s in remaining if id(s) not in matched]
+        if not matched:
+            return []
+        return [s for s in sequence if id(s) in matched]
+
     def __repr__(self):
         return f"<Union {self.res!r}>"
 
@@ -164,11 +263,13 @@ class Inter(Node):
         return True
 
     def filter(self, sequence):
-        current = sequence
+        current = list(sequence)
         for re in self.res:
-            current = filter(re.search, current)
-        if not isinstance(current, list):
-            current = list(current)
+            if not current:
+                break
+            tested = len(current)
+            current = re.filter(current)
+            hit_rates.record(re, tested, len(current))
         return current
 
     def __repr__(self):
@@ -441,7 +542,7 @@ class NumexprNumber(Numexpr):
         return self._units
 
     def __repr__(self):
-        return f"<NumexprNumber value={self._value:.2f}>"
+        return f"<NumexprNumber value={self._value!r}>"
 
 
 class NumexprNow(Numexpr):
@@ -590,6 +691,12 @@ class Tag(Node):
 
         return False
 
+    @property
+    def names(self) -> list[str]:
+        """All tag names searched in"""
+
+        return self._names + self.__intern + self.__fs
+
     def __repr__(self):
         names = self._names + self.__intern
         return f"<Tag names={names!r}, res={self.res!r}>"
@@ -0,0 +1,121 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""Reordering the parts of parsed queries so cheap and selective ones
+get evaluated first.
+
+Each node gets an estimated cost per item it is tested against. Combined
+with the share of items it matched so far (see `HitRates`) the parts of
+an intersection are sorted by cost / (1 - match rate), so the ones ruling
+out the most items for the least work come first, and the parts of a
+union by cost / match rate. Nodes don't have side effects, so the order
+doesn't change the result.
+"""
+
+from __future__ import annotations
+
+from . import _match as match
+from ._match import hit_rates
+
+TAG_COST = 1.0
+"""Reading a plain tag and matching a plain string against it"""
+
+INTERNAL_TAG_COST = 4.0
+"""Tags like ~people that need to be computed first"""
+
+REGEX_FACTOR = 2.0
+"""Matching a real regular expression instead of a plain string"""
+
+NUMCMP_COST = 0.5
+DATE_COST = 3.0
+"""Numeric comparisons parsing dates"""
+
+EXTENSION_COST = 25.0
+"""Query plugins, which can do anything"""
+
+
+def _value_cost(node: match.Node) -> float:
+    if isinstance(node, match.Regex):
+        return 1.0 if node.literal is not None else REGEX_FACTOR
+    if isinstance(node, match.Inter | match.Union):
+        return sum(map(_value_cost, node.res))
+    if isinstance(node, match.Neg):
+        return _value_cost(node.res)
+    return 1.0
+
+
+def cost(node: match.Node) -> float:
+    """Estimated cost of matching one item"""
+
+    node = node._unpack()
+    if isinstance(node, match.True_ | match.False_):
+        return 0.0
+    if isinstance(node, match.Numcmp):
+        return DATE_COST if node._expr.use_date() else NUMCMP_COST
+    if isinstance(node, match.Tag):
+        tags = sum(
+            INTERNAL_TAG_COST if name[:1] == "~" else TAG_COST for name in node.names
+        )
+        return tags * _value_cost(node.res)
+    if isinstance(node, match.Neg):
+        return cost(node.res)
+    if isinstance(node, match.Inter | match.Union):
+        return sum(map(cost, node.res))
+    if isinstance(node, match.Extension):
+        return EXTENSION_COST
+    return 1.0
+
+
+def _inter_rank(node: match.Node) -> float:
+    rejected = 1.0 - hit_rates.rate(node)
+    return cost(node) / rejected
+
+
+def _union_rank(node: match.Node) -> float:
+    return cost(node) / hit_rates.rate(node)
+
+
+def plan(node: match.Node) -> match.Node:
+    """Reorders the parts of all intersections and unions in node, in
+    place, and returns it"""
+
+    node = node._unpack()
+    if isinstance(node, match.Inter | match.Union):
+        for child in node.res:
+            plan(child)
+        rank = _inter_rank if isinstance(node, match.Inter) else _union_rank
+        # stable, so without stats the written order breaks ties
+        node.res.sort(key=rank)
+    elif isinstance(node, match.Neg | match.Tag):
+        plan(node.res)
+    return node
+
+
+def explain(node: match.Node) -> str:
+    """A description of the (planned) node tree with costs and match
+    rates, for debugging"""
+
+    lines: list[str] = []
+
+    def describe(node, depth):
+        node = node._unpack()
+        if isinstance(node, match.Inter | match.Union):
+            name = "AND" if isinstance(node, match.Inter) else "OR"
+            children = node.res
+        elif isinstance(node, match.Neg):
+            name = "NOT"
+            children = [node.res]
+        else:
+            name = repr(node)
+            children = []
+
+        tested, hits = hit_rates.get(node)
+        rate = f"{hits}/{tested} matched" if tested else "not run yet"
+        lines.append(f"{'  ' * depth}{name} (cost {cost(node):.1f}, {rate})")
+        for child in children:
+            describe(child, depth + 1)
+
+    describe(node, 0)
+    return "\n".join(lines)
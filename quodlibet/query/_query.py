@@ -10,18 +10,29 @@
 
 from __future__ import annotations
 
+from collections import OrderedDict
 from enum import Enum, auto
 from typing import TypeVar
-from collections.abc import Iterable
+from collections.abc import Iterable, Iterator
 
 from quodlibet import print_d, config
 from quodlibet.util import re_escape, cached_property
 from . import _match as match
 from ._match import Error, Node, False_
+from ._compiler import compile_query
 from ._parser import QueryParser
+from ._planner import plan, explain
 
 T = TypeVar("T")
 
+CHUNK_SIZE = 2000
+"""Number of items `Query.filter_chunks` checks per chunk"""
+
+MAX_PARSED = 100
+"""Number of queries `Query.cached` keeps"""
+
+_parsed: OrderedDict[tuple, Query] = OrderedDict()
+
 
 class QueryType(Enum):
     TEXT = auto()
@@ -77,7 +88,7 @@ class Query(Node):
 
         self.type = QueryType.VALID
         try:
-            self._match = QueryParser(string, star=star).StartQuery()
+            self._match = plan(QueryParser(string, star=star).StartQuery())
             if not self._match.valid:
                 self.type = QueryType.INVALID
             return
@@ -93,7 +104,7 @@ class Query(Node):
 
             try:
                 self.type = QueryType.TEXT
-                self._match = QueryParser(string, star=star).StartQuery()
+                self._match = plan(QueryParser(string, star=star).StartQuery())
                 return
             except self.Error:
                 pass
@@ -102,6 +113,23 @@ class Query(Node):
         self.type = QueryType.INVALID
         self._match = False_()
 
+    @classmethod
+    def cached(cls, string: str, star: Iterable[str] | None = None) -> Query:
+        """A query for the string, shared with other callers passing the
+        same string and star tags, so it must not be changed"""
+
+        if star is None:
+            star = cls.STAR
+        key = (cls, string, tuple(star), config.get("browsers", "ignored_characters"))
+        query = _parsed.get(key)
+        if query is None:
+            while len(_parsed) >= MAX_PARSED:
+                _parsed.popitem(last=False)
+            query = _parsed[key] = cls(string, star=star)
+        else:
+            _parsed.move_to_end(key)
+        return query
+
     @classmethod
     def StrictQueryMatcher(cls, string):
         """Returns a Matcher for a strict, valid (non-freetext) Query,
@@ -117,11 +145,104 @@ class Query(Node):
 
     @cached_property
     def search(self):
-        return self._match.search
+        # the query compiled to a function, in the order it was planned in
+        return compile_query(self._match)
 
-    @cached_property
-    def filter(self):
-        return self._match.filter
+    def filter(self, sequence: Iterable[T]) -> list[T]:
+        """The matching items of sequence.
+
+        If sequence is a library with a `QueryCache` the results get
+        shared with other users of the same query.
+        """
+
+        get_cache = getattr(sequence, "get_query_cache", None)
+        cache = get_cache() if get_cache is not None else None
+        if cache is not None:
+            result = cache.filter(self)
+            if result is not None:
+                return result
+        return self._filter(sequence)
+
+    def _filter(self, sequence: Iterable[T]) -> list[T]:
+        """The matching items of sequence, without the cache.
+
+        If sequence is a library with a search index (see `TextIndex`)
+        only the songs the index can't rule out get matched, numeric
+        comparisons get evaluated on its `NumericColumns` and plain text
+        gets searched for in its `FoldedTags` if available.
+        The parts of the query get reordered first, based on how they
+        matched so far.
+        """
+
+        node, sequence, columns = self._prepare(sequence)
+        if columns is not None:
+            result = columns.filter(node, sequence)
+            if result is not None:
+                return result
+        return node.filter(sequence)
+
+    def _prepare(self, sequence):
+        """The node to match, the items to match it against and the
+        `NumericColumns` to use, see `_filter`"""
+
+        plan(self._match)
+        get_index = getattr(sequence, "get_text_index", None)
+        get_columns = getattr(sequence, "get_numeric_columns", None)
+        get_folded = getattr(sequence, "get_folded_tags", None)
+        index = get_index() if get_index is not None else None
+        if index is not None:
+            candidates = index.candidates(self._match)
+            if candidates is not None:
+                sequence = candidates
+        folded = get_folded() if get_folded is not None else None
+        node = self._match if folded is None else folded.bind(self._match)
+        columns = get_columns() if get_columns is not None else None
+        return node, sequence, columns
+
+    def filter_chunks(
+        self, sequence: Iterable[T], size: int = CHUNK_SIZE
+    ) -> Iterator[list[T]]:
+        """The matching items of sequence like `filter` returns them, in
+        chunks with the matches of the next `size` items each, so they
+        can be searched for a bit at a time (see `copool`).
+
+        Changes to the items in between are only seen by the chunks still
+        to come. The results get shared like with `filter` nevertheless,
+        as the `QueryCache` catches up on the changes.
+        """
+
+        get_cache = getattr(sequence, "get_query_cache", None)
+        cache = get_cache() if get_cache is not None else None
+        if cache is not None:
+            result = cache.get(self)
+            if result is not None:
+                yield result
+                return
+        generation = getattr(sequence, "generation", None)
+
+        node, items, columns = self._prepare(sequence)
+        if columns is not None:
+            # all at once, the columns are fast but work on all items
+            result = columns.filter(node, items)
+            if result is not None:
+                if cache is not None:
+                    cache.put(self, result, generation)
+                yield result
+                return
+
+        items = list(items)
+        result = []
+        for start in range(0, len(items), size):
+            chunk = node.filter(items[start : start + size])
+            result.extend(chunk)
+            yield chunk
+        if cache is not None:
+            cache.put(self, result, generation)
+
+    def explain(self) -> str:
+        """How the query gets evaluated, for debugging"""
+
+        return f"{self!r}\n{explain(self._match)}"
 
     @property
     def valid(self) -> bool:
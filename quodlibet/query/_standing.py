@@ -0,0 +1,91 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+from gi.repository import GObject
+
+from quodlibet.util.dprint import print_d
+
+
+class StandingQuery(GObject.Object):
+    """The items of a library matching a query, kept up to date.
+
+    Instead of checking items again whenever the library changes, users
+    can connect to the differences:
+
+    * entered: items that started matching (added or changed)
+    * left: items that stopped matching (changed or removed)
+    * changed: changed items that matched before and still do
+
+    Each gets a set of items.
+    """
+
+    __gsignals__ = {
+        "entered": (GObject.SignalFlags.RUN_LAST, None, (object,)),
+        "left": (GObject.SignalFlags.RUN_LAST, None, (object,)),
+        "changed": (GObject.SignalFlags.RUN_LAST, None, (object,)),
+    }
+
+    def __init__(self, library, query, items=None):
+        """items are the ones currently matching, if already known"""
+
+        super().__init__()
+        self.query = query
+        self._library = library
+        self._search = query.search
+        self._items = set(query.filter(library) if items is None else items)
+        print_d(f"Standing query {query.string!r} matches {len(self._items)} items")
+
+        self._sigs = [
+            library.connect("added", self.__added),
+            library.connect("changed", self.__changed),
+            library.connect("removed", self.__removed),
+        ]
+
+    def destroy(self):
+        for sig in self._sigs:
+            self._library.disconnect(sig)
+        self._sigs = []
+        self._items = set()
+
+    def __contains__(self, item) -> bool:
+        return item in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __added(self, library, items):
+        entered = {i for i in items if i not in self._items and self._search(i)}
+        if entered:
+            self._items |= entered
+            self.emit("entered", entered)
+
+    def __changed(self, library, items):
+        search = self._search
+        entered = set()
+        left = set()
+        changed = set()
+        for item in items:
+            if search(item):
+                (changed if item in self._items else entered).add(item)
+            elif item in self._items:
+                left.add(item)
+
+        if left:
+            self._items -= left
+            self.emit("left", left)
+        if entered:
+            self._items |= entered
+            self.emit("entered", entered)
+        if changed:
+            self.emit("changed", changed)
+
+    def __removed(self, library, items):
+        left = self._items.intersection(items)
+        if left:
+            self._items -= left
+            self.emit("left", left)
@@ -0,0 +1,83 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""
+Folding text, so that searching for plain ASCII text with a compiled
+asymmetric pattern turns into a substring search:
+
+fold(u"Motörhead") => u"motorhead"
+
+compile(re_escape(text), asym=True)(value) is the same as
+text.lower() in fold(value) for any `can_fold` text, unless fold(value)
+is None. That's the case if value contains characters which can't be
+folded to a single ASCII one, like "æ", which is matched by "ae".
+"""
+
+import re
+import unicodedata
+
+from quodlibet.util import cached_func, re_escape
+
+from .db import get_replacement_mapping
+from .parser import compile
+
+_PATTERN_CHARS = "".join(map(chr, range(0x20, 0x7F)))
+"""Characters texts to search for can consist of"""
+
+_UNFOLDABLE = "\uffff"
+
+
+@cached_func
+def _get_pattern_searches():
+    return [(c, compile(re_escape(c), asym=True)) for c in _PATTERN_CHARS]
+
+
+@cached_func
+def _get_multi_search():
+    # characters matched by sequences of characters in a pattern
+    chars = set()
+    for key, values in get_replacement_mapping().items():
+        if len(key) > 1:
+            chars.update(values)
+    return re.compile(f"[{re_escape(''.join(sorted(chars)))}]", re.IGNORECASE).search
+
+
+def _fold_char(char: str) -> str:
+    if _get_multi_search()(char):
+        return _UNFOLDABLE
+    matched = {c for c, search in _get_pattern_searches() if search(char)}
+    if not matched:
+        # can't be part of a match
+        return char
+    lower = min(matched).lower()
+    if matched != {lower, lower.upper()}:
+        return _UNFOLDABLE
+    return lower
+
+
+class _FoldTable(dict):
+    def __missing__(self, key):
+        self[key] = value = _fold_char(chr(key))
+        return value
+
+
+_table = _FoldTable()
+
+
+def can_fold(text: str) -> bool:
+    """If `fold` can be used for searching for text"""
+
+    return all(c in _PATTERN_CHARS for c in text)
+
+
+def fold(text: str) -> str | None:
+    """The text with each character replaced by the lower case ASCII
+    one it gets matched by in asymmetric searches, or None if that isn't
+    possible for all of them"""
+
+    folded = unicodedata.normalize("NFC", text).translate(_table)
+    if _UNFOLDABLE in folded:
+        return None
+    return folded
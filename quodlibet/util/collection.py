@@ -83,6 +83,207 @@ NUM_DEFAULT_FUNCS = {
 
 NUM_FUNCS = {"max": max, "min": min, "sum": sum, "avg": avg, "bav": bayesian_average}
 
+INCREMENTAL_MIN_SONGS = 64
+"""Albums with at least this many songs update their values as songs get
+added, removed or changed, instead of computing them again from all songs"""
+
+_UNSET = object()
+
+
+class _Aggregate:
+    """A value computed from the songs of a collection.
+
+    If `track` is set the contribution of each song is kept, so songs can
+    be removed or updated after they changed without going over all songs.
+    """
+
+    def __init__(self, key, track=False):
+        self.key = key
+        self._songs = {} if track else None
+        self._value = _UNSET
+
+    def add(self, songs):
+        tracked = self._songs
+        for song in songs:
+            contribution = self._contribution(song)
+            if tracked is not None:
+                tracked[song] = contribution
+            self._apply(contribution, 1)
+        self._value = _UNSET
+
+    def remove(self, songs):
+        tracked = self._songs
+        for song in songs:
+            contribution = tracked.pop(song, _UNSET)
+            if contribution is not _UNSET:
+                self._apply(contribution, -1)
+        self._value = _UNSET
+
+    def changed(self, songs):
+        self.remove(songs)
+        self.add(songs)
+
+    @property
+    def value(self):
+        if self._value is _UNSET:
+            self._value = self._compute()
+        return self._value
+
+    def _contribution(self, song):
+        raise NotImplementedError
+
+    def _apply(self, contribution, sign):
+        raise NotImplementedError
+
+    def _compute(self):
+        raise NotImplementedError
+
+
+class _NumericAggregate(_Aggregate):
+    """One of `NUM_FUNCS` over a numeric tag"""
+
+    def __init__(self, key, track=False):
+        key, self._func = key
+        super().__init__(key, track)
+        self._counts = {}
+        self._total = 0
+        self._count = 0
+
+    def _contribution(self, song):
+        value = song(self.key)
+        return None if value == "" else value
+
+    def _apply(self, value, sign):
+        if value is None:
+            return
+        self._count += sign
+        if self._count:
+            self._total += sign * value
+        else:
+            # don't carry rounding errors over
+            self._total = 0
+        counts = self._counts
+        count = counts.get(value, 0) + sign
+        if count:
+            counts[value] = count
+        else:
+            del counts[value]
+
+    def _compute(self):
+        if not self._count:
+            return None
+        func = self._func
+        if func == "sum":
+            return self._total
+        if func == "avg":
+            return float(self._total) / self._count
+        if func == "bav":
+            m = config.RATINGS.default
+            c = config.getfloat("settings", "bayesian_rating_factor", 0.0)
+            return float(m * c + self._total) / (c + self._count)
+        return NUM_FUNCS[func](self._counts)
+
+
+class _ValuesAggregate(_Aggregate):
+    """All values of a tag, most common ones first"""
+
+    def __init__(self, key, track=False):
+        super().__init__(key, track)
+        self._counts = {}
+
+    def _contribution(self, song):
+        return song.list(self.key)
+
+    def _apply(self, values, sign):
+        counts = self._counts
+        for value in values:
+            count = counts.get(value, 0) + sign
+            if count:
+                counts[value] = count
+            else:
+                del counts[value]
+
+    def _compute(self):
+        values = sorted(self._counts.items(), key=lambda x: (-x[1], x[0]))
+        return "\n".join(x[0] for x in values) if values else None
+
+
+class _DiscsAggregate(_ValuesAggregate):
+    """The number of distinct disc numbers"""
+
+    def _contribution(self, song):
+        return (song("~#disc", 1),)
+
+    def _compute(self):
+        return len(self._counts)
+
+
+class _BitrateAggregate(_Aggregate):
+    """The average bitrate, weighted by song length"""
+
+    def __init__(self, key, track=False):
+        super().__init__(key, track)
+        self._weighted = 0
+        self._length = 0
+
+    def _contribution(self, song):
+        length = song("~#length", 0)
+        return song("~#bitrate", 0) * length, length or 0
+
+    def _apply(self, contribution, sign):
+        weighted, length = contribution
+        self._weighted += sign * weighted
+        self._length += sign * length
+
+    def _compute(self):
+        if not self._length:
+            return 0
+        return self._weighted / self._length
+
+
+class _PeopleAggregate(_Aggregate):
+    """People and peoplesort, ranked by "relevance": artists before
+    composers before performers, then by number of appearances"""
+
+    def __init__(self, key, track=False):
+        super().__init__(key, track)
+        self._people = {}
+        self._peoplesort = {}
+
+    def _contribution(self, song):
+        people = {}
+        peoplesort = {}
+        for w, k in enumerate(ELPOEP):
+            persons = song.list(k)
+            for person in persons:
+                people[person] = people.get(person, 0) - PEOPLE_SCORE[w]
+            if k in TAG_TO_SORT:
+                persons = song.list(TAG_TO_SORT[k]) or persons
+            for person in persons:
+                peoplesort[person] = peoplesort.get(person, 0) - PEOPLE_SCORE[w]
+        return people, peoplesort
+
+    def _apply(self, contribution, sign):
+        for scores, totals in zip(
+            contribution, (self._people, self._peoplesort), strict=True
+        ):
+            for person, score in scores.items():
+                total = totals.get(person, 0) + sign * score
+                if total:
+                    totals[person] = total
+                else:
+                    del totals[person]
+
+    def _compute(self):
+        """A dict with "people" and "peoplesort" values, or None for each"""
+
+        result = {}
+        for key, totals in [("people", self._people), ("peoplesort", self._peoplesort)]:
+            # ties by name, the song order isn't fixed
+            ranked = sorted(totals, key=lambda p: (totals[p], p))[:100]
+            result[key] = "\n".join(ranked) if ranked else None
+        return result
+
 
 class Collection:
     """A collection of songs which implements some methods similar to the
@@ -101,6 +302,7 @@ class Collection:
         self.__cache = {}
         self.__default = set()
         self.__used = []
+        self.__aggregates = {}
 
     def finalize(self):
         """Finalize the collection.
@@ -108,6 +310,38 @@ class Collection:
         self.__cache.clear()
         self.__default.clear()
         self.__used = []
+        self.__aggregates.clear()
+
+    def _keep_aggregates(self):
+        """If values computed from all songs should be kept, so they can be
+        updated through `_songs_updated` instead of computed again"""
+        return False
+
+    def _songs_updated(self, added=(), removed=(), changed=()):
+        """Call this after songs got added, removed or changed (instead of
+        `finalize`)"""
+
+        aggregates = self.__aggregates
+        if not aggregates or not self._keep_aggregates():
+            self.finalize()
+            return
+        for aggregate in aggregates.values():
+            aggregate.remove(removed)
+            aggregate.changed(changed)
+            aggregate.add(added)
+        self.__cache.clear()
+        self.__default.clear()
+        self.__used = []
+
+    def __aggregate(self, cls, key):
+        aggregate = self.__aggregates.get((cls, key))
+        if aggregate is None:
+            keep = self._keep_aggregates()
+            aggregate = cls(key, track=keep)
+            aggregate.add(self.songs)
+            if keep:
+                self.__aggregates[(cls, key)] = aggregate
+        return aggregate.value
 
     def get(self, key, default="", connector=" - "):
         if not self.songs:
@@ -181,16 +415,9 @@ class Collection:
             elif key == "tracks":
                 return len(self.songs)
             elif key == "discs":
-                return len({song("~#disc", 1) for song in self.songs})
+                return self.__aggregate(_DiscsAggregate, key)
             elif key == "bitrate":
-                length = self.__get_value("~#length")
-                if not length:
-                    return 0
-
-                def w(s):
-                    return s("~#bitrate", 0) * s("~#length", 0)
-
-                return sum(w(song) for song in self.songs) / length
+                return self.__aggregate(_BitrateAggregate, key)
             else:
                 # Standard or unknown numeric key.
                 # AudioFile will try to cast the values to int,
@@ -198,54 +425,30 @@ class Collection:
                 func = NUM_DEFAULT_FUNCS.get(key, "avg")
 
             key = "~#" + key
-            func = NUM_FUNCS.get(func)
-            if func:
+            if func in NUM_FUNCS:
                 # If none of the songs can return a numeric key,
                 # the album returns default
-                values = (song(key) for song in self.songs)
-                values = [v for v in values if v != ""]
-                return func(values) if values else None
+                return self.__aggregate(_NumericAggregate, (key, func))
             if key in NUMERIC_ZERO_DEFAULT:
                 return 0
             return None
         if key[:1] == "~":
             key = key[1:]
             numkey = key.split(":")[0]
-            keys = {"people": {}, "peoplesort": {}}
-            if key in keys:
-                people = keys["people"]
-                peoplesort = keys["peoplesort"]
-                for song in self.songs:
-                    # Rank people by "relevance" -- artists before composers
-                    # before performers, then by number of appearances.
-                    for w, k in enumerate(ELPOEP):
-                        persons = song.list(k)
-                        for person in persons:
-                            people[person] = people.get(person, 0) - PEOPLE_SCORE[w]
-                        if k in TAG_TO_SORT:
-                            persons = song.list(TAG_TO_SORT[k]) or persons
-                        for person in persons:
-                            peoplesort[person] = (
-                                peoplesort.get(person, 0) - PEOPLE_SCORE[w]
-                            )
+            if key in ("people", "peoplesort"):
                 # It's cheaper to get people and peoplesort in one go
-                keys["people"] = sorted(people.keys(), key=people.__getitem__)[:100]
-                keys["peoplesort"] = sorted(
-                    peoplesort.keys(), key=peoplesort.__getitem__
-                )[:100]
-
+                keys = dict(self.__aggregate(_PeopleAggregate, None))
                 ret = keys.pop(key)
-                ret = (ret and "\n".join(ret)) or None
 
-                other, values = keys.popitem()
+                other, value = keys.popitem()
                 other = "~" + other
-                if not values:
+                if value is None:
                     self.__default.add(other)
                 else:
                     if other in self.__used:
                         self.__used.remove(other)
                     self.__used.append(other)
-                    self.__cache[other] = "\n".join(values)
+                    self.__cache[other] = value
                 return ret
             if numkey == "length":
                 length = self.__get_value("~#" + key)
@@ -278,13 +481,7 @@ class Collection:
 
         # Nothing special was found, so just take all values of the songs
         # and sort them by their number of appearance
-        result = {}
-        for song in self.songs:
-            for value in song.list(key):
-                result[value] = result.get(value, 0) - 1
-
-        values = [x[0] for x in sorted(result.items(), key=lambda x: (x[1], x[0]))]
-        return "\n".join(values) if values else None
+        return self.__aggregate(_ValuesAggregate, key)
 
 
 class Album(Collection, HasKey):
@@ -324,6 +521,30 @@ class Album(Collection, HasKey):
         self.__dict__.pop("peoplesort", None)
         self.__dict__.pop("genre", None)
 
+    def _keep_aggregates(self):
+        return len(self.songs) >= INCREMENTAL_MIN_SONGS
+
+    def _songs_updated(self, added=(), removed=(), changed=()):
+        super()._songs_updated(added, removed, changed)
+        self.__dict__.pop("peoplesort", None)
+        self.__dict__.pop("genre", None)
+
+    def add(self, songs):
+        """Add songs and update the album values"""
+        songs = [s for s in songs if s not in self.songs]
+        self.songs.update(songs)
+        self._songs_updated(added=songs)
+
+    def remove(self, songs):
+        """Remove songs and update the album values"""
+        songs = [s for s in songs if s in self.songs]
+        self.songs.difference_update(songs)
+        self._songs_updated(removed=songs)
+
+    def changed(self, songs):
+        """Update the album values after songs of it changed"""
+        self._songs_updated(changed=songs)
+
     def __repr__(self):
         return f"Album({self.key!r})"
 
@@ -0,0 +1,335 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""Loading scaled album covers for browsers showing lots of them.
+
+Covers get loaded by a few worker threads, the requests with the lowest
+priority value first. Browsers use the distance from the visible area for
+that, and update it or drop requests as the view scrolls. Loaded covers are
+kept in memory, up to a total size, and on disk through `CoverManager`.
+
+The workers only read stored covers and decode images. Looking up which
+image to use needs the songs, the config and the cover sources, so it
+happens in the main thread, for covers not stored yet.
+"""
+
+import heapq
+import itertools
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+from multiprocessing import cpu_count
+
+from gi.repository import GLib
+
+from quodlibet import util
+
+MAX_WORKERS = 4
+"""Maximum number of threads loading covers"""
+
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+"""Total size of the pixel data of the covers kept in memory"""
+
+_NO_COVER_BYTES = 64
+"""Size accounted for a cached missing cover"""
+
+
+def _get_max_workers():
+    try:
+        cpus = cpu_count()
+    except NotImplementedError:
+        cpus = 2
+    return max(1, min(MAX_WORKERS, cpus))
+
+
+class CoverRequest:
+    """A cover requested through `CoverLoader.request()`"""
+
+    def __init__(self, job, callback, priority, cancellable, tag):
+        self._job = job
+        self._callback = callback
+        self.priority = priority
+        self.cancellable = cancellable
+        self.tag = tag
+        """Anything the requester wants to find the request by"""
+
+    @property
+    def cancelled(self):
+        return self.cancellable is not None and self.cancellable.is_cancelled()
+
+    def __repr__(self):
+        return f"<{type(self).__name__} key={self._job.key!r} priority={self.priority}>"
+
+
+class _Job:
+    def __init__(self, key, songs, size, stamp):
+        self.key = key
+        self.songs = songs
+        self.size = size
+        self.stamp = stamp
+        self.fileobj = None
+        """The image to decode, once looked up"""
+        self.looked_up = False
+        self.requests: list[CoverRequest] = []
+        self.priority = 0
+        self.queued = None
+        """Priority of the newest heap entry"""
+        self.running = False
+        self.stale = False
+        """The cover changed since the job got started"""
+
+    def update_priority(self):
+        self.priority = min(r.priority for r in self.requests)
+
+
+class CoverLoader:
+    """Loads covers of albums scaled to a size in worker threads.
+
+    Requests for the same album and size share a single load. All methods
+    need to be called from the main thread, callbacks get called there.
+    """
+
+    def __init__(self, manager, max_workers=None, max_bytes=MAX_CACHE_BYTES):
+        self._manager = manager
+        self._max_workers = max_workers or _get_max_workers()
+        self._max_bytes = max_bytes
+
+        self._cond = threading.Condition()
+        self._heap: list[tuple[float, int, _Job]] = []
+        self._jobs: dict[tuple, _Job] = {}
+        self._counter = itertools.count()
+        self._workers: list[threading.Thread] = []
+        self._quit = False
+
+        self._cache: OrderedDict[tuple, object] = OrderedDict()
+        self._cache_bytes = 0
+
+        manager.connect("cover-changed", self.__cover_changed)
+
+    def __cover_changed(self, manager, songs):
+        self.invalidate({song.album_key for song in songs})
+
+    def get(self, key, size):
+        """The loaded pixbuf for the album key and size, None if there is
+        no cover and KeyError if it isn't loaded"""
+
+        pixbuf = self._cache[(key, size)]
+        self._cache.move_to_end((key, size))
+        return pixbuf
+
+    def request(
+        self,
+        key,
+        songs,
+        size: int,
+        callback: Callable,
+        priority: float = 0,
+        cancellable=None,
+        tag=None,
+    ) -> CoverRequest | None:
+        """Load the cover of the album with the key, consisting of songs,
+        to fit into size x size pixels.
+
+        callback gets called with the pixbuf, or None if there is no cover.
+        Unless the request gets cancelled through the cancellable, which
+        also groups requests for `reprioritize()`. Lower priorities get
+        loaded first.
+
+        Returns the request, or None if the cover was loaded already and
+        callback got called.
+        """
+
+        try:
+            pixbuf = self.get(key, size)
+        except KeyError:
+            pass
+        else:
+            callback(pixbuf)
+            return None
+
+        with self._cond:
+            job = self._jobs.get((key, size))
+            if job is None:
+                songs = list(songs)
+                stamp = self._manager.get_album_stamp(songs)
+                job = self._jobs[(key, size)] = _Job(key, songs, size, stamp)
+            request = CoverRequest(job, callback, priority, cancellable, tag)
+            job.requests.append(request)
+            self._schedule(job)
+        self._start_workers()
+        return request
+
+    def reprioritize(self, cancellable, func: Callable[[CoverRequest], float | None]):
+        """Updates the priorities of the pending requests with the
+        cancellable to what func returns for them, or cancels them if it
+        returns None"""
+
+        with self._cond:
+            for job in list(self._jobs.values()):
+                if job.running:
+                    continue
+                requests = []
+                for request in job.requests:
+                    if request.cancellable is cancellable:
+                        priority = func(request)
+                        if priority is None:
+                            continue
+                        request.priority = priority
+                    requests.append(request)
+                job.requests = requests
+                if requests:
+                    self._schedule(job)
+                else:
+                    self._drop(job)
+
+    def invalidate(self, keys):
+        """Forgets the covers of the albums with the keys"""
+
+        keys = set(keys)
+        for entry in list(self._cache):
+            if entry[0] in keys:
+                self._uncache(entry)
+        with self._cond:
+            for job in list(self._jobs.values()):
+                if job.running and job.key in keys:
+                    # let new requests start over
+                    job.stale = True
+                    self._drop(job)
+
+    def clear(self):
+        """Forgets all loaded covers"""
+
+        self._cache.clear()
+        self._cache_bytes = 0
+
+    def destroy(self):
+        """Stops the workers once they finished their current job"""
+
+        with self._cond:
+            self._quit = True
+            self._heap = []
+            self._jobs.clear()
+            self._cond.notify_all()
+        self._workers = []
+        self.clear()
+
+    def _schedule(self, job):
+        job.update_priority()
+        if job.priority != job.queued:
+            job.queued = job.priority
+            heapq.heappush(self._heap, (job.priority, next(self._counter), job))
+            self._cond.notify()
+
+    def _drop(self, job):
+        entry = (job.key, job.size)
+        if self._jobs.get(entry) is job:
+            del self._jobs[entry]
+
+    def _start_workers(self):
+        self._workers = [w for w in self._workers if w.is_alive()]
+        while len(self._workers) < self._max_workers:
+            worker = threading.Thread(target=self._work, daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def _next_job(self):
+        """The next job to run, or None if the loader got destroyed"""
+
+        with self._cond:
+            while True:
+                if self._quit:
+                    return None
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                priority, _count, job = heapq.heappop(self._heap)
+                if job.running or priority != job.queued:
+                    # outdated entry of a rescheduled job
+                    continue
+                job.requests = [r for r in job.requests if not r.cancelled]
+                if not job.requests:
+                    self._drop(job)
+                    continue
+                job.running = True
+                return job
+
+    def _load(self, job):
+        """The pixbuf of the job, or False if the image needs to be looked
+        up first"""
+
+        manager = self._manager
+        try:
+            if job.looked_up:
+                return manager.load_album_pixbuf(
+                    job.key, job.size, job.stamp, job.fileobj
+                )
+            pixbuf = manager.get_stored_album_pixbuf(job.key, job.size, job.stamp)
+            return False if pixbuf is None else pixbuf
+        except Exception:
+            util.print_exc()
+            return None
+
+    def _work(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            pixbuf = self._load(job)
+            if pixbuf is False:
+                GLib.idle_add(self._look_up, job, priority=GLib.PRIORITY_DEFAULT)
+            else:
+                GLib.idle_add(self._finish, job, pixbuf, priority=GLib.PRIORITY_DEFAULT)
+
+    def _look_up(self, job):
+        if self._quit:
+            return False
+        try:
+            fileobj = self._manager.get_cover_many(job.songs)
+        except Exception:
+            util.print_exc()
+            fileobj = None
+        if fileobj is None:
+            return self._finish(job, None)
+        with self._cond:
+            job.fileobj = fileobj
+            job.looked_up = True
+            job.running = False
+            job.queued = None
+            self._schedule(job)
+        return False
+
+    def _finish(self, job, pixbuf):
+        with self._cond:
+            self._drop(job)
+            requests = job.requests
+            job.requests = []
+        if not (job.stale or self._quit):
+            self._cache_put((job.key, job.size), pixbuf)
+        for request in requests:
+            if not request.cancelled:
+                request._callback(pixbuf)
+        return False
+
+    def _cache_put(self, entry, pixbuf):
+        if entry in self._cache:
+            self._uncache(entry)
+        self._cache[entry] = pixbuf
+        self._cache_bytes += self._get_size(pixbuf)
+        while self._cache_bytes > self._max_bytes and len(self._cache) > 1:
+            self._uncache(next(iter(self._cache)))
+
+    def _uncache(self, entry):
+        self._cache_bytes -= self._get_size(self._cache.pop(entry))
+
+    def _get_size(self, pixbuf):
+        if pixbuf is None:
+            return _NO_COVER_BYTES
+        return pixbuf.get_byte_length()
+
+    def __repr__(self):
+        return (
+            f"<{type(self).__name__} pending={len(self._jobs)} "
+            f"cached={len(self._cache)} bytes={self._cache_bytes}>"
+        )
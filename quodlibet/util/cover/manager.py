@@ -6,20 +6,27 @@
 # the Free Software Foundation; either version 2 of the License, or
 # (at your option) any later version.
 
+import os
 from itertools import chain
 from typing import IO
 from collections.abc import Iterable
 
 from gi.repository import GObject, GdkPixbuf, Soup
 
+import quodlibet
 from quodlibet import _
 from quodlibet.formats import AudioFile
 from quodlibet.plugins import PluginManager, PluginHandler
 from quodlibet.qltk.notif import Task
 from quodlibet.util.cover import built_in
+from quodlibet.util.cover.loader import CoverLoader
 from quodlibet.util import print_d
 from quodlibet.util.thread import call_async
-from quodlibet.util.thumbnails import get_thumbnail_from_file
+from quodlibet.util.thumbnails import (
+    AlbumStamp,
+    AlbumThumbnailCache,
+    get_thumbnail_from_file,
+)
 from quodlibet.plugins.cover import CoverSourcePlugin
 
 
@@ -67,6 +74,18 @@ class CoverManager(GObject.Object):
     def __init__(self, use_built_in=True):
         super().__init__()
         self.plugin_handler = CoverPluginHandler(use_built_in)
+        self.loader = CoverLoader(self)
+        """Shared loader of scaled covers for browsers"""
+        self._thumbnails = None
+
+    @property
+    def thumbnails(self) -> AlbumThumbnailCache:
+        """Scaled album covers kept on disk between sessions"""
+
+        if self._thumbnails is None:
+            path = os.path.join(quodlibet.get_cache_dir(), "album-thumbnails")
+            self._thumbnails = AlbumThumbnailCache(path)
+        return self._thumbnails
 
     def init_plugins(self):
         """Register the cover sources plugin handler with the global
@@ -88,6 +107,7 @@ class CoverManager(GObject.Object):
         to re-fetch the cover and do a display update.
         """
 
+        self.thumbnails.invalidate({song.album_key for song in songs})
         self.emit("cover-changed", songs)
 
     def acquire_cover(self, callback, cancellable, song):
@@ -205,6 +225,38 @@ class CoverManager(GObject.Object):
 
         return get_thumbnail_from_file(fileobj, (width, height))
 
+    def get_album_stamp(self, songs: list[AudioFile]) -> AlbumStamp:
+        """What stored thumbnails of the album with the songs have to match,
+        see get_stored_album_pixbuf()"""
+
+        sources = [source.__name__ for source in self.sources]
+        return self.thumbnails.get_stamp(songs, sources)
+
+    def get_stored_album_pixbuf(
+        self, key, size: int, stamp: AlbumStamp
+    ) -> GdkPixbuf.Pixbuf | None:
+        """The cover of the album with the key and stamp scaled to a size x
+        size boundary, if stored by load_album_pixbuf() before.
+
+        Thread-safe.
+        """
+
+        return self.thumbnails.get(key, size, stamp)
+
+    def load_album_pixbuf(
+        self, key, size: int, stamp: AlbumStamp, fileobj
+    ) -> GdkPixbuf.Pixbuf | None:
+        """The image in fileobj, the cover of the album with the key, scaled
+        to a size x size boundary and stored for get_stored_album_pixbuf().
+
+        Thread-safe.
+        """
+
+        pixbuf = get_thumbnail_from_file(fileobj, (size, size))
+        if pixbuf is not None:
+            self.thumbnails.put(key, size, stamp, fileobj, pixbuf)
+        return pixbuf
+
     def get_pixbuf(self, song: AudioFile, width: int, height: int) -> GdkPixbuf:
         """see get_pixbuf_many()"""
 
@@ -114,6 +114,7 @@ def _call_async(priority, function, cancellable, callback, args, kwargs):
     wrapped_callback = _wrap_callback(priority, cancellable, callback)
     future = pool.submit(wrapped_func)
     future.add_done_callback(wrapped_callback)
+    return future
 
 
 def terminate_all():
@@ -137,12 +138,16 @@ def call_async(function, cancellable, callback, args=None, kwargs=None):
     in the main thread. It will not be called if the `cancellable` gets
     cancelled and is not guaranteed to be called at all (on event loop
     shutdown for example)
+
+    Returns the `concurrent.futures.Future` of the function call.
     """
 
-    _call_async(Priority.HIGH, function, cancellable, callback, args, kwargs)
+    return _call_async(Priority.HIGH, function, cancellable, callback, args, kwargs)
 
 
 def call_async_background(function, cancellable, callback, args=None, kwargs=None):
     """Same as call_async but for background tasks (network etc.)"""
 
-    _call_async(Priority.BACKGROUND, function, cancellable, callback, args, kwargs)
+    return _call_async(
+        Priority.BACKGROUND, function, cancellable, callback, args, kwargs
+    )
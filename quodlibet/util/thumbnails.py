@@ -7,7 +7,9 @@
 # (at your option) any later version.
 
 import os
+import json
 import hashlib
+import threading
 from pathlib import Path
 from tempfile import gettempdir
 
@@ -17,6 +19,7 @@ from quodlibet import print_w, print_d
 from quodlibet.fsn import fsn2uri, fsnative
 
 import quodlibet
+from quodlibet import config
 from quodlibet.util.path import mtime, mkdir, xdg_get_cache_home
 from quodlibet.util import enum
 from quodlibet.qltk.image import scale
@@ -185,3 +188,241 @@ def get_thumbnail(path: fsnative, boundary, ignore_temp=True) -> GdkPixbuf:
         pass
 
     return scale(thumb_pb, boundary)
+
+
+ALBUM_THUMBNAILS_SIZE = 200 * 1024 * 1024
+"""Total size of the album thumbnails kept on disk"""
+
+
+class AlbumStamp:
+    """What a stored album thumbnail depends on besides the image, see
+    `AlbumThumbnailCache.get_stamp()`"""
+
+    def __init__(self, songs: str, choice: str, dirs: list[str]):
+        self.songs = songs
+        """Hash of the song file names and mtimes"""
+        self.choice = choice
+        """Hash of the cover sources and settings"""
+        self.dirs = dirs
+        """The album directories"""
+        self._dir_mtimes: list[list[int]] | None = None
+
+    @staticmethod
+    def _get_dir_mtimes(path) -> list[int]:
+        """The mtimes of the directory and the directories in it, as adding
+        or removing images changes those"""
+
+        try:
+            with os.scandir(path) as entries:
+                paths = [e.path for e in entries if e.is_dir()]
+            return [os.stat(p).st_mtime_ns for p in [path] + sorted(paths)]
+        except OSError:
+            return []
+
+    def get_dir_mtimes(self) -> list[list[int]]:
+        """The mtimes of the album directories, as of the first call"""
+
+        if self._dir_mtimes is None:
+            self._dir_mtimes = [self._get_dir_mtimes(d) for d in self.dirs]
+        return self._dir_mtimes
+
+
+class AlbumThumbnailCache:
+    """Scaled album covers kept on disk, so the next session doesn't have to
+    look up and decode the full size images again.
+
+    Entries are stored per album key and size, together with what they were
+    made from: the path and mtime of the image unless it was embedded, the
+    file names and mtimes of the album songs, and what decided which image
+    got picked: the active cover sources, the album art settings and the
+    mtimes of the album directories and the directories in them. If any of
+    it changed they get made again. Once the files exceed `max_bytes`, the
+    oldest ones get removed.
+
+    The song mtimes are the ones in the library, so changes to embedded
+    images only show up once the library noticed them, e.g. after a
+    refresh.
+
+    Thread-safe, except for get_stamp().
+    """
+
+    VERSION = 3
+
+    ALBUMART_SETTINGS = [
+        "prefer_embedded",
+        "force_filename",
+        "filename",
+        "search_filenames",
+    ]
+    """Options of the albumart config section affecting the cover choice"""
+
+    def __init__(self, path, max_bytes: int = ALBUM_THUMBNAILS_SIZE):
+        self.path = Path(path)
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total: int | None = None
+        """Size of all files, if known"""
+
+    def _get_path(self, key, size: int) -> Path:
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return self.path / str(size) / digest
+
+    def get_stamp(self, songs, sources) -> AlbumStamp:
+        """The stamp to check and store thumbnails of the album with the
+        songs with. `sources` names the active cover sources, in the order
+        they get tried.
+
+        Needs to be called from the main thread.
+        """
+
+        files = sorted((s("~filename"), s("~#mtime")) for s in songs)
+        settings = [config.get("albumart", name) for name in self.ALBUMART_SETTINGS]
+        dirs = sorted({os.path.dirname(s("~filename")) for s in songs if s.is_file})
+        return AlbumStamp(
+            hashlib.sha1(repr(files).encode("utf-8")).hexdigest(),
+            hashlib.sha1(repr([list(sources), settings]).encode("utf-8")).hexdigest(),
+            dirs,
+        )
+
+    def get(self, key, size: int, stamp: AlbumStamp) -> GdkPixbuf.Pixbuf | None:
+        """The thumbnail of the album with the key, or None if there is
+        none, or it doesn't match the stamp"""
+
+        try:
+            with open(self._get_path(key, size), "rb") as h:
+                data = h.read()
+        except OSError:
+            return None
+
+        try:
+            header, image = data.split(b"\n", 1)
+            header = json.loads(header)
+        except ValueError:
+            return None
+        if header.get("version") != self.VERSION:
+            return None
+        if header.get("songs") != stamp.songs:
+            return None
+        if header.get("choice") != stamp.choice:
+            return None
+        if header.get("dirs") != stamp.get_dir_mtimes():
+            return None
+        source = header.get("path")
+        if source is not None and mtime(source) != header.get("mtime"):
+            return None
+
+        try:
+            loader = GdkPixbuf.PixbufLoader()
+            loader.write(image)
+            loader.close()
+        except GLib.GError as e:
+            print_d(f"Couldn't load album thumbnail ({e})")
+            return None
+        return loader.get_pixbuf()
+
+    def put(self, key, size: int, stamp: AlbumStamp, fileobj, pixbuf: GdkPixbuf.Pixbuf):
+        """Stores the thumbnail of the album with the key, made from the
+        image in fileobj"""
+
+        header = {
+            "version": self.VERSION,
+            "songs": stamp.songs,
+            "choice": stamp.choice,
+            "dirs": stamp.get_dir_mtimes(),
+        }
+        path = fileobj.name
+        # embedded images come from /tmp/, the song mtimes stand in for them
+        if not path.startswith(gettempdir()):
+            path_mtime = mtime(path)
+            if path_mtime == 0:
+                return
+            header["path"] = path
+            header["mtime"] = path_mtime
+
+        # keep transparency, everything else as small as possible
+        if pixbuf.get_has_alpha():
+            image_type, options = "png", {}
+        else:
+            image_type, options = "jpeg", {"quality": "90"}
+        try:
+            image = pixbuf.save_to_bufferv(
+                image_type, list(options.keys()), list(options.values())
+            )[1]
+        except GLib.GError as e:
+            print_w(f"Couldn't save album thumbnail ({e})")
+            return
+        data = json.dumps(header).encode("utf-8") + b"\n" + image
+
+        target = self._get_path(key, size)
+        temp = target.with_name(f"{target.name}.{threading.get_ident()}.tmp")
+        try:
+            mkdir(target.parent, 0o700)
+            old_size = target.stat().st_size if target.exists() else 0
+            with open(temp, "wb") as h:
+                h.write(data)
+            os.replace(temp, target)
+        except OSError as e:
+            print_w(f"Couldn't save album thumbnail to {str(target)!r} ({e})")
+            return
+
+        with self._lock:
+            if self._total is None:
+                self._prune()
+            else:
+                self._total += len(data) - old_size
+                if self._total > self._max_bytes:
+                    self._prune()
+
+    def invalidate(self, keys):
+        """Removes the thumbnails of the albums with the keys, in all sizes"""
+
+        try:
+            size_dirs = [p for p in self.path.iterdir() if p.is_dir()]
+        except OSError:
+            return
+
+        with self._lock:
+            for key in keys:
+                name = self._get_path(key, 0).name
+                for size_dir in size_dirs:
+                    path = size_dir / name
+                    try:
+                        file_size = path.stat().st_size
+                        path.unlink()
+                    except OSError:
+                        continue
+                    if self._total is not None:
+                        self._total -= file_size
+
+    def _prune(self):
+        """Removes the oldest files until they take 80% of the maximum size,
+        if they take more"""
+
+        entries = []
+        try:
+            for size_dir in os.scandir(self.path):
+                if not size_dir.is_dir():
+                    continue
+                for entry in os.scandir(size_dir.path):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError as e:
+            print_w(f"Couldn't read album thumbnails ({e})")
+            return
+
+        total = sum(e[1] for e in entries)
+        if total > self._max_bytes:
+            entries.sort()
+            for _mtime, file_size, path in entries:
+                if total <= self._max_bytes * 0.8:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= file_size
+            print_d(f"Pruned album thumbnails to {total} bytes")
+        self._total = total
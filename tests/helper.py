@@ -302,6 +302,26 @@ def get_temp_copy(path):
     return filename
 
 
+def make_songs(count, start=0, tags=None):
+    """Returns songs with the file names /music/<i>.mp3 on the /music mount
+    point, i counting from start, and the tags tags(i) returns"""
+
+    from quodlibet.formats import AudioFile
+
+    songs = []
+    for i in range(start, start + count):
+        song = AudioFile(
+            {
+                "~filename": fsnative(f"/music/{i}.mp3"),
+                "~mountpoint": fsnative("/music"),
+            }
+        )
+        if tags is not None:
+            song.update(tags(i))
+        songs.append(song)
+    return songs
+
+
 class ListWithUnused:
     """This class stores a set of elements and provides the interface to check
     if it contains an arbitrary element, and then to know if some of the
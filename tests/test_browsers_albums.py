@@ -8,6 +8,7 @@
 # (at your option) any later version.
 
 from functools import cmp_to_key
+from unittest import mock
 
 from gi.repository import Gtk
 
@@ -15,7 +16,7 @@ from quodlibet.browsers._base import DisplayPatternMixin
 from . import TestCase, run_gtk_loop
 from .helper import realized
 
-from quodlibet import config
+from quodlibet import app, config
 
 from quodlibet.browsers.albums import AlbumList
 from quodlibet.browsers.albums.models import AlbumItem
@@ -182,6 +183,16 @@ class TAlbumBrowser(TestCase):
             view.row_activated(Gtk.TreePath((0,)), view.get_column(0))
             assert self.activated
 
+    def test_refresh_album_cover(self):
+        with realized(self.bar):
+            view = self.bar.view
+            view.get_selection().select_path(Gtk.TreePath((1,)))
+            item = view.get_model().get_items([Gtk.TreePath((1,))])[0]
+            thumbnails = app.cover_manager.thumbnails
+            with mock.patch.object(thumbnails, "invalidate") as invalidate:
+                self.bar._AlbumList__refresh_album(None, view)
+            invalidate.assert_called_once_with({item.album.key})
+
     def test_can_filter(self):
         with realized(self.bar):
             assert self.bar.can_filter(None)
@@ -8,12 +8,14 @@
 # (at your option) any later version.
 
 
+from unittest import mock
+
 from quodlibet.browsers.covergrid.main import CoverGrid
 
 from . import TestCase, run_gtk_loop
 from .helper import realized
 
-from quodlibet import config
+from quodlibet import app, config
 
 from quodlibet.browsers.albums.prefs import DEFAULT_PATTERN_TEXT
 from quodlibet.formats import AudioFile
@@ -99,6 +101,16 @@ class TCoverGridBrowser(TestCase):
             self._wait()
             assert self.activated
 
+    def test_refresh_cover(self):
+        with realized(self.bar):
+            view = self.bar.view
+            child = view.get_child_at_index(1)
+            view.select_child(child)
+            thumbnails = app.cover_manager.thumbnails
+            with mock.patch.object(thumbnails, "invalidate") as invalidate:
+                self.bar._CoverGrid__refresh_cover(None, view)
+            invalidate.assert_called_once_with({child.model.album.key})
+
     def test_can_filter(self):
         with realized(self.bar):
             assert self.bar.can_filter(None)
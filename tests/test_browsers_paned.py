@@ -468,6 +468,40 @@ class TPaneModel(TestCase):
         self._verify_model(m)
         self.assertEqual(len(m), len(SONGS) + 1 - 1)
 
+    def test_add_songs_sorted(self):
+        conf = PaneConfig("artist")
+        m = PaneModel(conf)
+        m.add_songs(SONGS[1:2])
+        m.add_songs(SONGS[3:])
+        m.add_songs(SONGS[:3])
+        self._verify_model(m)
+        keys = [e.key for e in m.itervalues()]
+        self.assertEqual(keys, [None, "<boris>", "mu", "piman", ""])
+
+    def test_add_unknown_last(self):
+        conf = PaneConfig("artist")
+        m = PaneModel(conf)
+        m.add_songs(SONGS[:1])
+        m.add_songs([UNKNOWN_ARTIST])
+        self._verify_model(m)
+        self.assertEqual(len(m), 3)
+
+    def test_change_songs(self):
+        conf = PaneConfig("artist")
+        m = PaneModel(conf)
+        songs = [AudioFile(s) for s in SONGS]
+        m.add_songs(songs)
+        song = songs[1]
+        m.remove_songs([song], False)
+        self.assertEqual(len(m), 5)
+        song["artist"] = "zoe"
+        m.add_songs([song])
+        m.remove_songs([], True)
+        self._verify_model(m)
+        keys = [e.key for e in m.itervalues()]
+        self.assertEqual(keys, [None, "<boris>", "piman", "zoe", ""])
+        assert m.matches([3], song)
+
     def test_get_songs(self):
         conf = PaneConfig("artist")
         m = PaneModel(conf)
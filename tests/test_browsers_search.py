@@ -99,6 +99,12 @@ class TSearchBar(TestCase):
         self.bar.filter("artist", ["notvalue", "mu", "piman"])
         self._do()
 
+    def test_filter_replaces_running_search(self):
+        self.bar.filter_text("piman")
+        self.bar.filter_text("boris")
+        self.expected = [SONGS[2]]
+        self._do()
+
     def test_filter_none(self):
         self.expected = []
         self.bar.filter("title", ["not a value"])
@@ -6,10 +6,12 @@
 # (at your option) any later version.
 
 import sys
+import tracemalloc
+from unittest import mock
 
 from quodlibet.fsn import fsnative
 
-from tests import TestCase, get_data_path
+from tests import TestCase, get_data_path, skip
 from .helper import capture_output
 
 from quodlibet import formats
@@ -17,8 +19,10 @@ from quodlibet.formats import (
     AudioFile,
     load_audio_files,
     dump_audio_files,
+    snapshot_audio_files,
     SerializationError,
 )
+from quodlibet.formats._intern import intern_item, _tables
 from quodlibet.util.picklehelper import pickle_dumps
 from quodlibet import config
 
@@ -80,6 +84,42 @@ class TFormats(TestCase):
             assert not stderr.getvalue()
 
 
+def synthetic_songs(count):
+    """Songs with tags as in a typical library, in albums of 10 songs"""
+
+    songs = []
+    for i in range(count):
+        album = i // 10
+        # str() and f-strings create new objects like unpickling does
+        songs.append(
+            AudioFile(
+                {
+                    "~filename": fsnative(
+                        f"/music/artist {album // 5}/album {album}/{i}.flac"
+                    ),
+                    "~mountpoint": fsnative("/music"),
+                    "title": f"Song {i}",
+                    "artist": f"Artist {album // 5}",
+                    "albumartist": f"Artist {album // 5}",
+                    "album": f"Album {album}",
+                    "genre": f"Genre {album % 3}",
+                    "date": str(2000 + album % 20),
+                    "tracknumber": f"{i % 10 + 1}/10",
+                    "musicbrainz_albumid": f"{album:08d}-0000-0000-0000-000000000000",
+                    "musicbrainz_trackid": f"{i:08d}-0000-0000-0000-000000000000",
+                    "~#added": 1700000000 + album,
+                    "~#bitrate": 900 + i % 100,
+                    "~#length": 180 + i % 120,
+                    "~#mtime": 1600000000.0 + i,
+                    "~#filesize": 30000000 + i,
+                    "~#samplerate": int("44100"),
+                    "~#channels": 2,
+                }
+            )
+        )
+    return songs
+
+
 class TPickle(TestCase):
     def setUp(self):
         types = formats.types
@@ -151,6 +191,54 @@ class TPickle(TestCase):
         data = dump_audio_files([])
         assert load_audio_files(data) == []
 
+    def test_snapshot_audio_files(self):
+        copies = snapshot_audio_files(self.instances)
+        for copy, instance in zip(copies, self.instances, strict=True):
+            assert copy is not instance
+            assert type(copy) is type(instance)
+            assert dict(copy) == dict(instance)
+        self.instances[0]["a"] = "changed"
+        assert copies[0]["a"] == "b"
+
+    def test_load_audio_files_interned(self):
+        songs = synthetic_songs(20)
+        assert songs[0]["genre"] is not songs[1]["genre"]
+        loaded = load_audio_files(dump_audio_files(songs))
+        for a, b in zip(loaded, loaded[1:], strict=False):
+            assert [k for k in a if k == "genre"][0] is [k for k in b if k == "genre"][
+                0
+            ]
+        assert loaded[0]["genre"] is loaded[1]["genre"]
+        assert loaded[0]["album"] is loaded[1]["album"]
+        assert loaded[0]["~#samplerate"] is loaded[1]["~#samplerate"]
+        assert [dict(s) for s in loaded] == [dict(s) for s in songs]
+
+    def test_unique_values_not_interned(self):
+        count = len(_tables[float])
+        for tag in ["~#added", "~#mtime", "~#length"]:
+            intern_item(tag, 1234.5678)
+        assert len(_tables[float]) == count
+
+    @skip("Enable for measuring memory usage of loaded songs")
+    def test_memory_per_song(self):
+        count = 100000
+        data = dump_audio_files(synthetic_songs(count))
+
+        def measure():
+            tracemalloc.start()
+            songs = load_audio_files(data)
+            size = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            del songs
+            return size / count
+
+        with mock.patch(
+            "quodlibet.formats._serialize.intern_item", lambda k, v: (k, v)
+        ):
+            plain = measure()
+        interned = measure()
+        print(f"{plain:.0f} bytes per song, interned {interned:.0f} bytes per song")
+
     def test_load_audio_files_missing_class(self):
         for protocol in [0, 1, 2]:
             data = pickle_dumps(self.instances, protocol)
@@ -830,6 +830,24 @@ class TAudioFile(TestCase):
             f(bar_1_2)
             f(bar_2_1)
 
+    def test_sort_func_cache(self):
+        song = AudioFile(bar_1_1)
+        func = AudioFile.sort_by_func("album")
+        key = func(song)
+        assert func(song) is key
+        assert AudioFile.sort_by_func("album")(song) is key
+        song["album"] = "Other"
+        assert func(song) != key
+        key = func(song)
+        del song["album"]
+        assert func(song) != key
+
+    def test_sort_func_uncached(self):
+        song = AudioFile(bar_1_1)
+        AudioFile.sort_by_func("~playlists")(song)
+        AudioFile.sort_by_func("~title~~playlists")(song)
+        assert not song._sort_keys
+
     def test_sort_func_custom_numeric(self):
         func = AudioFile.sort_by_func("~#year")
 
@@ -0,0 +1,227 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+import os
+import time
+from unittest import skip
+
+from quodlibet import config
+from quodlibet.formats import AudioFile, SerializationError
+from quodlibet.library import SongFileLibrary
+from quodlibet.library.columnar import (
+    CACHE_SUFFIX,
+    ColumnarCache,
+    LazySongDict,
+    dump_cache,
+)
+from quodlibet.fsn import fsnative
+from tests import TestCase, mkdtemp
+from tests.helper import make_songs
+
+
+def song_tags(i):
+    return {
+        # mounted, so they don't get masked when loaded
+        "~mountpoint": fsnative("/"),
+        "title": f"Title {i}",
+        "artist": f"Artist {i % 50}",
+        "genre": "Rock\nPop",
+        "~#added": 1000 + i,
+        "~#rating": 0.75,
+    }
+
+
+class TColumnarCache(TestCase):
+    def setUp(self):
+        self.dir = mkdtemp()
+        self.snapshot = os.path.join(self.dir, "songs")
+        self.filename = self.snapshot + CACHE_SUFFIX
+        with open(self.snapshot, "wb") as h:
+            h.write(b"pickle")
+
+    def tearDown(self):
+        for name in os.listdir(self.dir):
+            os.unlink(os.path.join(self.dir, name))
+        os.rmdir(self.dir)
+
+    def test_roundtrip(self):
+        songs = make_songs(10, tags=song_tags)
+        songs[3]["~filename"] = fsnative("/music/\udcff.mp3")
+        songs[4]["empty"] = ""
+        dump_cache(self.filename, self.snapshot, songs)
+        cache = ColumnarCache(self.filename, self.snapshot)
+        try:
+            assert len(cache) == 10
+            rows = cache.keys()
+            for song in songs:
+                loaded = cache.song(rows[song.key])
+                assert type(loaded) is type(song)
+                assert dict(loaded) == dict(song)
+                assert type(loaded["~#added"]) is int
+                assert type(loaded["~#rating"]) is float
+                assert cache.mountpoint(rows[song.key]) == song["~mountpoint"]
+        finally:
+            cache.close()
+
+    def test_values_interned(self):
+        dump_cache(self.filename, self.snapshot, make_songs(2, tags=song_tags))
+        cache = ColumnarCache(self.filename, self.snapshot)
+        try:
+            first, second = cache.song(0), cache.song(1)
+            assert first["genre"] is second["genre"]
+        finally:
+            cache.close()
+
+    def test_unsupported_value(self):
+        song = make_songs(1, tags=song_tags)[0]
+        dict.__setitem__(song, "foo", [1])
+        with self.assertRaises(SerializationError):
+            dump_cache(self.filename, self.snapshot, [song])
+
+    def test_stale(self):
+        dump_cache(self.filename, self.snapshot, make_songs(2, tags=song_tags))
+        with open(self.snapshot, "wb") as h:
+            h.write(b"changed pickle")
+        with self.assertRaises(SerializationError):
+            ColumnarCache(self.filename, self.snapshot)
+
+    def test_invalid(self):
+        with open(self.filename, "wb") as h:
+            h.write(b"nope" * 100)
+        with self.assertRaises(SerializationError):
+            ColumnarCache(self.filename, self.snapshot)
+
+
+class TLazySongDict(TestCase):
+    def setUp(self):
+        self.dir = mkdtemp()
+        snapshot = os.path.join(self.dir, "songs")
+        with open(snapshot, "wb") as h:
+            h.write(b"pickle")
+        self.songs = make_songs(5, tags=song_tags)
+        dump_cache(snapshot + CACHE_SUFFIX, snapshot, self.songs)
+        self.lazy = LazySongDict(ColumnarCache(snapshot + CACHE_SUFFIX, snapshot))
+
+    def tearDown(self):
+        self.lazy.clear()
+        for name in os.listdir(self.dir):
+            os.unlink(os.path.join(self.dir, name))
+        os.rmdir(self.dir)
+
+    def test_lazy(self):
+        lazy = self.lazy
+        key = self.songs[0].key
+        assert len(lazy) == 5
+        assert lazy.pending == 5
+        assert key in lazy
+        assert sorted(lazy.keys()) == sorted(s.key for s in self.songs)
+        assert lazy.pending == 5
+        assert dict(lazy[key]) == dict(self.songs[0])
+        assert lazy[key] is lazy.get(key)
+        assert lazy.pending == 4
+        assert len(lazy) == 5
+        assert lazy.get("nope") is None
+        self.assertRaises(KeyError, lambda: lazy["nope"])
+
+    def test_modify(self):
+        lazy = self.lazy
+        first, second = (s.key for s in self.songs[:2])
+        del lazy[first]
+        assert first not in lazy
+        new = AudioFile({"~filename": second})
+        lazy[second] = new
+        assert lazy[second] is new
+        assert len(lazy) == 4
+        assert dict(lazy.pop(self.songs[2].key)) == dict(self.songs[2])
+        assert len(lazy) == 3
+
+    def test_values_loads_all(self):
+        values = {song.key: dict(song) for song in self.lazy.values()}
+        assert values == {song.key: dict(song) for song in self.songs}
+        assert not self.lazy.pending
+
+    def test_group_by_mountpoint(self):
+        groups = self.lazy.group_by_mountpoint()
+        assert sorted(groups[fsnative("/")]) == sorted(s.key for s in self.songs)
+
+
+class TSongFileLibraryColumnar(TestCase):
+    def setUp(self):
+        config.init()
+        config.set("library", "columnar_cache", True)
+        self.dir = mkdtemp()
+        self.filename = os.path.join(self.dir, "songs")
+
+    def tearDown(self):
+        for name in os.listdir(self.dir):
+            os.unlink(os.path.join(self.dir, name))
+        os.rmdir(self.dir)
+        config.quit()
+
+    def load(self):
+        library = SongFileLibrary()
+        library.load(self.filename)
+        return library
+
+    def test_migrate_and_load(self):
+        config.set("library", "columnar_cache", False)
+        library = SongFileLibrary()
+        library.add(make_songs(20, tags=song_tags))
+        library.save(self.filename)
+        library.destroy()
+        assert not os.path.exists(self.filename + CACHE_SUFFIX)
+
+        config.set("library", "columnar_cache", True)
+        library = self.load()
+        assert not isinstance(library._contents, LazySongDict)
+        assert os.path.exists(self.filename + CACHE_SUFFIX)
+        library.destroy()
+
+        library = self.load()
+        assert isinstance(library._contents, LazySongDict)
+        assert library._contents.pending == 20
+        assert len(library) == 20
+        assert library[fsnative("/music/3.mp3")]("title") == "Title 3"
+        library.destroy()
+
+    def test_config_read_when_saving_starts(self):
+        library = SongFileLibrary()
+        library.add(make_songs(2, tags=song_tags))
+        library.save(self.filename, background=True)
+        config.set("library", "columnar_cache", False)
+        library.wait_for_save()
+        library.destroy()
+        assert os.path.exists(self.filename + CACHE_SUFFIX)
+
+    def test_journal_on_top(self):
+        library = self.load()
+        songs = make_songs(10, tags=song_tags)
+        library.add(songs)
+        library.save()
+        library.remove(songs[:2])
+        library.save()
+        library.destroy()
+
+        library = self.load()
+        assert isinstance(library._contents, LazySongDict)
+        assert len(library) == 8
+        assert songs[0].key not in library
+        library.destroy()
+
+    @skip("Enable for benchmarking library startup")
+    def test_startup_performance(self):
+        config.set("library", "columnar_cache", False)
+        library = SongFileLibrary()
+        library.add(make_songs(100000, tags=song_tags))
+        library.save(self.filename)
+        library.destroy()
+
+        for enabled in [False, True, True]:
+            config.set("library", "columnar_cache", enabled)
+            t = time.time()
+            library = self.load()
+            duration = time.time() - t
+            print(f"Loaded {len(library)} songs (cache: {enabled}) in {duration:.2f}s")
+            library.destroy()
@@ -7,17 +7,25 @@ import os
 import shutil
 from pathlib import Path
 from time import sleep
+from unittest import mock
 
 import pytest as pytest
+from gi.repository import GLib
 
 from quodlibet import config, app, print_d
 from quodlibet.library import SongFileLibrary
+from quodlibet.formats import AudioFile, dump_audio_files, load_audio_files
 from quodlibet.library.file import FileLibrary
+from quodlibet.library.masked import MASKED_SUFFIX
+from quodlibet.library.watcher import BatchedWatcher
+from quodlibet.util import inotify
 from quodlibet.util.library import get_exclude_dirs
 from quodlibet.util.path import normalize_path
 from quodlibet.fsn import text2fsn
 from tests import (
+    TestCase,
     mkdtemp,
+    skipUnless,
     get_data_path,
     run_gtk_loop,
     _TEMP_DIR,
@@ -152,6 +160,104 @@ class TFileLibrary(TLibrary):
         assert not self.changed, "shouldn't have changed any tracks"
 
 
+class TFileLibraryMaskedShards(TestCase):
+    MOUNT = normalize_path("/not/mounted/anywhere", True)
+
+    def setUp(self):
+        config.init()
+        self.temp = mkdtemp()
+        self.filename = os.path.join(self.temp, "library")
+        self.shards = self.filename + MASKED_SUFFIX
+
+    def tearDown(self):
+        shutil.rmtree(self.temp)
+        config.quit()
+
+    def songs(self, point, count):
+        songs = []
+        for i in range(count):
+            song = AudioFile({"~filename": os.path.join(point, f"{i}.mp3")})
+            song["~mountpoint"] = point
+            songs.append(song)
+        return songs
+
+    def load(self):
+        library = FileLibrary()
+        library.load(self.filename)
+        return library
+
+    def masked_library(self):
+        library = self.load()
+        library.add(self.songs(normalize_path("/", True), 3))
+        library.add(self.songs(self.MOUNT, 5))
+        library.mask(self.MOUNT)
+        library.save()
+        library.destroy()
+        return self.load()
+
+    def test_masked_saved_separately(self):
+        library = self.masked_library()
+        assert len(library) == 3
+        assert len(load_audio_files(open(self.filename, "rb").read())) == 3
+        assert os.listdir(self.shards)
+
+        assert library.masked_mount_points == [self.MOUNT]
+        shard = library._masked[self.MOUNT]
+        assert not shard.loaded
+        assert library.count_masked(self.MOUNT) == 5
+        assert library.masked(os.path.join(self.MOUNT, "0.mp3"))
+        assert not library.masked(os.path.join(self.MOUNT, "5.mp3"))
+        assert not shard.loaded
+        assert len(library.get_masked(self.MOUNT)) == 5
+        assert shard.loaded
+
+    def test_unchanged_shards_not_written(self):
+        library = self.masked_library()
+        (shard,) = os.listdir(self.shards)
+        path = os.path.join(self.shards, shard)
+        stat = os.stat(path)
+        library.add(self.songs(normalize_path("/other", True), 1))
+        library.save()
+        assert os.stat(path).st_ino == stat.st_ino
+        assert not library._masked[self.MOUNT].loaded
+
+    def test_unmask(self):
+        library = self.masked_library()
+        library.unmask(self.MOUNT)
+        assert len(library) == 8
+        library.save()
+        assert not os.listdir(self.shards)
+        library.destroy()
+
+        # not mounted, so masked again but from the library file
+        library = self.load()
+        assert library.count_masked(self.MOUNT) == 5
+        assert library._masked[self.MOUNT].dirty
+
+    def test_rebuild_detects_mount(self):
+        library = self.masked_library()
+        added = []
+        library.connect("added", lambda lib, items: added.extend(items))
+        with mock.patch("quodlibet.library.file.ismount", return_value=True):
+            next(library.rebuild([]))
+        assert len(added) == 5
+        assert not library.masked_mount_points
+
+    def test_old_library_file(self):
+        with open(self.filename, "wb") as h:
+            h.write(dump_audio_files(self.songs(self.MOUNT, 5)))
+        library = self.load()
+        assert library.count_masked(self.MOUNT) == 5
+        assert library.dirty
+        library.save()
+        library.destroy()
+
+        library = self.load()
+        assert not library._masked[self.MOUNT].loaded
+        assert library.count_masked(self.MOUNT) == 5
+        assert not library.dirty
+
+
 class TWatchedFileLibrary(TLibrary):
     Fake = FakeSongFile
     temp_path = Path(normalize_path(os.path.expanduser(_TEMP_DIR), True)).resolve()
@@ -281,3 +387,85 @@ class TWatchedFileLibrary(TLibrary):
     @property
     def fns(self) -> str:
         return ", ".join(s("~filename") for s in self.library)
+
+
+@skipUnless(inotify.is_available(), "inotify only")
+class TBatchedWatcher(TestCase):
+    FILES = ["silence-44-s.mp3", "empty.ogg", "empty.flac"]
+
+    def setUp(self):
+        config.init()
+        self.root = os.path.realpath(mkdtemp())
+        self.library = SongFileLibrary()
+        self.signals = []
+        for name in ["added", "changed", "removed"]:
+            self.library.connect(name, self._signal, name)
+        self.watcher = BatchedWatcher(self.library)
+        for _x in self.watcher.watch([self.root]):
+            pass
+
+    def tearDown(self):
+        self.watcher.destroy()
+        self.library.destroy()
+        shutil.rmtree(self.root)
+        config.quit()
+
+    def _signal(self, library, items, name):
+        self.signals.append((name, {song("~basename") for song in items}))
+
+    def handle_events(self):
+        self.watcher._on_readable(None, GLib.IO_IN)
+        self.watcher.flush()
+
+    def add_files(self, dir_=None):
+        for name in self.FILES:
+            shutil.copy(get_data_path(name), dir_ or self.root)
+        self.handle_events()
+
+    def test_added_in_one_batch(self):
+        self.add_files()
+        assert self.signals == [("added", set(self.FILES))]
+        assert len(self.library) == 3
+
+    def test_changed_in_one_batch(self):
+        self.add_files()
+        self.signals.clear()
+        for song in self.library:
+            os.utime(song("~filename"), (0, 0))
+        self.handle_events()
+        assert self.signals == [("changed", set(self.FILES))]
+
+    def test_removed_in_one_batch(self):
+        self.add_files()
+        self.signals.clear()
+        for name in self.FILES[1:]:
+            os.remove(os.path.join(self.root, name))
+        self.handle_events()
+        assert self.signals == [("removed", set(self.FILES[1:]))]
+        assert len(self.library) == 1
+
+    def test_moved_song(self):
+        self.add_files()
+        self.signals.clear()
+        old = os.path.join(self.root, "empty.ogg")
+        song = self.library[old]
+        new = os.path.join(self.root, "moved.ogg")
+        os.rename(old, new)
+        self.handle_events()
+        assert self.signals == [("changed", {"moved.ogg"})]
+        assert self.library[new] is song
+        assert old not in self.library
+
+    def test_new_and_removed_dir(self):
+        sub = os.path.join(self.root, "sub")
+        os.mkdir(sub)
+        self.handle_events()
+        assert sub in self.watcher
+        self.add_files(sub)
+        assert len(self.library) == 3
+        self.signals.clear()
+        shutil.rmtree(sub)
+        self.handle_events()
+        assert sub not in self.watcher
+        assert self.signals == [("removed", set(self.FILES))]
+        assert not self.library
@@ -4,11 +4,17 @@
 # (at your option) any later version.
 import os
 import shutil
+import threading
+import time
+from unittest import mock, skip
 
-from quodlibet.formats import AudioFile
+from quodlibet.formats import AudioFile, SerializationError
 from quodlibet.library.base import Library, iter_paths, PicklingMixin
+from quodlibet.library.dirindex import DIRS_SUFFIX, DirectoryIndex
+from quodlibet.library.journal import JOURNAL_SUFFIX
 from quodlibet.util import connect_obj, is_windows
-from quodlibet.fsn import fsnative
+from quodlibet.util.path import is_hidden
+from quodlibet.fsn import fsnative, path2fsn
 from tests import TestCase, mkstemp, mkdtemp, skipIf, run_gtk_loop
 
 
@@ -305,6 +311,221 @@ class TPicklingMixin(TestCase):
             os.unlink(filename)
 
 
+class TPicklingMixinJournal(TestCase):
+    class JournalLibrary(PicklingMixin, Library):
+        pass
+
+    def setUp(self):
+        fd, self.filename = mkstemp()
+        os.close(fd)
+        os.unlink(self.filename)
+        self.journal = self.filename + JOURNAL_SUFFIX
+
+    def tearDown(self):
+        for path in [self.filename, self.journal]:
+            if os.path.exists(path):
+                os.unlink(path)
+
+    def load(self):
+        library = self.JournalLibrary()
+        library.load(self.filename)
+        return library
+
+    def test_first_save_writes_snapshot(self):
+        library = self.load()
+        library.add(FakeAudioFileRange(10))
+        library.save()
+        assert os.path.exists(self.filename)
+        assert not os.path.exists(self.journal)
+        assert len(self.load()) == 10
+
+    def test_changes_are_journaled(self):
+        library = self.load()
+        songs = FakeAudioFileRange(10)
+        library.add(songs)
+        library.save()
+        with open(self.filename, "rb") as h:
+            snapshot = h.read()
+
+        library.remove(songs[:2])
+        library.add(FakeAudioFileRange(10, 12))
+        songs[5]["title"] = "changed"
+        library.changed([songs[5]])
+        library.save()
+        assert not library.dirty
+
+        assert os.path.exists(self.journal)
+        with open(self.filename, "rb") as h:
+            assert h.read() == snapshot
+        other = self.load()
+        assert sorted(other.keys()) == sorted(library.keys())
+        assert other[songs[5].key]("title") == "changed"
+
+    def test_journal_replayed_in_order(self):
+        library = self.load()
+        songs = FakeAudioFileRange(3)
+        library.add(songs)
+        library.save()
+        library.remove(songs[:1])
+        library.save()
+        library.add(songs[:1])
+        library.save()
+        assert sorted(self.load().keys()) == sorted(library.keys())
+
+    def test_moved_key(self):
+        library = self.load()
+        songs = FakeAudioFileRange(3)
+        library.add(songs)
+        library.save()
+        song = songs[0]
+        old_key = song.key
+        del library._contents[old_key]
+        song["~filename"] = fsnative("moved")
+        library._contents[song.key] = song
+        library._journal_moved(old_key)
+        library.changed([song])
+        library.save()
+        assert sorted(self.load().keys()) == sorted(library.keys())
+
+    def test_stale_journal_ignored(self):
+        library = self.load()
+        library.add(FakeAudioFileRange(3))
+        library.save()
+        library.add(FakeAudioFileRange(3, 5))
+        library.save()
+        assert os.path.exists(self.journal)
+
+        # replace the snapshot behind the journal's back
+        other = self.JournalLibrary()
+        other.add(FakeAudioFileRange(1))
+        other.save(self.filename)
+
+        assert len(self.load()) == 1
+        assert not os.path.exists(self.journal)
+
+    def test_compaction(self):
+        library = self.load()
+        library.add(FakeAudioFileRange(3))
+        library.save()
+        library.add(FakeAudioFileRange(3, 5))
+        library._journal.size = 2**30
+        library.save()
+        assert not os.path.exists(self.journal)
+        assert len(self.load()) == 5
+
+
+class TPicklingMixinBackgroundSave(TPicklingMixinJournal):
+    def test_background_save(self):
+        library = self.load()
+        library.add(FakeAudioFileRange(10))
+        library.save(background=True)
+        assert not library.dirty
+        library.wait_for_save()
+        assert len(self.load()) == 10
+        times = library.save_times
+        assert times.snapshot >= 0
+        assert times.total >= times.serialize
+
+    def test_changes_while_saving(self):
+        library = self.load()
+        songs = FakeAudioFileRange(10)
+        library.add(songs)
+        library.save(background=True)
+        # the song objects can change, the snapshot doesn't
+        songs[0]["title"] = "changed"
+        library.changed(songs[:1])
+        library.add(FakeAudioFileRange(10, 12))
+        library.wait_for_save()
+        assert library.dirty
+        other = self.load()
+        assert len(other) == 10
+        assert "title" not in other[songs[0].key]
+
+        library.save()
+        assert os.path.exists(self.journal)
+        other = self.load()
+        assert len(other) == 12
+        assert other[songs[0].key]("title") == "changed"
+
+    def test_skipped_while_saving(self):
+        library = self.load()
+        library.add(FakeAudioFileRange(10))
+        release = threading.Event()
+        with mock.patch.object(
+            library,
+            "_get_snapshot_saved",
+            return_value=lambda content: release.wait(5),
+        ):
+            library.save(background=True)
+            pending = library._pending_save
+            library.add(FakeAudioFileRange(10, 12))
+            library.save(background=True)
+            assert library._pending_save is pending
+            release.set()
+            library.save()
+        assert len(self.load()) == 12
+
+    def test_failed_save_keeps_changes(self):
+        library = self.load()
+        library.add(FakeAudioFileRange(3))
+        library.save()
+        times = library.save_times
+        library.add(FakeAudioFileRange(3, 5))
+        library._journal.size = 2**30
+        with mock.patch(
+            "quodlibet.library.base.dump_audio_files",
+            side_effect=SerializationError,
+        ):
+            library.save(background=True)
+            library.wait_for_save()
+        assert library.dirty
+        assert library.save_times is times
+        library._journal.size = 0
+        library.save()
+        assert len(self.load()) == 5
+
+
+def iter_paths_walk(root, exclude=None, skip_hidden=True):
+    """The os.walk() based iter_paths() from before, for comparison"""
+
+    exclude = exclude or []
+
+    def skip(path):
+        if skip_hidden and is_hidden(path):
+            return True
+        return any(path.startswith(p) for p in exclude)
+
+    if skip_hidden and is_hidden(root):
+        return
+
+    for path, dnames, fnames in os.walk(root):
+        if skip_hidden:
+            dnames[:] = [
+                d for d in dnames if not is_hidden(path2fsn(os.path.join(path, d)))
+            ]
+        for filename in fnames:
+            full_filename = path2fsn(os.path.join(path, filename))
+            if skip(full_filename):
+                continue
+            full_filename = path2fsn(os.path.realpath(full_filename))
+            if skip(full_filename):
+                continue
+            yield full_filename
+
+
+def make_tree(root, dirs, files, depth=2):
+    """Creates `dirs` directories with `files` files each on every level"""
+
+    for i in range(dirs):
+        path = os.path.join(root, f"dir{i}")
+        os.mkdir(path)
+        for j in range(files):
+            with open(os.path.join(path, f"file{j}.ogg"), "wb"):
+                pass
+        if depth > 1:
+            make_tree(path, dirs, files, depth - 1)
+
+
 class Titer_paths(TestCase):
     def setUp(self):
         # on osx the temp folder returned is a symlink
@@ -369,3 +590,134 @@ class Titer_paths(TestCase):
         os.close(fd)
 
         assert list(iter_paths(self.root)) == []
+
+    def test_same_as_walk(self):
+        make_tree(self.root, 3, 3)
+        os.mkdir(os.path.join(self.root, ".hidden"))
+        open(os.path.join(self.root, ".hidden", "file"), "wb").close()
+        open(os.path.join(self.root, "dir0", ".file"), "wb").close()
+        if not is_windows():
+            os.symlink(
+                os.path.join(self.root, "dir1"), os.path.join(self.root, "dir0", "l")
+            )
+            os.symlink(
+                os.path.join(self.root, "dir2", "file0.ogg"),
+                os.path.join(self.root, "dir0", "link.ogg"),
+            )
+            os.symlink(
+                os.path.join(self.root, "dir2", "file1.ogg"),
+                os.path.join(self.root, "dir0", ".hidden.ogg"),
+            )
+            os.symlink("nope", os.path.join(self.root, "dir0", "broken"))
+        dir0 = os.path.join(self.root, "dir0")
+        for exclude in [
+            [],
+            [dir0],
+            [dir0 + os.sep],
+            [os.path.join(dir0, "file")],
+            [os.path.join(dir0, "dir1", "file1.ogg")],
+            [os.path.join(self.root, "dir2", "file0.ogg")],
+            [os.path.join(self.root, "di")],
+        ]:
+            for skip_hidden in [True, False]:
+                for root in [self.root, self.root + os.sep, dir0]:
+                    assert list(iter_paths(root, exclude, skip_hidden)) == list(
+                        iter_paths_walk(root, exclude, skip_hidden)
+                    )
+
+    @skip("Enable for benchmarking iter_paths")
+    def test_performance(self):
+        make_tree(self.root, 10, 100, depth=3)
+        for name, func in [("os.walk", iter_paths_walk), ("iter_paths", iter_paths)]:
+            t = time.time()
+            for _x in range(5):
+                count = len(list(func(self.root)))
+            duration = (time.time() - t) / 5
+            print(f"{name}: {count} files in {duration * 1000:.1f}ms")
+
+    def test_index(self):
+        child = mkdtemp(dir=self.root)
+        fd, name = mkstemp(dir=child)
+        os.close(fd)
+        index = DirectoryIndex()
+        index.begin()
+        assert list(iter_paths(self.root, index=index)) == [name]
+        index.commit([self.root])
+        assert len(index) == 2
+
+        index.begin()
+        assert list(iter_paths(self.root, index=index)) == []
+        assert index.skipped_dirs == 2
+        assert index.skipped_files == 1
+
+        fd, other = mkstemp(dir=child)
+        os.close(fd)
+        index.begin()
+        assert sorted(iter_paths(self.root, index=index)) == sorted([name, other])
+        assert index.skipped_dirs == 1
+
+    def test_index_not_committed(self):
+        index = DirectoryIndex()
+        index.begin()
+        list(iter_paths(self.root, index=index))
+        assert len(index) == 0
+
+
+class TDirectoryIndex(TestCase):
+    def setUp(self):
+        self.root = os.path.realpath(mkdtemp())
+        self.temp = mkdtemp()
+        self.filename = os.path.join(self.temp, "library" + DIRS_SUFFIX)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+        shutil.rmtree(self.temp)
+
+    def save(self, snapshot=(1, 2)):
+        index = DirectoryIndex(self.filename, snapshot)
+        index.set_context(["foo"])
+        index.begin()
+        index.update(self.root, os.stat(self.root), 3, [])
+        index.commit([self.root])
+        index.save(snapshot)
+
+    def test_save_load(self):
+        self.save()
+        loaded = DirectoryIndex(self.filename, (1, 2))
+        loaded.set_context(["foo"])
+        record = loaded.get(self.root, os.stat(self.root))
+        assert record.files == 3
+        assert record.subdirs == ()
+
+    def test_other_context(self):
+        self.save()
+        loaded = DirectoryIndex(self.filename, (1, 2))
+        loaded.set_context(["bar"])
+        assert len(loaded) == 0
+
+    def test_other_snapshot(self):
+        self.save()
+        assert len(DirectoryIndex(self.filename, (1, 3))) == 0
+        assert len(DirectoryIndex(self.filename, None)) == 0
+
+    def test_discard(self):
+        index = DirectoryIndex()
+        index.begin()
+        index.update(self.root, os.stat(self.root), 3, [])
+        index.commit([self.root])
+        index.save(None)
+        index.discard(self.root)
+        assert index.dirty
+        assert index.get(self.root, os.stat(self.root)) is None
+
+    def test_removed_dirs_dropped(self):
+        child = os.path.join(self.root, "child")
+        index = DirectoryIndex()
+        index.begin()
+        index.update(self.root, os.stat(self.root), 0, ["child"])
+        index.update(child, os.stat(self.root), 0, [])
+        index.commit([self.root])
+        index.begin()
+        index.update(self.root, os.stat(self.root), 0, [])
+        index.commit([self.root])
+        assert len(index) == 1
@@ -3,11 +3,16 @@
 # the Free Software Foundation; either version 2 of the License, or
 # (at your option) any later version.
 import os
+import shutil
+import time
+from unittest import mock, skip
 
-from quodlibet import config
-from quodlibet.formats import AudioFileError
-from quodlibet.library import SongLibrary, SongFileLibrary
-from tests import get_data_path, run_gtk_loop
+from quodlibet import config, formats
+from quodlibet.formats import AudioFile, AudioFileError
+from quodlibet.library import SongLibrary, SongFileLibrary, workers
+from quodlibet.library.dirindex import DIRS_SUFFIX
+from quodlibet.library.file import _is_valid, _scandir
+from tests import TestCase, get_data_path, mkdtemp, run_gtk_loop
 from tests.helper import get_temp_copy, capture_output
 from tests.test_library_libraries import (
     TLibrary,
@@ -194,3 +199,195 @@ class TSongFileLibrary(TSongLibrary):
         playlists = pl_lib.playlists_featuring(NUMERIC_SONGS[0])
         assert set(playlists) == {pl, pl2}, "didn't register playlist2"
         assert set(pl_lib.playlists_featuring(NUMERIC_SONGS[1])) == {pl}
+
+
+def make_scan_tree(root, copies):
+    """Copies all audio files from the test data `copies` times below root"""
+
+    data = os.path.dirname(get_data_path("empty.flac"))
+    sources = [name for name in os.listdir(data) if formats.filter(name)]
+    for i in range(copies):
+        dest = os.path.join(root, f"album{i}")
+        os.mkdir(dest)
+        for name in sources:
+            shutil.copy(os.path.join(data, name), dest)
+
+
+class TSongFileLibraryScan(TestCase):
+    def setUp(self):
+        config.init()
+        self.root = mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+        config.quit()
+
+    def scan(self, processes):
+        config.set("library", "scan_workers", processes)
+        library = SongFileLibrary()
+        try:
+            for _x in library.scan([self.root]):
+                pass
+            return {song.key: dict(song) for song in library}
+        finally:
+            library.destroy()
+
+    def test_parallel_same_as_serial(self):
+        make_scan_tree(self.root, 2)
+        serial = self.scan(0)
+        assert serial
+        with mock.patch.object(workers, "MIN_FILES", 0):
+            parallel = self.scan(2)
+        assert parallel.keys() == serial.keys()
+        for key, tags in serial.items():
+            # ~#added is the time of loading
+            tags.pop("~#added", None)
+            parallel[key].pop("~#added", None)
+            assert parallel[key] == tags
+
+    @skip("Enable for benchmarking parallel library scans")
+    def test_scan_performance(self):
+        make_scan_tree(self.root, 50)
+        for processes in [0, 2, 4, os.cpu_count()]:
+            t = time.time()
+            with mock.patch.object(workers, "MIN_FILES", 0):
+                count = len(self.scan(processes))
+            duration = time.time() - t
+            print(f"Scanned {count} files with {processes} workers in {duration:.2f}s")
+
+
+class TSongFileLibraryRebuild(TestCase):
+    def setUp(self):
+        config.init()
+        config.set("library", "skip_unchanged_dirs", True)
+        self.root = os.path.realpath(mkdtemp())
+        make_scan_tree(self.root, 2)
+        self.library = SongFileLibrary()
+        self.rebuild()
+
+    def tearDown(self):
+        self.library.destroy()
+        shutil.rmtree(self.root)
+        config.quit()
+
+    def rebuild(self, force=False):
+        for _x in self.library.rebuild([self.root], force=force):
+            pass
+        return self.library._dir_index
+
+    def test_unchanged_dirs_skipped(self):
+        count = len(self.library)
+        assert count
+        index = self.rebuild()
+        assert len(self.library) == count
+        # the root and both album dirs
+        assert index.skipped_dirs == 3
+        assert index.skipped_files == count
+
+    def test_new_file_found(self):
+        album = os.path.join(self.root, "album0")
+        shutil.copy(get_data_path("empty.ogg"), os.path.join(album, "new.ogg"))
+        index = self.rebuild()
+        assert self.library.contains_filename(os.path.join(album, "new.ogg"))
+        assert index.skipped_dirs == 2
+
+    def test_new_subdir_found(self):
+        album = os.path.join(self.root, "album0", "disc2")
+        os.mkdir(album)
+        shutil.copy(get_data_path("empty.ogg"), album)
+        self.rebuild()
+        assert self.library.contains_filename(os.path.join(album, "empty.ogg"))
+
+    def test_removed_file(self):
+        path = os.path.join(self.root, "album1", "empty.ogg")
+        os.remove(path)
+        self.rebuild()
+        assert not self.library.contains_filename(path)
+
+    def test_force_rescans_all(self):
+        index = self.rebuild(force=True)
+        assert index.skipped_dirs == 0
+
+    def test_skip_unchanged_dirs_option(self):
+        path = os.path.join(self.root, "album1", "empty.ogg")
+        song = self.library[path]
+        os.utime(path, (0, 0))
+        self.rebuild()
+        assert self.library[path] is song
+        config.set("library", "skip_unchanged_dirs", False)
+        self.rebuild()
+        assert self.library[path]["~#mtime"] == 0
+
+    def test_removed_song_found_again(self):
+        path = os.path.join(self.root, "album1", "empty.ogg")
+        self.library.remove([self.library[path]])
+        self.rebuild()
+        assert self.library.contains_filename(path)
+
+    def test_index_saved_after_background_save(self):
+        temp = mkdtemp()
+        filename = os.path.join(temp, "songs")
+        library = SongFileLibrary()
+        try:
+            library.load(filename)
+            for _x in library.rebuild([self.root]):
+                pass
+            library.save(background=True)
+            library.wait_for_save()
+            assert os.path.exists(filename + DIRS_SUFFIX)
+        finally:
+            library.destroy()
+            shutil.rmtree(temp)
+
+    def test_index_belongs_to_library_file(self):
+        temp = mkdtemp()
+        filename = os.path.join(temp, "songs")
+        libraries = []
+
+        def rebuild_saved():
+            library = SongFileLibrary()
+            libraries.append(library)
+            library.load(filename)
+            for _x in library.rebuild([self.root]):
+                pass
+            library.save()
+            return library
+
+        try:
+            count = len(rebuild_saved())
+            assert os.path.exists(filename + DIRS_SUFFIX)
+            library = rebuild_saved()
+            assert library._dir_index.skipped_dirs == 3
+            # nothing can be skipped for a lost library file
+            os.remove(filename)
+            library = rebuild_saved()
+            assert library._dir_index.skipped_dirs == 0
+            assert len(library) == count
+        finally:
+            for library in libraries:
+                library.destroy()
+            shutil.rmtree(temp)
+
+
+class TIsValid(TestCase):
+    def setUp(self):
+        self.root = os.path.realpath(mkdtemp())
+        self.path = os.path.join(self.root, "Mixed Case.ogg")
+        shutil.copy(get_data_path("empty.ogg"), self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_normalized_name(self):
+        # like on Windows, where keys are lower case
+        with mock.patch("os.path.normcase", str.lower):
+            item = AudioFile({"~filename": self.path.lower()})
+            item["~#mtime"] = os.path.getmtime(self.path)
+            assert _is_valid(item, _scandir(self.root))
+
+    def test_missing_entry_falls_back(self):
+        item = AudioFile({"~filename": self.path})
+        item["~#mtime"] = os.path.getmtime(self.path)
+        assert _is_valid(item, {})
+        item["~#mtime"] = 1
+        assert not _is_valid(item, {})
@@ -11,6 +11,7 @@ from gi.repository import Gtk
 
 from quodlibet.qltk.models import ObjectStore, ObjectModelFilter
 from quodlibet.qltk.models import ObjectModelSort, ObjectTreeStore
+from quodlibet.qltk.models import ObjectListModel
 from quodlibet.util import cmp
 
 
@@ -228,6 +229,148 @@ class TObjectStore(TestCase, _TObjectStoreMixin):
         self.assertEqual(result, cmp("alice", "bob"))
 
 
+class TObjectListModel(TestCase, _TObjectStoreMixin):
+    Store = ObjectListModel
+
+    def test_append_many(self):
+        m = ObjectListModel()
+        m.append_many(range(5))
+        m.insert_many(2, ["a", "b"])
+        m.insert_many(99, ["c"])
+        self.assertEqual(list(m.itervalues()), [0, 1, "a", "b", 2, 3, 4, "c"])
+        self.assertEqual([r[0] for r in m], list(m.itervalues()))
+
+    def test_iters_persist(self):
+        m = ObjectListModel()
+        iters = list(m.iter_append_many(range(10)))
+        m.insert_many(0, ["a", "b"])
+        m.move_before(iters[9], iters[0])
+        self.assertEqual(m.get_value(iters[3]), 3)
+        self.assertEqual(m.get_path(iters[3]).get_indices(), [6])
+        self.assertEqual(m.get_path(iters[9]).get_indices(), [2])
+
+    def test_remove(self):
+        m = ObjectListModel()
+        iters = list(m.iter_append_many(range(3)))
+        iter_ = iters[1]
+        assert m.remove(iter_)
+        self.assertEqual(m.get_value(iter_), 2)
+        assert not m.remove(iter_)
+        assert not m.iter_is_valid(iter_)
+        assert m.iter_is_valid(iters[0])
+        self.assertEqual(list(m.itervalues()), [0])
+
+    def test_iterrows(self):
+        m = ObjectListModel()
+        m.append_many(range(10))
+        for iter_, value in m.iterrows():
+            self.assertEqual(m.get_value(iter_), value)
+            if value % 2:
+                m.remove(iter_)
+        self.assertEqual(list(m.itervalues()), [0, 2, 4, 6, 8])
+
+    def test_reorder(self):
+        m = ObjectListModel()
+        m.append_many("abc")
+        m.reorder([2, 0, 1])
+        self.assertEqual(list(m.itervalues()), ["c", "a", "b"])
+        self.assertRaises(ValueError, m.reorder, [0, 1])
+
+    def test_move(self):
+        m = ObjectListModel()
+        a, b, c = m.iter_append_many("abc")
+        m.move_before(a, None)
+        self.assertEqual(list(m.itervalues()), ["b", "c", "a"])
+        m.move_after(a, None)
+        self.assertEqual(list(m.itervalues()), ["a", "b", "c"])
+        m.move_after(a, c)
+        self.assertEqual(list(m.itervalues()), ["b", "c", "a"])
+        m.swap(a, b)
+        self.assertEqual(list(m.itervalues()), ["a", "c", "b"])
+
+    def test_set_value(self):
+        m = ObjectListModel()
+        iter_ = m.append(row=[1])
+        m.set_value(iter_, 0, 2)
+        m[iter_][0] = 3
+        self.assertEqual(m.get_value(iter_), 3)
+
+    def test_clear(self):
+        m = ObjectListModel()
+        iter_ = m.append(row=[1])
+        m.append_many(range(3))
+        m.clear()
+        assert m.is_empty()
+        assert not m.iter_is_valid(iter_)
+
+    def test_merge_many(self):
+        m = ObjectListModel()
+        m.append_many([0, 2, 4])
+        m.merge_many([0, 1, 1, 3], [-1, 1, 1.5, 5])
+        self.assertEqual(list(m.itervalues()), [-1, 0, 1, 1.5, 2, 4, 5])
+        self.assertRaises(ValueError, m.merge_many, [1, 0], [1, 2])
+        self.assertRaises(ValueError, m.merge_many, [99], [1])
+
+    def test_merge_many_connected(self):
+        m = ObjectListModel()
+        m.append_many([0, 2, 4])
+        paths = []
+        m.connect("row-inserted", lambda m, path, iter_: paths.append(path[0]))
+        m.merge_many([0, 1, 3], [-1, 1, 5])
+        self.assertEqual(list(m.itervalues()), [-1, 0, 1, 2, 4, 5])
+        self.assertEqual(paths, [0, 2, 5])
+
+    def test_paths_after_changes(self):
+        m = ObjectListModel()
+        iters = list(m.iter_append_many(range(100)))
+        for i in range(200):
+            iters.append(m.insert_before(iters[(i * 7) % len(iters)], row=[i]))
+            if i % 3 == 0:
+                iter_ = iters.pop((i * 13) % len(iters))
+                m.remove(iter_.copy())
+        for index, (iter_, _value) in enumerate(m.iterrows()):
+            self.assertEqual(m.get_path(iter_).get_indices(), [index])
+        self.assertEqual(sorted(m.get_path(i)[0] for i in iters), list(range(len(m))))
+
+    def test_paths_while_inserting(self):
+        m = ObjectListModel()
+        m.append_many(range(10))
+        m.reorder(list(reversed(range(10))))
+
+        def inserted(model, path, iter_):
+            for index, (row_iter, _value) in enumerate(model.iterrows()):
+                self.assertEqual(model.get_path(row_iter)[0], index)
+
+        m.connect("row-inserted", inserted)
+        m.insert_many(5, range(10, 20))
+        for index, (iter_, _value) in enumerate(m.iterrows()):
+            self.assertEqual(m.get_path(iter_)[0], index)
+
+    def test_signal_count(self):
+        m = ObjectListModel()
+
+        def handler(model, *args):
+            args[-1][0] += 1
+
+        inserted = [0]
+        m.connect("row-inserted", handler, inserted)
+        deleted = [0]
+        m.connect("row-deleted", handler, deleted)
+        reordered = [0]
+        m.connect("rows-reordered", handler, reordered)
+
+        iter_ = m.append([1])
+        m.insert_many(0, [1, 2, 3])
+        list(m.iter_append_many(range(3)))
+        self.assertEqual(inserted[0], len(m))
+        m.move_before(iter_, None)
+        m.reorder(list(reversed(range(len(m)))))
+        self.assertEqual(reordered[0], 2)
+        m.remove(iter_)
+        m.clear()
+        self.assertEqual(deleted[0], inserted[0])
+
+
 class _TObjectTreeStoreMixin:
     Store = None
 
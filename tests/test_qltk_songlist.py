@@ -15,6 +15,7 @@ from quodlibet.qltk.songlist import (
     get_columns,
     header_tag_split,
     get_sort_tag,
+    _sort_ranks,
 )
 from quodlibet.qltk.songlistcolumns import SongListColumn
 from tests import TestCase, run_gtk_loop
@@ -133,6 +134,24 @@ class TSongList(TestCase):
         s.set_column_headers(["~#track"])
         assert s.find_default_sort_column()
 
+    def test_sort_mixed_orders(self):
+        songs = [
+            AudioFile({"~filename": f"/dev/{i}", "artist": a, "~#rating": r})
+            for i, (a, r) in enumerate(
+                [("b", 0.5), ("a", 0.5), ("b", 1.0), ("a", 0.0), ("c", 0.5)]
+            )
+        ]
+        self.songlist.set_column_headers(["artist", "~#rating"])
+        self.songlist.set_sort_orders([("artist", False), ("~#rating", True)])
+        self.songlist.set_songs(songs)
+        assert self.songlist.get_songs() == [
+            songs[2],
+            songs[1],
+            songs[0],
+            songs[4],
+            songs[3],
+        ]
+
     def test_inline_search_state(self):
         self.assertEqual(self.songlist.get_search_column(), 0)
         assert self.songlist.get_enable_search()
@@ -197,6 +216,18 @@ class TSongList(TestCase):
 
         self.assertEqual(self.songlist.get_songs(), [song] * 4)
 
+    def test_add_songs_sorted(self):
+        def songs(titles):
+            return [AudioFile({"~filename": f"/{t}", "title": t}) for t in titles]
+
+        self.songlist.set_column_headers(["title"])
+        self.songlist.toggle_column_sort(self.songlist.get_columns()[0])
+        self.songlist.set_songs(songs("aceg"))
+        self.songlist.add_songs(songs("hdbfa"))
+        titles = [s("title") for s in self.songlist.get_songs()]
+        assert titles in (sorted(titles), sorted(titles, reverse=True))
+        self.assertEqual(len(titles), 9)
+
     def test_remove_songs(self):
         song = AudioFile({"~filename": "/dev/null"})
         song.sanitize()
@@ -263,6 +294,11 @@ class TSongList(TestCase):
         self.assertEqual(get_sort_tag("composer"), "composersort")
         self.assertEqual(get_sort_tag("originalartist"), "originalartistsort")
 
+    def test_sort_ranks(self):
+        assert _sort_ranks([]) == []
+        assert _sort_ranks(["b", "a", "c", "a"]) == [1, 0, 2, 0]
+        assert _sort_ranks(["b", "a", "c", "a"], reverse=True) == [1, 2, 0, 2]
+
     def test_check_sensible_menu_items(self):
         col = SongListColumn("title")
 
@@ -473,6 +473,20 @@ class TQuery(TestCase):
         assert q.filter([self.s1, self.s2]), [self.s1 == self.s2]
         assert q.filter(iter([self.s1, self.s2])), [self.s1 == self.s2]
 
+    def test_filter_chunks(self):
+        q = Query("artist=piman")
+        songs = [self.s1, self.s2] * 3
+        assert list(q.filter_chunks(songs, 4)) == [[self.s1] * 2, [self.s1]]
+        assert list(q.filter_chunks([])) == []
+
+    def test_cached(self):
+        q = Query.cached("foo")
+        assert q is Query.cached("foo")
+        assert q is not Query.cached("foo", star=["title"])
+        assert Query.cached("foo", star=Query.STAR) is q
+        config.set("browsers", "ignored_characters", "o")
+        assert Query.cached("foo") is not q
+
     def test_match_all(self):
         assert Query("").matches_all
         assert Query("    ").matches_all
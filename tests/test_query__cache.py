@@ -0,0 +1,180 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+from quodlibet import config
+from quodlibet.library import SongLibrary
+from quodlibet.query import Query, QueryCache
+from quodlibet.query import _cache
+from quodlibet.query._cache import cacheable, query_key
+from tests import TestCase
+from tests.helper import make_songs
+
+
+def song_tags(i):
+    return {"artist": ["foo", "bar", "baz"][i % 3], "~#rating": (i % 5) / 4}
+
+
+class TQueryCache(TestCase):
+    def setUp(self):
+        config.init()
+        self.library = SongLibrary()
+        self.library.add(make_songs(30, tags=song_tags))
+        self.cache = self.library.get_query_cache()
+
+    def tearDown(self):
+        self.library.destroy()
+        config.quit()
+
+    def assertUpToDate(self, text):
+        query = Query(text)
+        expected = {s for s in self.library if query.search(s)}
+        assert set(query.filter(self.library)) == expected
+
+    def test_generation(self):
+        generation = self.library.generation
+        self.library.add(make_songs(1, 100, song_tags))
+        self.library.changed(list(self.library)[:1])
+        self.library.remove(list(self.library)[:1])
+        assert self.library.generation == generation + 3
+
+    def test_hit(self):
+        first = Query("artist=foo").filter(self.library)
+        assert self.cache.stats.misses == 1
+        second = Query("artist=foo").filter(self.library)
+        assert self.cache.stats.hits == 1
+        assert first == second
+        assert first is not second
+        assert len(first) == 10
+
+    def test_star_is_part_of_key(self):
+        Query("foo").filter(self.library)
+        Query("foo", star=["title"]).filter(self.library)
+        assert self.cache.stats.misses == 2
+
+    def test_update(self):
+        self.assertUpToDate("artist=foo")
+        self.assertUpToDate("#(rating > 0.5)")
+        songs = list(self.library)
+        self.library.remove(songs[:5])
+        for song in songs[5:15]:
+            song["artist"] = "foo"
+            song["~#rating"] = 1.0
+        self.library.changed(songs[5:15])
+        self.library.add(make_songs(10, 100, song_tags))
+        self.assertUpToDate("artist=foo")
+        self.assertUpToDate("#(rating > 0.5)")
+        assert self.cache.stats.updates == 2
+        assert self.cache.stats.misses == 2
+        assert self.cache.stats.refresh_time > 0
+
+    def test_get_put(self):
+        query = Query("artist=foo")
+        assert self.cache.get(query) is None
+        # changes only get logged with something cached
+        Query("artist=bar").filter(self.library)
+        generation = self.library.generation
+        songs = query._filter(self.library)
+        self.library.add(make_songs(3, 100, song_tags))
+        self.cache.put(query, songs, generation)
+        self.assertUpToDate("artist=foo")
+        assert self.cache.stats.updates == 1
+        assert self.cache.stats.misses == 1
+
+    def test_filter_chunks(self):
+        query = Query("artist=foo")
+        chunks = list(query.filter_chunks(self.library, 4))
+        assert len(chunks) == 8
+        assert len(self.cache) == 1
+        assert list(query.filter_chunks(self.library, 4)) == [sum(chunks, [])]
+        assert self.cache.stats.hits == 1
+
+    def test_log_overflow(self):
+        old = _cache.MAX_LOG_SONGS
+        _cache.MAX_LOG_SONGS = 5
+        try:
+            self.assertUpToDate("artist=foo")
+            self.library.add(make_songs(10, 100, song_tags))
+            self.assertUpToDate("artist=foo")
+        finally:
+            _cache.MAX_LOG_SONGS = old
+        assert self.cache.stats.misses == 2
+        assert self.cache.stats.updates == 0
+
+    def test_lru(self):
+        cache = QueryCache(self.library, max_queries=2)
+        try:
+            for text in ["artist=foo", "artist=bar", "artist=foo", "artist=baz"]:
+                cache.filter(Query(text))
+            assert len(cache) == 2
+            cache.filter(Query("artist=foo"))
+            assert cache.stats.hits == 2
+            cache.filter(Query("artist=bar"))
+            assert cache.stats.misses == 4
+        finally:
+            cache.destroy()
+
+    def test_max_songs(self):
+        cache = QueryCache(self.library, max_songs=15)
+        try:
+            cache.filter(Query("artist=foo"))
+            cache.filter(Query("artist=bar"))
+            assert len(cache) == 1
+            cache.filter(Query("artist=|(foo,bar)"))
+            assert len(cache) == 0
+        finally:
+            cache.destroy()
+
+    def test_not_cacheable(self):
+        assert cacheable(Query("&(foo, #(rating > 0.5), !bar)")._match)
+        assert cacheable(Query("#(date > 2010-01-01)")._match)
+        assert not cacheable(Query("#(added < 2 days)")._match)
+        assert not cacheable(Query("#(rating > 1 + 2)")._match)
+        assert not cacheable(Query("~playlists=foo")._match)
+        assert not cacheable(Query("~lyrics=foo")._match)
+        assert not cacheable(Query("~album~~lyrics=foo")._match)
+        assert not cacheable(Query("@(foo)")._match)
+        assert self.cache.filter(Query("#(lastplayed > today)")) is None
+        assert self.cache.stats.misses == 0
+
+    def test_during_signal(self):
+        results = []
+
+        def changed(library, songs):
+            results.append(cache.filter(Query("artist=foo")))
+
+        # connected before the cache, so called before it sees the change
+        sig = self.library.connect("changed", changed)
+        cache = QueryCache(self.library)
+        try:
+            cache.filter(Query("artist=foo"))
+            song = next(s for s in self.library if s("artist") != "foo")
+            song["artist"] = "foo"
+            self.library.changed([song])
+            assert results == [None]
+            assert len(cache.filter(Query("artist=foo"))) == 11
+        finally:
+            self.library.disconnect(sig)
+            cache.destroy()
+
+    def test_disabled(self):
+        config.set("browsers", "query_cache", False)
+        assert self.library.get_query_cache() is None
+        self.assertUpToDate("artist=foo")
+
+    def test_key(self):
+        assert query_key(Query("&(artist=foo, title=bar)")) == query_key(
+            Query("&(title=bar, artist=foo)")
+        )
+        assert query_key(Query("#(rating > 0.601)")) != query_key(
+            Query("#(rating > 0.604)")
+        )
+        assert query_key(Query("~filename=foo")) != query_key(Query("~dirname=foo"))
+        assert query_key(Query("foo")) != query_key(Query("foo", star=["title"]))
+
+    def test_ignored_characters(self):
+        Query("foo!").filter(self.library)
+        config.set("browsers", "ignored_characters", "!")
+        Query("foo!").filter(self.library)
+        assert self.cache.stats.misses == 2
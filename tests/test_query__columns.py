@@ -0,0 +1,177 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+import random
+import time
+
+from quodlibet import config
+from quodlibet.formats import AudioFile
+from quodlibet.library import SongLibrary
+from quodlibet.query import Query
+from quodlibet.query import _columns
+from tests import TestCase, skip
+from tests.helper import make_songs
+
+QUERIES = [
+    "#(rating > 0.6)",
+    "#(rating >= 0.5)",
+    "#(rating = 0.5)",
+    "#(rating != 0.5)",
+    "#(0.5 < rating)",
+    "#(0.2 < rating < 0.8)",
+    "#(playcount < 3)",
+    "#(added < 2 weeks)",
+    "#(lastplayed > 1 day)",
+    "#(length > 5 minutes)",
+    "#(filesize > 5MB)",
+    "#(date < 2000)",
+    "#(date >= 1995-06)",
+    "#(year > 2005)",
+    "#(date = 2010)",
+    "#(date != 2010)",
+    "#(2000 < date <= 2010)",
+    "#(added > 10 days)",
+    "#(lastplayed < 2 days)",
+    "#(lastplayed = 0)",
+    "#(laststarted > today)",
+    "#(mtime < 1 week)",
+    "#(bitrate > playcount)",
+    "!#(rating > 0.6)",
+    "&(#(rating > 0.2), #(playcount < 3))",
+    "|(#(rating > 0.9), #(playcount = 0))",
+    "&(#(rating > 0.2), artist=foo)",
+    "&(#(playcount < 2), |(title=a, #(rating = 1)))",
+    "|(#(rating > 0.9), artist=foo)",
+    "artist=foo",
+]
+
+
+def random_tags(seed):
+    rand = random.Random(seed)
+    now = time.time()
+
+    def tags(i):
+        tags = {
+            "artist": rand.choice(["foo", "bar", "baz"]),
+            "title": rand.choice(["a", "b", "c"]),
+            "~#added": now - rand.randint(0, 30) * 24 * 3600 - 3600,
+            "~#length": rand.randint(60, 600),
+            "~#filesize": rand.randint(1, 10) * 1024**2 + 1,
+            "~#bitrate": rand.randint(0, 4),
+        }
+        if i % 3:
+            tags["~#rating"] = rand.choice([0.0, 0.25, 0.5, 0.75, 1.0])
+        if i % 4:
+            tags["~#playcount"] = rand.randint(0, 5)
+        if i % 5:
+            tags["date"] = rand.choice(["1990", "1995-06-12", "2001-03", "2010", "x"])
+        if i % 2:
+            tags["~#lastplayed"] = now - rand.randint(0, 3) * 24 * 3600 - 3600
+        return tags
+
+    return tags
+
+
+class TNumericColumns(TestCase):
+    def setUp(self):
+        config.init()
+        config.set("browsers", "query_cache", False)
+        self.library = SongLibrary()
+        self.library.add(make_songs(300, tags=random_tags(0)))
+
+    def tearDown(self):
+        self.library.destroy()
+        config.quit()
+
+    def assertSameResults(self):
+        songs = list(self.library.values())
+        for text in QUERIES:
+            query = Query(text)
+            assert query.is_parsable, text
+            expected = [s for s in songs if query._match.search(s)]
+            assert query.filter(self.library) == expected, text
+
+    def test_same_results(self):
+        self.assertSameResults()
+
+    def test_used(self):
+        columns = self.library.get_numeric_columns()
+        assert columns.filter(Query("#(rating > 0.6)")._match, []) == []
+        assert columns.filter(Query("artist=foo")._match, []) is None
+        assert columns.filter(Query("|(#(rating > 0.6), a)")._match, []) is None
+
+    def test_follows_library(self):
+        self.assertSameResults()
+        songs = list(self.library.values())
+        self.library.remove(songs[:200])
+        for song in songs[200:250]:
+            song["~#rating"] = 0.3
+        self.library.changed(songs[200:250])
+        self.library.add(make_songs(20, tags=random_tags(1)))
+        self.assertSameResults()
+        assert len(Query("#(rating = 0.3)").filter(self.library)) == 50
+
+    def test_sorted(self):
+        columns = self.library.get_numeric_columns()
+        self.assertSameResults()
+        values, ids = columns.sorted_column("~#added")
+        assert list(values) == sorted(values)
+        assert len(ids) == len(self.library)
+        assert "~#rating" not in columns._sorted
+
+    def test_sorted_updates(self):
+        self.assertSameResults()
+        columns = self.library.get_numeric_columns()
+        sorted_values = columns._sorted["~#added"]
+        songs = list(self.library.values())
+        for song in songs[:20]:
+            song["~#added"] = time.time() - 5
+        self.library.changed(songs[:20])
+        self.library.remove(songs[20:40])
+        self.library.add(make_songs(10, tags=random_tags(1)))
+        assert columns._sorted["~#added"] is sorted_values
+        values, ids = sorted_values
+        assert list(values) == sorted(values)
+        assert len(ids) == len(self.library)
+        self.assertSameResults()
+
+    def test_sorted_many_updates(self):
+        self.assertSameResults()
+        columns = self.library.get_numeric_columns()
+        old = _columns.MAX_SORTED_UPDATES
+        _columns.MAX_SORTED_UPDATES = 10
+        try:
+            self.library.changed(list(self.library.values()))
+        finally:
+            _columns.MAX_SORTED_UPDATES = old
+        assert not columns._sorted
+        self.assertSameResults()
+
+    def test_other_songs(self):
+        columns = self.library.get_numeric_columns()
+        song = AudioFile({"~filename": "/other.mp3", "~#rating": 1.0})
+        node = Query("#(rating > 0.6)")._match
+        assert columns.filter(node, [song]) == [song]
+
+    def test_disabled(self):
+        config.set("browsers", "numeric_columns", False)
+        assert self.library.get_numeric_columns() is None
+        self.assertSameResults()
+
+    @skip("Enable for benchmarking numeric searches with columns")
+    def test_performance(self):
+        self.library.add(make_songs(300000, tags=random_tags(2)))
+        songs = list(self.library.values())
+        for text in QUERIES[:12]:
+            query = Query(text)
+            start = time.perf_counter()
+            expected = [s for s in songs if query._match.search(s)]
+            tree = time.perf_counter() - start
+            query.filter(self.library)
+            start = time.perf_counter()
+            result = query.filter(self.library)
+            columns = time.perf_counter() - start
+            assert result == expected
+            print(f"{text!r}: {tree * 1000:.0f}ms song by song, {columns * 1000:.0f}ms")
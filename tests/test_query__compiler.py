@@ -0,0 +1,128 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+import random
+import time
+
+from quodlibet import config
+from quodlibet.formats import AudioFile
+from quodlibet.query import Query
+from quodlibet.query._compiler import compile_query
+from quodlibet.util.collection import Album
+from tests import TestCase, skip
+from tests.helper import make_songs
+
+QUERIES = [
+    "",
+    "foo",
+    "foo bar",
+    "!foo",
+    "artist=foo",
+    "artist=!foo",
+    "artist=|(foo, bar)",
+    "artist=&(/^f/, !/o$/)",
+    "title=/o{2}/c",
+    "~people=foo",
+    "~filename=/music/",
+    "filename=/3/",
+    "mountpoint=/music/",
+    "comment=''",
+    "#(rating > 0.5)",
+    "#(rating >= 0.5)",
+    "#(rating != 0.5)",
+    "#(playcount == 0)",
+    "#(0.5 < rating)",
+    "#(0.2 < rating < 0.8)",
+    "#(date > 2000)",
+    "#(added < 2 days)",
+    "#(length > 3:00)",
+    "#(tracknumber < 3)",
+    "&(artist=foo, |(#(rating = 1), title=bar))",
+    "|(&(artist=foo, !title=bar), #(rating < 0.5))",
+    "!&(artist=foo, title=bar)",
+    "@(invalid)",
+    "&()",
+    "|()",
+]
+
+
+def random_tags(seed):
+    rand = random.Random(seed)
+    words = ["foo", "bar", "Foo Fighters", "baz", "Föö", "qux", ""]
+
+    def tags(i):
+        tags = {
+            "title": rand.choice(words),
+            "~#added": time.time() - rand.randint(0, 5) * 24 * 3600,
+            "~#length": rand.randint(100, 300),
+            "~#playcount": rand.randint(0, 2),
+        }
+        if i % 4:
+            tags["artist"] = rand.choice(words)
+        if i % 3:
+            tags["~#rating"] = rand.choice([0.0, 0.25, 0.5, 0.75, 1.0])
+        if i % 5:
+            tags["date"] = str(rand.randint(1990, 2010))
+        if i % 7 == 0:
+            tags["performer"] = rand.choice(words)
+        if i % 2:
+            tags["tracknumber"] = f"{rand.randint(1, 10)}/10"
+        return tags
+
+    return tags
+
+
+class TQueryCompiler(TestCase):
+    def setUp(self):
+        config.init()
+
+    def tearDown(self):
+        config.quit()
+
+    def test_same_as_search(self):
+        songs = make_songs(200, tags=random_tags(0))
+        albums = []
+        for i in range(0, 200, 10):
+            album = Album(songs[i])
+            album.songs.update(songs[i : i + 10])
+            albums.append(album)
+        for text in QUERIES:
+            node = Query(text, star=["artist", "title", "~people"])._match
+            func = compile_query(node)
+            for song in songs + albums:
+                assert func(song) == node.search(song), (text, song)
+
+    def test_query_search(self):
+        query = Query("artist=foo")
+        assert query.search(AudioFile(artist="foo"))
+        assert not query.search(AudioFile(artist="bar"))
+
+    def test_non_song_data(self):
+        assert compile_query(Query("#(rating > 0.5)")._match)(AudioFile()) is False
+        assert not compile_query(Query("@(name: DIE)")._match)("foo")
+
+    @skip("Enable for benchmarking compiled query evaluation")
+    def test_performance(self):
+        songs = make_songs(100000, tags=random_tags(0))
+        for text in [
+            "foo",
+            "foo bar",
+            "&(artist=foo, #(rating > 0.5))",
+            "|(title=/^b/, ~people=qux, #(playcount > 1))",
+            "!&(artist=foo, title=bar)",
+        ]:
+            node = Query(text)._match
+            func = compile_query(node)
+            start = time.perf_counter()
+            tree = [s for s in songs if node.search(s)]
+            tree_time = time.perf_counter() - start
+            start = time.perf_counter()
+            compiled = [s for s in songs if func(s)]
+            compiled_time = time.perf_counter() - start
+            assert tree == compiled
+            print(
+                f"{text!r}: {tree_time * 1000:.0f}ms tree, "
+                f"{compiled_time * 1000:.0f}ms compiled"
+            )
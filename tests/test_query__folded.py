@@ -0,0 +1,109 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+import time
+
+from quodlibet import config
+from quodlibet.formats import AudioFile
+from quodlibet.library import SongLibrary
+from quodlibet.query import Query
+from quodlibet.query._folded import FoldedTag
+from tests import TestCase, skip
+
+QUERIES = [
+    "motorhead",
+    "MOTÖRHEAD",
+    "ae",
+    "straße",
+    "foo bar",
+    "!foo",
+    "artist=foo",
+    "artist=/fo+/",
+    "title='Ace'",
+    "&(foo, |(ace, bar))",
+    "~people=foo",
+    "~filename=music",
+]
+
+
+class TFoldedTags(TestCase):
+    def setUp(self):
+        config.init()
+        config.set("browsers", "query_cache", False)
+        self.library = SongLibrary()
+        values = ["Motörhead", "foo", "Bar", "Æon", "Straße", "ace", "FOO bar"]
+        self.songs = [
+            AudioFile(
+                {
+                    "~filename": f"/music/{i}.mp3",
+                    "artist": values[i % len(values)],
+                    "title": values[i * 3 % len(values)],
+                }
+            )
+            for i in range(30)
+        ]
+        self.library.add(self.songs)
+
+    def tearDown(self):
+        self.library.destroy()
+        config.quit()
+
+    def assertSameResults(self):
+        for text in QUERIES:
+            query = Query(text)
+            expected = [s for s in self.library if query._match.search(s)]
+            assert query.filter(self.library) == expected, text
+
+    def test_same_results(self):
+        self.assertSameResults()
+        assert len(self.library.get_folded_tags())
+
+    def test_bind(self):
+        folded = self.library.get_folded_tags()
+        assert isinstance(folded.bind(Query("artist=foo")._match), FoldedTag)
+        node = Query("artist=/fo+/")._match
+        assert folded.bind(node) is node
+        node = Query("#(rating > 0.5)")._match
+        assert folded.bind(node) is node
+        node = Query("&(a, !b)")._match
+        assert repr(folded.bind(node)) == repr(node)
+
+    def test_not_compiled(self):
+        # values with "æ" or "ß" need the pattern
+        self.library.remove([s for s in self.songs if s("artist") in ("Æon", "Straße")])
+        query = Query("artist=foo")
+        query.filter(self.library)
+        assert "search" not in query._match.res.__dict__
+        query = Query("ae")
+        query.filter(self.library)
+        assert "search" in query._match.res[0].res.__dict__
+
+    def test_changed(self):
+        self.assertSameResults()
+        for song in self.songs[:10]:
+            song["artist"] = "Mötley"
+        self.library.changed(self.songs[:10])
+        assert len(Query("artist=motley").filter(self.library)) == 10
+        self.library.remove(self.songs[:5])
+        self.assertSameResults()
+
+    def test_disabled(self):
+        config.set("browsers", "folded_tags", False)
+        assert self.library.get_folded_tags() is None
+        self.assertSameResults()
+
+    @skip("Enable for benchmarking free text searches")
+    def test_performance(self):
+        self.library.add(
+            AudioFile({"~filename": f"/more/{i}.mp3", "artist": f"Artist {i % 997}"})
+            for i in range(100000)
+        )
+        for enabled in [False, True]:
+            config.set("browsers", "folded_tags", enabled)
+            Query("warmup").filter(self.library)
+            start = time.perf_counter()
+            for text in ["a", "ar", "art", "arti", "artis", "artist 12"]:
+                Query(text).filter(self.library)
+            print(f"folded={enabled}: {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,144 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+import random
+import time
+
+from quodlibet import config
+from quodlibet.library import SongLibrary
+from quodlibet.query import Query
+from quodlibet.query._index import fold, words
+from tests import TestCase, skip
+from tests.helper import make_songs
+
+WORDS = [
+    "love",
+    "night",
+    "Björk",
+    "Sigur Rós",
+    "Mötley Crüe",
+    "Æther",
+    "ﬁnal",
+    "street",
+    "AC/DC",
+    "the",
+    "Beatles",
+    "Abbey Road",
+    "Straße",
+    "dream",
+    "Kelvin",
+]
+
+
+def random_tags(seed):
+    rand = random.Random(seed)
+    return lambda i: {
+        "artist": " ".join(rand.sample(WORDS, 2)),
+        "album": " ".join(rand.sample(WORDS, 2)),
+        "title": " ".join(rand.sample(WORDS, 3)) + f" {i}",
+        "genre": rand.choice(["rock", "jazz", "pop"]),
+    }
+
+
+class Tfold(TestCase):
+    def test_fold(self):
+        assert fold("Björk") == "bjork"
+        assert fold("Æther") == "aether"
+        assert fold("ﬁnal") == "final"
+        assert fold("KELVIN") == "kelvin"
+        assert fold("été") == "ete"
+
+    def test_words(self):
+        assert words("AC/DC - Back in Black") == {"ac", "dc", "back", "in", "black"}
+
+
+class TTextIndex(TestCase):
+    QUERIES = [
+        "bjork",
+        "björk",
+        "BJÖRK",
+        "ros",
+        "motley crue",
+        "aether",
+        "final",
+        "ac/dc",
+        "dc",
+        "beatles road",
+        "1",
+        "12",
+        "nothing like this",
+        "kelvin",
+        "the",
+        "|(title=dream, artist=night)",
+        "&(artist=love, title=!street)",
+        'title="Æther"',
+        "genre=rock",
+        "title=/^lo/",
+        "title=/lo.e/",
+        "#(track < 3)",
+    ]
+
+    def setUp(self):
+        config.init()
+        config.set("browsers", "search_index", True)
+        self.library = SongLibrary()
+        self.library.add(make_songs(300, tags=random_tags(0)))
+
+    def tearDown(self):
+        self.library.destroy()
+        config.quit()
+
+    def assertSameResults(self):
+        songs = list(self.library.values())
+        for text in self.QUERIES:
+            query = Query(text)
+            expected = {s.key for s in songs if query.search(s)}
+            assert {s.key for s in query.filter(self.library)} == expected, text
+
+    def test_same_results(self):
+        self.assertSameResults()
+
+    def test_narrows(self):
+        index = self.library.get_text_index()
+        candidates = index.candidates(Query("bjork")._match)
+        assert candidates is not None
+        assert len(candidates) < len(self.library)
+        assert index.candidates(Query("title=/lo.e/")._match) is None
+        assert index.candidates(Query("#(track < 3)")._match) is None
+        assert index.candidates(Query("zzzzz")._match) == []
+
+    def test_follows_library(self):
+        self.assertSameResults()
+        songs = list(self.library.values())
+        self.library.remove(songs[:50])
+        for song in songs[50:100]:
+            song["title"] = "zebra crossing"
+        self.library.changed(songs[50:100])
+        self.library.add(make_songs(20, tags=random_tags(1)))
+        self.assertSameResults()
+        assert len(Query("zebra").filter(self.library)) == 50
+
+    def test_disabled(self):
+        config.set("browsers", "search_index", False)
+        assert self.library.get_text_index() is None
+        self.assertSameResults()
+
+    @skip("Enable for benchmarking searches with the text index")
+    def test_performance(self):
+        self.library.add(make_songs(300000, tags=random_tags(2)))
+        index = self.library.get_text_index()
+        start = time.perf_counter()
+        index.candidates(Query("x")._match)
+        print(f"Indexing {len(self.library)} songs: {time.perf_counter() - start:.2f}s")
+
+        for text in ["bjork", "beatles road", "dream 1234", "sigur ros final"]:
+            query = Query(text)
+            start = time.perf_counter()
+            query._match.filter(self.library)
+            full = time.perf_counter() - start
+            start = time.perf_counter()
+            query.filter(self.library)
+            indexed = time.perf_counter() - start
+            print(f"{text!r}: {full * 1000:.1f}ms full, {indexed * 1000:.1f}ms indexed")
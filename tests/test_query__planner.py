@@ -0,0 +1,95 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+from quodlibet import config
+from quodlibet.query import Query
+from quodlibet.query._match import Inter, Tag, Union, hit_rates
+from quodlibet.query._planner import cost, plan
+from tests import TestCase
+from tests.helper import make_songs
+
+
+def song_tags(i):
+    return {
+        "artist": "foo" if i % 2 else "bar",
+        "title": "rare" if i == 3 else f"song {i}",
+        "~#rating": (i % 5) / 4,
+    }
+
+
+class TQueryPlanner(TestCase):
+    def setUp(self):
+        config.init()
+        hit_rates.clear()
+
+    def tearDown(self):
+        hit_rates.clear()
+        config.quit()
+
+    def test_cost(self):
+        plain = Query("artist=foo")._match
+        regex = Query("artist=/f.o/")._match
+        internal = Query("~people=foo")._match
+        number = Query("#(rating > 0.5)")._match
+        assert cost(number) < cost(plain) < cost(regex)
+        assert cost(plain) < cost(internal)
+        assert cost(Query("#(date > 2000)")._match) > cost(number)
+
+    def test_cheap_first(self):
+        node = Query("&(~people=/f.o/, #(rating > 0.5))")._match
+        assert isinstance(node, Inter)
+        assert "Numcmp" in repr(node.res[0])
+        assert isinstance(node.res[1], Tag)
+
+        node = Query("|(~people=/f.o/, #(rating > 0.5))")._match
+        assert isinstance(node, Union)
+        assert "Numcmp" in repr(node.res[0])
+
+    def test_keeps_order_without_stats(self):
+        node = Query("&(artist=foo, title=rare)")._match
+        assert [n.names for n in node.res] == [["artist"], ["title"]]
+
+    def test_selective_first(self):
+        songs = make_songs(40, tags=song_tags)
+        query = Query("&(artist=foo, title=rare)")
+        assert [s("title") for s in query.filter(songs)] == ["rare"]
+        # the title ruled out more songs, so goes first now
+        assert query.filter(songs) == [songs[3]]
+        assert [n.names for n in query._match.res] == [["title"], ["artist"]]
+
+        query = Query("|(title=rare, artist=foo)")
+        query.filter(songs)
+        query.filter(songs)
+        # the artist matches more songs, so goes first for unions
+        assert [n.names for n in query._match.res] == [["artist"], ["title"]]
+
+    def test_same_results(self):
+        songs = make_songs(40, tags=song_tags)
+        for text in [
+            "&(artist=foo, title=rare)",
+            "|(title=rare, artist=bar, #(rating = 1))",
+            "&(|(artist=foo, title=song), !title=/1/, #(rating >= 0.5))",
+            "|(&(artist=foo, #(rating < 0.5)), &(artist=bar, title=/3$/))",
+            "!&(artist=foo, title=rare)",
+        ]:
+            query = Query(text)
+            expected = [s for s in songs if query.search(s)]
+            for _i in range(3):
+                assert query.filter(songs) == expected, text
+                assert [s for s in songs if query.search(s)] == expected, text
+
+    def test_plan_in_place(self):
+        node = Query("artist=foo")._match
+        assert plan(node) is node
+
+    def test_explain(self):
+        query = Query("&(artist=foo, #(rating > 0.5))")
+        text = query.explain()
+        assert "AND" in text
+        assert "not run yet" in text
+        query.filter(make_songs(40, tags=song_tags))
+        text = query.explain()
+        assert "matched" in text
+        assert "/40 matched" in text
@@ -0,0 +1,70 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+from quodlibet import config
+from quodlibet.library import SongLibrary
+from quodlibet.query import Query, StandingQuery
+from tests import TestCase
+from tests.helper import make_songs
+
+
+def song_tags(i):
+    return {"artist": ["foo", "bar"][i % 2]}
+
+
+class TStandingQuery(TestCase):
+    def setUp(self):
+        config.init()
+        self.library = SongLibrary()
+        self.songs = make_songs(10, tags=song_tags)
+        self.library.add(self.songs)
+        self.standing = StandingQuery(self.library, Query("artist=foo"))
+        self.events = []
+        for name in ["entered", "left", "changed"]:
+            self.standing.connect(name, self.__event, name)
+
+    def __event(self, standing, items, name):
+        self.events.append((name, items))
+
+    def tearDown(self):
+        self.standing.destroy()
+        self.library.destroy()
+        config.quit()
+
+    def test_initial(self):
+        assert len(self.standing) == 5
+        assert self.songs[0] in self.standing
+        assert self.songs[1] not in self.standing
+        assert set(self.standing) == set(self.songs[::2])
+
+    def test_added(self):
+        new = make_songs(2, 100, song_tags)
+        self.library.add(new)
+        assert self.events == [("entered", {new[0]})]
+        assert new[0] in self.standing
+
+    def test_removed(self):
+        self.library.remove(self.songs[:2])
+        assert self.events == [("left", {self.songs[0]})]
+        assert len(self.standing) == 4
+
+    def test_changed(self):
+        first, second, third = self.songs[:3]
+        first["artist"] = "bar"
+        second["artist"] = "foo"
+        self.library.changed([first, second, third, self.songs[4]])
+        assert self.events == [
+            ("left", {first}),
+            ("entered", {second}),
+            ("changed", {third, self.songs[4]}),
+        ]
+        assert first not in self.standing
+        assert second in self.standing
+
+    def test_destroy(self):
+        self.standing.destroy()
+        self.library.add(make_songs(2, 100, song_tags))
+        assert not self.events
+        assert len(self.standing) == 0
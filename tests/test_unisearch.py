@@ -12,7 +12,9 @@ from tests import TestCase
 
 from quodlibet.unisearch import compile
 from quodlibet.unisearch.db import diacritic_for_letters
+from quodlibet.unisearch.fold import can_fold, fold
 from quodlibet.unisearch.parser import re_replace_literals, re_add_variants
+from quodlibet.util import re_escape
 
 
 class TUniSearch(TestCase):
@@ -190,3 +192,37 @@ class TCompileMatch(TestCase):
 
         with self.assertRaises(ValueError):
             compile("(F", asym=True)
+
+
+class TFold(TestCase):
+    def test_fold(self):
+        assert fold("Motörhead") == "motorhead"
+        assert fold("\u212b") == "a"
+        assert fold("ÆON") is None
+        assert fold("Straße") is None
+        assert fold("日本") == "日本"
+
+    def test_can_fold(self):
+        assert can_fold("foo bar!")
+        assert not can_fold("föo")
+        assert not can_fold("foo\nbar")
+
+    def test_same_as_compile(self):
+        values = [
+            "Motörhead",
+            "Ǆ",
+            "ſeas",
+            "\u212aing",
+            "Ĳssel",
+            "ﬁne",
+            "a…b",
+            "İsland",
+        ]
+        texts = ["o", "motorhead", "se", "king", "ij", "fi", "...", "a", "is", "b"]
+        for value in values:
+            folded = fold(value)
+            if folded is None:
+                continue
+            for text in texts:
+                expected = compile(re_escape(text), asym=True)(value)
+                assert (text.lower() in folded) == expected, (value, text)
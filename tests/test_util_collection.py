@@ -5,6 +5,7 @@
 
 import os
 import shutil
+import time
 from collections import defaultdict
 from os.path import exists
 from pathlib import Path
@@ -28,7 +29,7 @@ from quodlibet.util.collection import (
     XSPF_NS,
 )
 from quodlibet.fsn import uri2fsn
-from tests import TestCase, mkdtemp
+from tests import TestCase, mkdtemp, skip
 
 config.RATINGS = config.HardCodedRatingsPrefs()
 
@@ -297,6 +298,107 @@ class TAlbum(TestCase):
         assert album.comma("c") == "cc3, cc1"
         assert album.comma("~c~b") == "cc3, cc1 - bb1, bb4"
 
+    KEYS = [
+        "~#length",
+        "~#length:max",
+        "~#length:min",
+        "~#rating",
+        "~#rating:avg",
+        "~#bitrate",
+        "~#tracks",
+        "~#discs",
+        "~people",
+        "~peoplesort",
+        "genre",
+        "~length",
+    ]
+
+    def big_album_songs(self, count):
+        return [
+            Fakesong(
+                {
+                    "~filename": f"/{i}.mp3",
+                    "album": "box",
+                    "artist": f"artist{i % 7}",
+                    "performer": f"performer{i % 3}",
+                    "genre": f"genre{i % 4}",
+                    "discnumber": str(i % 5 + 1),
+                    "~#length": i % 300 + 60,
+                    "~#bitrate": 128 + i % 3 * 64,
+                    "~#rating": (i % 5) / 4,
+                }
+            )
+            for i in range(count)
+        ]
+
+    def assertSameAsNew(self, album):
+        fresh = Album(next(iter(album.songs)))
+        fresh.songs = set(album.songs)
+        for key in self.KEYS:
+            assert album(key) == pytest.approx(fresh(key)), key
+        assert album.peoplesort == fresh.peoplesort
+        assert album.genre == fresh.genre
+
+    def test_incremental_updates(self):
+        songs = self.big_album_songs(200)
+        album = Album(songs[0])
+        album.add(songs[:100])
+        for key in self.KEYS:
+            album(key)
+        assert album._keep_aggregates()
+
+        album.add(songs[100:])
+        self.assertSameAsNew(album)
+
+        album.remove(songs[:30])
+        self.assertSameAsNew(album)
+
+        for song in songs[50:80]:
+            song["~#rating"] = 1.0
+            song["~#length"] = 1000
+            song["artist"] = "new artist\nother"
+        album.changed(songs[50:80])
+        self.assertSameAsNew(album)
+
+        # below the threshold values get computed again
+        album.remove(songs[30:190])
+        assert not album._keep_aggregates()
+        self.assertSameAsNew(album)
+
+    def test_incremental_remove_all(self):
+        songs = self.big_album_songs(100)
+        album = Album(songs[0])
+        album.add(songs)
+        assert album("~#length")
+        album.remove(songs)
+        assert album("~#length", None) is None
+        assert album("~people", None) is None
+
+    @skip("Enable for benchmarking incremental album updates")
+    def test_incremental_performance(self):
+        songs = self.big_album_songs(2000)
+
+        def run(album):
+            start = time.perf_counter()
+            for i in range(0, len(songs), 10):
+                album.add(songs[i : i + 10])
+                for key in self.KEYS:
+                    album(key)
+            for i in range(0, len(songs), 100):
+                album.changed(songs[i : i + 50])
+                for key in self.KEYS:
+                    album(key)
+            return time.perf_counter() - start
+
+        incremental = run(Album(songs[0]))
+
+        class FinalizingAlbum(Album):
+            def _keep_aggregates(self):
+                return False
+
+        full = run(FinalizingAlbum(songs[0]))
+        print(f"incremental {incremental:.2f}s, recomputing {full:.2f}s")
+
     def tearDown(self):
         config.quit()
 
@@ -0,0 +1,174 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+import threading
+import time
+
+from tests import TestCase, run_gtk_loop
+
+from quodlibet.formats import AudioFile
+from quodlibet.util.cover.loader import CoverLoader
+from quodlibet.util.cover.manager import CoverManager
+from quodlibet.util.thread import Cancellable
+
+
+class FakePixbuf:
+    def __init__(self, key, size):
+        self.key = key
+        self.size = size
+
+    def get_byte_length(self):
+        return self.size * self.size
+
+
+class FakeCoverManager(CoverManager):
+    def __init__(self):
+        super().__init__(use_built_in=False)
+        self.loaded = []
+        self.stored = {}
+        self.looked_up = []
+        self.blocked = threading.Event()
+        self.blocked.set()
+
+    def get_album_stamp(self, songs):
+        return songs[0]("album")
+
+    def get_stored_album_pixbuf(self, key, size, stamp):
+        self.blocked.wait()
+        self.loaded.append(stamp)
+        return self.stored.get(stamp)
+
+    def get_cover_many(self, songs):
+        self.looked_up.append(threading.current_thread() is threading.main_thread())
+        name = songs[0]("album")
+        return None if name == "none" else name
+
+    def load_album_pixbuf(self, key, size, stamp, fileobj):
+        assert fileobj == stamp
+        return FakePixbuf(fileobj, size)
+
+
+def album(name):
+    return [AudioFile({"~filename": f"/{name}.mp3", "album": name})]
+
+
+class TCoverLoader(TestCase):
+    def setUp(self):
+        self.manager = FakeCoverManager()
+        self.loader = CoverLoader(self.manager, max_workers=1, max_bytes=250)
+        self.results = []
+
+    def tearDown(self):
+        self.manager.blocked.set()
+        self.loader.destroy()
+        self.manager.loader.destroy()
+
+    def callback(self, pixbuf):
+        self.results.append(pixbuf and pixbuf.key)
+
+    def request(self, name, size=10, **kwargs):
+        songs = album(name)
+        return self.loader.request(
+            songs[0].album_key, songs, size, self.callback, **kwargs
+        )
+
+    def wait(self, count):
+        start = time.time()
+        while len(self.results) < count and time.time() - start < 5:
+            run_gtk_loop()
+            time.sleep(0.001)
+        run_gtk_loop()
+
+    def test_request(self):
+        assert self.request("foo") is not None
+        self.wait(1)
+        assert self.results == ["foo"]
+        assert self.request("foo") is None
+        assert self.results == ["foo", "foo"]
+        assert self.manager.loaded == ["foo"]
+
+    def test_looked_up_in_main_thread(self):
+        self.request("foo")
+        self.wait(1)
+        assert self.results == ["foo"]
+        assert self.manager.looked_up == [True]
+
+    def test_stored(self):
+        self.manager.stored["foo"] = FakePixbuf("stored", 10)
+        self.request("foo")
+        self.wait(1)
+        assert self.results == ["stored"]
+        assert not self.manager.looked_up
+
+    def test_no_cover(self):
+        self.request("none")
+        self.wait(1)
+        assert self.request("none") is None
+        assert self.results == [None, None]
+        assert self.manager.loaded == ["none"]
+
+    def test_shared(self):
+        self.manager.blocked.clear()
+        self.request("first")
+        self.request("foo")
+        self.request("foo")
+        self.manager.blocked.set()
+        self.wait(3)
+        assert self.results == ["first", "foo", "foo"]
+        assert self.manager.loaded == ["first", "foo"]
+
+    def test_priority(self):
+        self.manager.blocked.clear()
+        self.request("first")
+        self.request("b", priority=3)
+        self.request("c", priority=1)
+        self.request("d", priority=2)
+        self.manager.blocked.set()
+        self.wait(4)
+        assert self.manager.loaded == ["first", "c", "d", "b"]
+
+    def test_reprioritize(self):
+        cancel = Cancellable()
+        self.manager.blocked.clear()
+        self.request("first")
+        self.request("b", priority=1, cancellable=cancel, tag=2)
+        self.request("c", priority=2, cancellable=cancel, tag=None)
+        self.request("d", priority=3, cancellable=cancel, tag=1)
+        self.request("e", priority=4)
+
+        self.loader.reprioritize(cancel, lambda request: request.tag)
+        self.manager.blocked.set()
+        self.wait(4)
+        assert self.manager.loaded == ["first", "d", "b", "e"]
+        assert self.results == ["first", "d", "b", "e"]
+
+    def test_cancel(self):
+        cancel = Cancellable()
+        self.manager.blocked.clear()
+        self.request("first")
+        self.request("foo", cancellable=cancel)
+        self.request("bar")
+        cancel.cancel()
+        self.manager.blocked.set()
+        self.wait(2)
+        assert self.manager.loaded == ["first", "bar"]
+        assert self.results == ["first", "bar"]
+
+    def test_cache_size(self):
+        for name in ["a", "b", "c"]:
+            self.request(name)
+            self.wait(len(self.results) + 1)
+        self.request("a")
+        self.request("c")
+        self.wait(5)
+        assert self.manager.loaded == ["a", "b", "c", "a"]
+
+    def test_cover_changed(self):
+        self.request("foo")
+        self.wait(1)
+        self.manager.cover_changed(album("foo"))
+        self.request("foo")
+        self.wait(2)
+        assert self.manager.loaded == ["foo", "foo"]
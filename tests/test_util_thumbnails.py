@@ -3,8 +3,13 @@
 # the Free Software Foundation; either version 2 of the License, or
 # (at your option) any later version.
 
+import shutil
+from unittest.mock import patch
+
+from quodlibet import config
+from quodlibet.formats import AudioFile
 from quodlibet.util.path import mtime
-from tests import TestCase, NamedTemporaryFile, get_data_path
+from tests import TestCase, NamedTemporaryFile, get_data_path, mkdtemp
 
 from gi.repository import GdkPixbuf
 from quodlibet.fsn import fsn2uri, fsnative
@@ -110,3 +115,107 @@ class TThumb(TestCase):
         # check rights
         if os.name != "nt":
             assert os.stat(path).st_mode == 33152
+
+
+class TAlbumThumbnailCache(TestCase):
+    def setUp(self):
+        self.temp = mkdtemp()
+        self.cache = thumbnails.AlbumThumbnailCache(os.path.join(self.temp, "cache"))
+        self.image = os.path.join(self.temp, "cover.jpg")
+        shutil.copy(get_data_path("image.jpg"), self.image)
+        self.album = os.path.join(self.temp, "album")
+        os.mkdir(self.album)
+        song = AudioFile({"~filename": os.path.join(self.album, "a.mp3")})
+        song["~#mtime"] = 1
+        self.songs = [song]
+        self.pixbuf = GdkPixbuf.Pixbuf.new(GdkPixbuf.Colorspace.RGB, False, 8, 20, 20)
+        config.init()
+
+    def tearDown(self):
+        config.quit()
+        shutil.rmtree(self.temp)
+
+    def stamp(self, sources=()):
+        return self.cache.get_stamp(self.songs, sources)
+
+    def get(self, key="album", size=20, sources=()):
+        return self.cache.get(key, size, self.stamp(sources))
+
+    def put(self, key="album", size=20, sources=()):
+        with open(self.image, "rb") as h:
+            self.cache.put(key, size, self.stamp(sources), h, self.pixbuf)
+
+    def test_get(self):
+        assert self.get() is None
+        self.put()
+        thumb = self.get()
+        assert (thumb.get_width(), thumb.get_height()) == (20, 20)
+        assert self.get(size=30) is None
+        assert self.get("other") is None
+
+    def test_embedded(self):
+        fn = NamedTemporaryFile()
+        with open(self.image, "rb") as h:
+            fn.write(h.read())
+        fn.flush()
+        fn.seek(0, 0)
+        self.cache.put("album", 20, self.stamp(), fn, self.pixbuf)
+        fn.close()
+        assert self.get()
+
+    def test_songs_changed(self):
+        self.put()
+        self.songs[0]["~#mtime"] = 2
+        assert self.get() is None
+        self.songs[0]["~#mtime"] = 1
+        self.songs.append(AudioFile({"~filename": "/b.mp3"}))
+        assert self.get() is None
+
+    def test_image_changed(self):
+        # everything in the temp dir counts as embedded
+        with patch.object(thumbnails, "gettempdir", return_value="/nonexisting"):
+            self.put()
+        assert self.get()
+        os.utime(self.image, (1, 1))
+        assert self.get() is None
+
+    def test_settings_changed(self):
+        self.put()
+        config.set("albumart", "prefer_embedded", True)
+        assert self.get() is None
+
+    def test_album_dir_changed(self):
+        self.put()
+        os.utime(self.album, (1, 1))
+        assert self.get() is None
+        self.put()
+        os.mkdir(os.path.join(self.album, "scans"))
+        os.utime(self.album, (1, 1))
+        assert self.get() is None
+        self.put()
+        os.utime(os.path.join(self.album, "scans"), (1, 1))
+        assert self.get() is None
+
+    def test_sources_changed(self):
+        self.put(sources=["A"])
+        assert self.get(sources=["A"])
+        assert self.get(sources=["B", "A"]) is None
+
+    def test_invalidate(self):
+        self.put(size=20)
+        self.put(size=30)
+        self.put(key="other")
+        self.cache.invalidate(["album"])
+        assert self.get() is None
+        assert self.get(size=30) is None
+        assert self.get("other")
+
+    def test_prune(self):
+        self.put(key="first")
+        size = os.path.getsize(self.cache._get_path("first", 20))
+        self.cache._max_bytes = size * 3
+        for i, key in enumerate(["a", "b", "c"]):
+            os.utime(self.cache._get_path("first", 20), (i, i))
+            self.put(key=key)
+        assert self.get("first") is None
+        assert self.get("c")